@@ -51,7 +51,11 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    # Sampled latency/SQL profiling, reported at /api/profiling/ (api/profiling.py)
+    'api.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # gzip/brotli for API responses over RESPONSE_COMPRESSION_MIN_SIZE bytes
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -133,7 +137,8 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication with an LRU/shared-cache layer (api/authentication.py)
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -144,4 +149,27 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # JSON stays the default; clients can ask for the compact forms with
+    # Accept: application/msgpack / application/vnd.columnar+json
+    # (api/renderers.py) or ?format=msgpack / ?format=columnar
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.ColumnarJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+    ],
 }
+
+# Smaller response bodies are sent uncompressed (api/middleware.py)
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+
+# Share of requests profiled, and how many recent samples each process keeps
+REQUEST_PROFILING_SAMPLE_RATE = 0.05
+REQUEST_PROFILING_BUFFER_SIZE = 5000
+
+# Serve Book list pages through the compiled read-only serializer (api/compiled.py)
+API_COMPILED_READS = True
+
+# Cache alias shared by all workers for token lookups (e.g. 'default' once it
+# points at Redis or Memcached); None keeps only the per-process LRU.
+TOKEN_AUTH_SHARED_CACHE = None
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic.base import RedirectView
 from rest_framework.routers import DefaultRouter
-from api.views import BookViewSet
+from api.views import BookViewSet, ProfilingReportView
 
 router = DefaultRouter()
 router.register(r'books', BookViewSet, basename='book')
@@ -11,6 +11,7 @@ urlpatterns = [
     # Redirect root to the API index
     path('', RedirectView.as_view(url='/api/', permanent=False)),
     path('admin/', admin.site.urls),
+    path('api/profiling/', ProfilingReportView.as_view(), name='profiling-report'),
     path('api/', include(router.urls)),
     # Note: `api.urls` defines explicit book views; the router already
     # registers `books/` via `BookViewSet`. Including both would create
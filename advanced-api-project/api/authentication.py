@@ -0,0 +1,188 @@
+"""
+Token authentication with a cache in front of the ``authtoken_token`` table.
+
+DRF's ``TokenAuthentication`` runs ``Token.objects.select_related('user')``
+on every request. ``CachedTokenAuthentication`` caches the token key's user
+id and a snapshot of that user (primary key plus ``TOKEN_AUTH_USER_FIELDS``,
+what permission checks read) in a small in-process LRU and, when
+``TOKEN_AUTH_SHARED_CACHE`` names a cache alias, in that shared cache too; a
+warm request runs no query at all. Any other user field is left deferred on
+the snapshot and loaded from the database if a view reads it. Unknown keys
+are cached as well (for a shorter time) so a client hammering with a bad
+token costs one query per ``TOKEN_AUTH_NEGATIVE_TTL``.
+
+Entries are dropped when a token is saved or deleted and when a user is
+saved or deleted (deactivation included); see ``signals.py``. Changes that
+send no signal - a queryset ``update(is_active=False)``, raw SQL - apply once
+the snapshot expires, after at most ``TOKEN_AUTH_USER_TTL`` seconds. The
+in-process LRU of *other* worker processes only learns about revocations
+when its entry expires, so ``TOKEN_AUTH_LOCAL_TTL`` bounds how long a revoked
+token keeps working there.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_AUTH_LOCAL_TTL = getattr(settings, 'TOKEN_AUTH_LOCAL_TTL', 60)
+TOKEN_AUTH_LOCAL_SIZE = getattr(settings, 'TOKEN_AUTH_LOCAL_SIZE', 10000)
+TOKEN_AUTH_SHARED_TTL = getattr(settings, 'TOKEN_AUTH_SHARED_TTL', 15 * 60)
+TOKEN_AUTH_NEGATIVE_TTL = getattr(settings, 'TOKEN_AUTH_NEGATIVE_TTL', 30)
+TOKEN_AUTH_USER_TTL = getattr(settings, 'TOKEN_AUTH_USER_TTL', 60)
+# User fields kept in the cached snapshot, besides the primary key
+TOKEN_AUTH_USER_FIELDS = getattr(
+    settings, 'TOKEN_AUTH_USER_FIELDS', ('username', 'is_active', 'is_staff', 'is_superuser')
+)
+# Cache alias (e.g. 'default') shared by all processes; None disables it
+TOKEN_AUTH_SHARED_CACHE = getattr(settings, 'TOKEN_AUTH_SHARED_CACHE', None)
+
+# Stored for keys that don't exist, so repeated bad tokens skip the database
+INVALID = b''
+
+
+class LRUCache:
+    """Thread-safe, size-bounded mapping whose entries expire after a TTL."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LRUCache(TOKEN_AUTH_LOCAL_SIZE)
+
+
+def _shared_cache():
+    return caches[TOKEN_AUTH_SHARED_CACHE] if TOKEN_AUTH_SHARED_CACHE else None
+
+
+def _shared_key(key):
+    return f'auth-{key}'
+
+
+# Separate namespaces, so no client-supplied token can name a user entry
+def _token_key(key):
+    return f'token:{key}'
+
+
+def _user_key(user_id):
+    return f'user:{user_id}'
+
+
+def _lookup(key):
+    data = local_cache.get(key)
+    if data is not None:
+        return data
+    shared = _shared_cache()
+    if shared is not None:
+        data = shared.get(_shared_key(key))
+        if data is not None:
+            local_cache.set(key, data, min(_ttl(key, data), TOKEN_AUTH_LOCAL_TTL))
+    return data
+
+
+def _ttl(key, data):
+    if data == INVALID:
+        return TOKEN_AUTH_NEGATIVE_TTL
+    if key.startswith('user:'):
+        return TOKEN_AUTH_USER_TTL
+    return TOKEN_AUTH_SHARED_TTL
+
+
+def _store(key, data):
+    ttl = _ttl(key, data)
+    local_cache.set(key, data, min(ttl, TOKEN_AUTH_LOCAL_TTL))
+    shared = _shared_cache()
+    if shared is not None:
+        shared.set(_shared_key(key), data, ttl)
+
+
+def _invalidate(keys):
+    keys = list(keys)
+    for key in keys:
+        local_cache.delete(key)
+    shared = _shared_cache()
+    if shared is not None and keys:
+        shared.delete_many([_shared_key(key) for key in keys])
+
+
+def invalidate_tokens(keys):
+    """Forget cached lookups of ``keys`` in this process and the shared cache."""
+    _invalidate(_token_key(key) for key in keys)
+
+
+def invalidate_users(user_ids):
+    """Forget the cached snapshots of ``user_ids`` in this process and the shared cache."""
+    _invalidate(_user_key(user_id) for user_id in user_ids)
+
+
+def _user(user_id):
+    """The user ``user_id`` as cached, with fields outside the snapshot deferred."""
+    model = get_user_model()
+    # In model order, as from_db() expects
+    names = [f.attname for f in model._meta.concrete_fields if f.primary_key or f.name in TOKEN_AUTH_USER_FIELDS]
+    values = _lookup(_user_key(user_id))
+    if values is None:
+        values = model._default_manager.filter(pk=user_id).values_list(*names).first()
+        if values is None:
+            return None
+        _store(_user_key(user_id), values)
+    return model.from_db(router.db_for_read(model), names, values)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement for ``TokenAuthentication`` backed by the caches above."""
+
+    def authenticate_credentials(self, key):
+        user_id = _lookup(_token_key(key))
+        if user_id is None:
+            user_id = Token.objects.filter(key=key).values_list('user_id', flat=True).first()
+            if user_id is None:
+                _store(_token_key(key), INVALID)
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            _store(_token_key(key), user_id)
+        elif user_id == INVALID:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        user = _user(user_id)
+        if user is None:
+            invalidate_tokens([key])
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        # request.auth: the key and its user (``created`` is not loaded)
+        return (user, Token(key=key, user=user))
@@ -0,0 +1,258 @@
+"""
+Bulk import and export of books.
+
+``import_books`` consumes any iterable of row dicts (a parsed JSON array, or
+the lazy iterators from ``api.parsers`` for CSV / NDJSON) in batches of
+``BULK_BATCH_SIZE`` rows. Each batch is:
+
+1. validated column-wise with plain Python checks mirroring
+   ``BookSerializer`` (no serializer instance per row);
+2. resolved to author ids with one query for ids and one for names,
+   creating missing authors with a single ``bulk_create``;
+3. written with ``bulk_create`` (and, in upsert mode, ``bulk_update`` of the
+   caller's existing books matched on title + author) in one transaction,
+   adding the new books to the search index (``api.search``).
+
+Invalid rows are reported with their 1-based row number and skipped; they
+never abort the rest of the batch. ``export_rows`` streams a queryset back
+out as CSV, NDJSON or a JSON array.
+"""
+import csv
+import io
+import json
+from datetime import date
+
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ParseError
+
+from . import response_cache, search
+from .models import Author, Book
+
+BULK_BATCH_SIZE = 1000
+# Per-row errors kept in the report; the count keeps going past this
+BULK_MAX_ERRORS = 1000
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = ('id', 'title', 'publication_year', 'author_id', 'author__name')
+
+TITLE_MAX_LENGTH = Book._meta.get_field('title').max_length
+AUTHOR_NAME_MAX_LENGTH = Author._meta.get_field('name').max_length
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, row_number, errors):
+        self.error_count += 1
+        if len(self.errors) < BULK_MAX_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'errors_truncated': self.error_count > len(self.errors),
+        }
+
+
+def _clean_int(value):
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip():
+        return int(value.strip())
+    raise ValueError(value)
+
+
+def _validate(rows, current_year):
+    """Split a batch into ``(valid, errors)``.
+
+    ``valid`` holds ``(row_number, title, year, author_id, author_name)``
+    tuples with exactly one of ``author_id`` / ``author_name`` set.
+    """
+    valid, errors = [], []
+    for row_number, row in rows:
+        if not isinstance(row, dict):
+            errors.append((row_number, {'non_field_errors': ['Expected an object.']}))
+            continue
+        problems = {}
+
+        title = row.get('title')
+        title = title.strip() if isinstance(title, str) else ''
+        if not title:
+            problems['title'] = ['This field is required.']
+        elif len(title) > TITLE_MAX_LENGTH:
+            problems['title'] = [f'Ensure this field has no more than {TITLE_MAX_LENGTH} characters.']
+
+        year = None
+        try:
+            year = _clean_int(row.get('publication_year'))
+        except (TypeError, ValueError):
+            problems['publication_year'] = ['A valid integer is required.']
+        else:
+            # Same rule as BookSerializer.validate_publication_year
+            if year > current_year:
+                problems['publication_year'] = ['Publication year cannot be in the future.']
+
+        author_id = author_name = None
+        if row.get('author') not in (None, ''):
+            try:
+                author_id = _clean_int(row['author'])
+            except (TypeError, ValueError):
+                problems['author'] = ['Incorrect type. Expected pk value.']
+        else:
+            author_name = row.get('author_name')
+            author_name = author_name.strip() if isinstance(author_name, str) else ''
+            if not author_name:
+                problems['author'] = ['Provide either author (id) or author_name.']
+            elif len(author_name) > AUTHOR_NAME_MAX_LENGTH:
+                problems['author_name'] = [f'Ensure this field has no more than {AUTHOR_NAME_MAX_LENGTH} characters.']
+
+        if problems:
+            errors.append((row_number, problems))
+        else:
+            valid.append((row_number, title, year, author_id, author_name))
+    return valid, errors
+
+
+def _resolve_authors(valid):
+    """Map author ids and names of a batch to ids, creating missing authors.
+
+    Returns ``(rows, errors)`` where rows are ``(row_number, title, year, author_id)``.
+    """
+    ids = {author_id for _, _, _, author_id, _ in valid if author_id is not None}
+    names = {name for _, _, _, _, name in valid if name is not None}
+
+    existing_ids = set(Author.objects.filter(id__in=ids).values_list('id', flat=True)) if ids else set()
+    by_name = {}
+    if names:
+        # Lowest id wins when several authors share a name
+        for author_id, name in Author.objects.filter(name__in=names).order_by('-id').values_list('id', 'name'):
+            by_name[name] = author_id
+        missing = [Author(name=name) for name in sorted(names - by_name.keys())]
+        for author in Author.objects.bulk_create(missing):
+            by_name[author.name] = author.pk
+
+    rows, errors = [], []
+    for row_number, title, year, author_id, author_name in valid:
+        if author_id is None:
+            rows.append((row_number, title, year, by_name[author_name]))
+        elif author_id in existing_ids:
+            rows.append((row_number, title, year, author_id))
+        else:
+            errors.append((row_number, {'author': [f'Invalid pk "{author_id}" - object does not exist.']}))
+    return rows, errors
+
+
+def _write(rows, owner, upsert):
+    """Insert (or upsert) resolved rows; returns ``(created, updated, errors)``."""
+    existing = {}
+    if upsert and rows:
+        books = Book.objects.filter(
+            author_id__in={author_id for *_, author_id in rows},
+            title__in={title for _, title, _, _ in rows},
+        ).only('id', 'title', 'author_id', 'owner_id', 'publication_year')
+        for book in books:
+            existing.setdefault((book.title, book.author_id), book)
+
+    to_create, to_update, errors = [], {}, []
+    for row_number, title, year, author_id in rows:
+        book = existing.get((title, author_id))
+        if book is None:
+            to_create.append(Book(title=title, publication_year=year, author_id=author_id, owner=owner))
+        elif book.owner_id != owner.pk:
+            errors.append((row_number, {'non_field_errors': ['A book with this title and author belongs to another user.']}))
+        else:
+            book.publication_year = year
+            to_update[book.pk] = book
+
+    Book.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    # bulk_create() sends no post_save, so index the new titles here
+    search.index_books([book.pk for book in to_create])
+    if to_update:
+        Book.objects.bulk_update(to_update.values(), ['publication_year'], batch_size=BULK_BATCH_SIZE)
+    return len(to_create), len(to_update), errors
+
+
+def _process(batch, owner, upsert, report):
+    valid, errors = _validate(batch, date.today().year)
+    try:
+        with transaction.atomic():
+            rows, author_errors = _resolve_authors(valid)
+            created, updated, write_errors = _write(rows, owner, upsert)
+    except DatabaseError as exc:
+        # The whole batch was rolled back; keep going with the next one
+        for row_number, *_ in valid:
+            errors.append((row_number, {'non_field_errors': [f'Database error: {exc}']}))
+        created = updated = 0
+        author_errors = write_errors = []
+    if created or updated:
+        # Bulk writes send no signals
+        response_cache.bump_generation()
+    report.created += created
+    report.updated += updated
+    for row_number, problems in sorted(errors + author_errors + write_errors, key=lambda e: e[0]):
+        report.add_error(row_number, problems)
+
+
+def import_books(rows, owner, upsert=False, batch_size=BULK_BATCH_SIZE):
+    """Validate and write ``rows`` batch by batch; returns an ``ImportReport``."""
+    report = ImportReport()
+    batch = []
+    row_number = 0
+    try:
+        for row_number, row in enumerate(rows, 1):
+            batch.append((row_number, row))
+            if len(batch) >= batch_size:
+                _process(batch, owner, upsert, report)
+                batch = []
+    except ParseError as exc:
+        # A malformed line ends the stream; rows before it are still imported
+        report.add_error(row_number + 1, {'non_field_errors': [str(exc.detail)]})
+    if batch:
+        _process(batch, owner, upsert, report)
+    return report
+
+
+def export_rows(queryset, export_format):
+    """Yield ``queryset`` as text chunks in ``csv``, ``ndjson`` or ``json``."""
+    rows = queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    header = ('id', 'title', 'publication_year', 'author', 'author_name')
+
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if count % EXPORT_CHUNK_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+        return
+
+    chunk = []
+    first = True
+    if export_format == 'json':
+        yield '['
+    for row in rows:
+        line = json.dumps(dict(zip(header, row)))
+        if export_format == 'json':
+            line = line if first else ',' + line
+            first = False
+        else:
+            line += '\n'
+        chunk.append(line)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+    if export_format == 'json':
+        yield ']'
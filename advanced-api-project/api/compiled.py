@@ -0,0 +1,178 @@
+"""
+Compiled read-only serialization.
+
+A ``ModelSerializer`` builds a model instance per row, then walks its bound
+fields calling ``get_attribute`` / ``to_representation`` on each - per row,
+per field. For list pages of plain columns nearly all of that is overhead.
+
+``compile_serializer`` inspects a serializer class once and returns a
+``CompiledSerializer`` that reads rows straight from ``values_list()`` and
+turns each tuple into a dict with ``zip``, only calling a field's
+``to_representation`` where the database value is not already what the
+field would output (dates, decimals, ...). A nested ``many=True`` serializer
+over a reverse foreign key (``AuthorSerializer.books``) costs one extra
+query per page, grouped in Python.
+
+Anything the compiler does not understand - method fields, custom
+``to_representation``, hyperlinks, dotted sources through relations, M2M -
+raises ``NotCompilable``, and callers fall back to the stock serializer.
+Writes always use the stock serializer. ``CompiledReadMixin`` wires this into
+a view's ``list`` when ``API_COMPILED_READS`` is on.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from . import profiling
+from .sparse import SPARSE_PLAN_CACHE_SIZE, normalize, selection_for, serializer_for
+
+API_COMPILED_READS = getattr(settings, 'API_COMPILED_READS', False)
+
+# Fields whose to_representation() returns database values unchanged
+IDENTITY_FIELDS = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.BooleanField,
+    serializers.ReadOnlyField,
+)
+
+
+class NotCompilable(Exception):
+    pass
+
+
+class CompiledSerializer:
+    """Serialize querysets of ``model`` the way ``serializer_class`` would."""
+
+    def __init__(self, serializer_class, selection=None):
+        serializer = serializer_for(serializer_class, selection)
+        if type(serializer).to_representation is not serializers.ModelSerializer.to_representation:
+            raise NotCompilable(f'{serializer_class.__name__} overrides to_representation()')
+        self.model = serializer.Meta.model
+        pk_name = self.model._meta.pk.attname
+        # The pk is always fetched first, to group nested rows by
+        self.keys = [pk_name]
+        self.names = []
+        self.converters = []
+        self.nested = []
+        for field in serializer._readable_fields:
+            self._add(field)
+
+    def _add(self, field):
+        if field.source == '*' or '.' in field.source:
+            raise NotCompilable(f'field {field.field_name!r} has source {field.source!r}')
+        if isinstance(field, serializers.ListSerializer) or isinstance(field, ManyRelatedField):
+            self._add_nested(field)
+            return
+        model_field = self._model_field(field.source)
+        if isinstance(field, PrimaryKeyRelatedField):
+            if field.pk_field is not None or not model_field.many_to_one:
+                raise NotCompilable(f'related field {field.field_name!r} is not a plain foreign key')
+            convert = None
+        elif isinstance(field, (serializers.RelatedField, serializers.BaseSerializer)):
+            raise NotCompilable(f'field {field.field_name!r} ({type(field).__name__}) is not supported')
+        elif model_field.is_relation:
+            raise NotCompilable(f'field {field.field_name!r} reads a relation')
+        else:
+            convert = None if isinstance(field, IDENTITY_FIELDS) else field.to_representation
+        self.keys.append(field.source)
+        self.names.append(field.field_name)
+        self.converters.append(convert)
+
+    def _add_nested(self, field):
+        child = field.child if isinstance(field, serializers.ListSerializer) else None
+        relation = self._model_field(field.source)
+        if child is None or not relation.one_to_many:
+            raise NotCompilable(f'field {field.field_name!r} is not a nested reverse foreign key')
+        selection = getattr(child, 'selection', None)
+        self.nested.append((field.field_name, relation.field.attname, compile_serializer(type(child), selection)))
+
+    def _model_field(self, name):
+        try:
+            return self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise NotCompilable(f'{name!r} is not a field of {self.model.__name__}')
+
+    def rows(self, queryset):
+        """``queryset`` as the ``values_list()`` this serializer reads."""
+        return queryset.values_list(*self.keys)
+
+    def to_dicts(self, rows):
+        """Turn rows from ``rows()`` into serialized dicts."""
+        names = self.names
+        converters = [(i, c) for i, c in enumerate(self.converters) if c is not None]
+        if not converters:
+            result = [dict(zip(names, row[1:])) for row in rows]
+        else:
+            result = []
+            for row in rows:
+                values = list(row[1:])
+                for i, convert in converters:
+                    if values[i] is not None:
+                        values[i] = convert(values[i])
+                result.append(dict(zip(names, values)))
+        for name, fk, child in self.nested:
+            pks = [row[0] for row in rows]
+            # Same query (and so the same order) as prefetch_related(name)
+            child_rows = list(
+                child.model._default_manager.filter(**{f'{fk}__in': pks}).values_list(fk, *child.keys)
+            )
+            grouped = {pk: [] for pk in pks}
+            children = child.to_dicts([child_row[1:] for child_row in child_rows])
+            for child_row, data in zip(child_rows, children):
+                grouped[child_row[0]].append(data)
+            for data, pk in zip(result, pks):
+                data[name] = grouped[pk]
+        return result
+
+    def serialize(self, queryset):
+        return self.to_dicts(list(self.rows(queryset)))
+
+
+@lru_cache(maxsize=SPARSE_PLAN_CACHE_SIZE)
+def _compile(serializer_class, selection):
+    try:
+        return CompiledSerializer(serializer_class, selection)
+    except NotCompilable as exc:
+        return exc
+
+
+def compile_serializer(serializer_class, selection=None):
+    """The (cached) ``CompiledSerializer`` of ``serializer_class``.
+
+    ``selection`` is a sparse-fieldset ``api.sparse.Selection``; only the
+    selected columns are then read. Raises ``NotCompilable`` (also cached)
+    if it cannot be compiled.
+    """
+    compiled = _compile(serializer_class, normalize(selection, serializer_class))
+    if isinstance(compiled, NotCompilable):
+        raise compiled
+    return compiled
+
+
+class CompiledReadMixin:
+    """``list`` through the compiled serializer when it can be used."""
+
+    def get_compiled_serializer(self):
+        if not API_COMPILED_READS:
+            return None
+        try:
+            return compile_serializer(self.get_serializer_class(), selection_for(self.request))
+        except NotCompilable:
+            return None
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+        rows = compiled.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        with profiling.serializing():
+            data = compiled.to_dicts(list(rows if page is None else page))
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,78 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.compiled import compile_serializer
+from api.models import Author, Book
+from api.serializers import AuthorSerializer, BookSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/sec of the stock and compiled read serializers for Book "
+        "and Author (with nested books). Sample rows are created in a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help="Books to create.")
+        parser.add_argument('--books-per-author', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per case; the best is reported.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._populate(options['rows'], options['books_per_author'])
+                cases = [
+                    ('Book', BookSerializer, Book.objects.order_by('pk'), Book.objects.order_by('pk')),
+                    ('Author', AuthorSerializer, Author.objects.order_by('pk').prefetch_related('books'),
+                     Author.objects.order_by('pk')),
+                ]
+                for label, serializer_class, stock_queryset, compiled_queryset in cases:
+                    self._compare(label, serializer_class, stock_queryset, compiled_queryset, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _populate(self, rows, books_per_author):
+        owner = get_user_model().objects.create(username='benchmark-serializers')
+        authors = Author.objects.bulk_create(
+            Author(name=f'Author {i}') for i in range(max(1, rows // max(1, books_per_author)))
+        )
+        Book.objects.bulk_create(
+            (Book(title=f'Book {i}', publication_year=1900 + i % 120,
+                  author=authors[i % len(authors)], owner=owner if i % 2 else None)
+             for i in range(rows)),
+            batch_size=1000,
+        )
+
+    def _best(self, func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def _compare(self, label, serializer_class, stock_queryset, compiled_queryset, repeat):
+        compiled = compile_serializer(serializer_class)
+        stock_time, stock = self._best(
+            lambda: serializer_class(stock_queryset.all(), many=True).data, repeat
+        )
+        compiled_time, fast = self._best(lambda: compiled.serialize(compiled_queryset.all()), repeat)
+        if [dict(row) for row in stock] != fast:
+            raise CommandError(f"{label}: compiled output differs from {serializer_class.__name__}")
+        rows = len(fast)
+        self.stdout.write(
+            f"{label:<7} {rows:>7} rows  "
+            f"stock {rows / stock_time:>10.0f} rows/s  "
+            f"compiled {rows / compiled_time:>10.0f} rows/s  "
+            f"x{stock_time / compiled_time:.1f}"
+        )
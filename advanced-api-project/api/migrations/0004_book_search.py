@@ -0,0 +1,58 @@
+"""
+Create the substring index used by api.search.BookSearchFilter.
+
+An FTS5 table with the trigram tokenizer on SQLite, a text table with a
+pg_trgm GIN index on PostgreSQL (the extension needs to be installable by
+the migrating role), nothing elsewhere (search falls back to icontains).
+Existing books are indexed here.
+"""
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE api_book_search USING fts5(title, author_name, tokenize = 'trigram')",
+    "INSERT INTO api_book_search (rowid, title, author_name) "
+    "SELECT b.id, b.title, a.name FROM api_book b JOIN api_author a ON a.id = b.author_id",
+]
+SQLITE_BACKWARD = ["DROP TABLE IF EXISTS api_book_search"]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE TABLE api_book_search ("
+    "book_id bigint PRIMARY KEY REFERENCES api_book (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "document text NOT NULL)",
+    "CREATE INDEX api_book_search_document_trgm ON api_book_search USING GIN (document gin_trgm_ops)",
+    "INSERT INTO api_book_search (book_id, document) "
+    "SELECT b.id, b.title || E'\\n' || a.name FROM api_book b JOIN api_author a ON a.id = b.author_id",
+]
+POSTGRES_BACKWARD = ["DROP TABLE IF EXISTS api_book_search"]
+
+STATEMENTS = {
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+    'postgresql': (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+}
+
+
+def _run(schema_editor, direction):
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements:
+        for sql in statements[direction]:
+            schema_editor.execute(sql)
+
+
+def create_index(apps, schema_editor):
+    _run(schema_editor, 0)
+
+
+def drop_index(apps, schema_editor):
+    _run(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_book_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -2,7 +2,7 @@ from django.db import models
 from django.conf import settings
 
 class Author(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
 
     def __str__(self):
         return self.name
@@ -11,7 +11,8 @@ class Author(models.Model):
 class Book(models.Model):
     title = models.CharField(max_length=200)
     publication_year = models.IntegerField()
-    author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='books')
+    # Indexed through api_book_author_title_idx below
+    author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='books', db_index=False)
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -20,5 +21,16 @@ class Book(models.Model):
         blank=True,
     )
 
+    class Meta:
+        # One index per supported filter, each followed by the default
+        # ordering (title) so filtered lists come back pre-sorted. Ordering by
+        # publication_year or author alone uses the same indexes; search goes
+        # through the api_book_search table (see api/search.py).
+        indexes = [
+            models.Index(fields=['title', 'id'], name='api_book_title_idx'),
+            models.Index(fields=['author', 'title'], name='api_book_author_title_idx'),
+            models.Index(fields=['publication_year', 'title'], name='api_book_year_title_idx'),
+        ]
+
     def __str__(self):
         return self.title
@@ -0,0 +1,55 @@
+"""
+Streaming parsers for bulk Book imports.
+
+Both return a lazy iterator of row dicts read straight from the request
+stream, so a large upload is validated and written batch by batch without
+holding the whole body (or all rows) in memory.
+"""
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def _lines(stream, parser_context):
+    if stream is None:
+        return
+    encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+    try:
+        yield from codecs.iterdecode(stream, encoding)
+    except UnicodeDecodeError as exc:
+        raise ParseError(f'Request body is not valid {encoding}: {exc}')
+
+
+class CSVParser(BaseParser):
+    """``text/csv`` with a header row; yields one dict per data row."""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return self._rows(csv.DictReader(_lines(stream, parser_context)))
+
+    def _rows(self, reader):
+        try:
+            yield from reader
+        except csv.Error as exc:
+            raise ParseError(f'CSV parse error on line {reader.line_num}: {exc}')
+
+
+class NDJSONParser(BaseParser):
+    """Newline-delimited JSON (one object per line); blank lines are skipped."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return self._rows(_lines(stream, parser_context))
+
+    def _rows(self, lines):
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                raise ParseError(f'NDJSON parse error on line {number}: {exc}')
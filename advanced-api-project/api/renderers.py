@@ -0,0 +1,259 @@
+"""
+Compact alternatives to ``JSONRenderer``, picked by content negotiation.
+
+``Accept: application/msgpack`` (or ``?format=msgpack``) renders MessagePack.
+The ``msgpack`` package is used when it is installed; otherwise the small
+encoder below writes the same bytes. ``unpackb`` decodes them again, for
+tests and Python clients.
+
+``Accept: application/vnd.columnar+json`` (or ``?format=columnar``) renders
+JSON in which every list of objects sharing the same keys - a list of books,
+the books nested in each author - becomes::
+
+    {"columns": ["id", "title", ...], "rows": [[1, "Hello", ...], ...]}
+
+so the keys are written once per list rather than once per object. Other
+values, including empty lists, are rendered unchanged.
+
+Values JSON cannot hold natively (datetimes, decimals, UUIDs...) are turned
+into the same strings and numbers ``JSONRenderer`` would use.
+"""
+import struct
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:  # pure-Python encoder below
+    msgpack = None
+
+_encoder = JSONEncoder()
+
+_UINT8 = struct.Struct('>B').pack
+_UINT16 = struct.Struct('>H').pack
+_UINT32 = struct.Struct('>I').pack
+_UINT64 = struct.Struct('>Q').pack
+_INT8 = struct.Struct('>b').pack
+_INT16 = struct.Struct('>h').pack
+_INT32 = struct.Struct('>i').pack
+_INT64 = struct.Struct('>q').pack
+_FLOAT64 = struct.Struct('>d').pack
+
+
+def _pack_int(value, out):
+    if 0 <= value < 0x80:
+        out.append(_UINT8(value))
+    elif -0x20 <= value < 0:
+        out.append(_INT8(value))
+    elif value >= 0:
+        if value <= 0xff:
+            out.append(b'\xcc' + _UINT8(value))
+        elif value <= 0xffff:
+            out.append(b'\xcd' + _UINT16(value))
+        elif value <= 0xffffffff:
+            out.append(b'\xce' + _UINT32(value))
+        elif value <= 0xffffffffffffffff:
+            out.append(b'\xcf' + _UINT64(value))
+        else:
+            raise OverflowError(f'{value} does not fit in 64 bits')
+    elif value >= -0x80:
+        out.append(b'\xd0' + _INT8(value))
+    elif value >= -0x8000:
+        out.append(b'\xd1' + _INT16(value))
+    elif value >= -0x80000000:
+        out.append(b'\xd2' + _INT32(value))
+    elif value >= -0x8000000000000000:
+        out.append(b'\xd3' + _INT64(value))
+    else:
+        raise OverflowError(f'{value} does not fit in 64 bits')
+
+
+def _header(size, fix, fix_limit, codes):
+    if size < fix_limit:
+        return _UINT8(fix | size)
+    if size <= 0xff and codes[0] is not None:
+        return codes[0] + _UINT8(size)
+    if size <= 0xffff:
+        return codes[1] + _UINT16(size)
+    return codes[2] + _UINT32(size)
+
+
+_STR_CODES = (b'\xd9', b'\xda', b'\xdb')
+_BIN_CODES = (b'\xc4', b'\xc5', b'\xc6')
+_MAP_CODES = (None, b'\xde', b'\xdf')
+_ARRAY_CODES = (None, b'\xdc', b'\xdd')
+# Strings this short are memoized per call: keys repeat on every object
+_MEMO_MAX_LENGTH = 64
+
+
+def _pack(value, out, memo):
+    # Exact type checks first: they cover nearly every value a serializer emits
+    kind = type(value)
+    if kind is str:
+        packed = memo.get(value)
+        if packed is None:
+            data = value.encode('utf-8')
+            packed = _header(len(data), 0xa0, 32, _STR_CODES) + data
+            if len(value) <= _MEMO_MAX_LENGTH:
+                memo[value] = packed
+        out.append(packed)
+    elif kind is int:
+        _pack_int(value, out)
+    elif value is None:
+        out.append(b'\xc0')
+    elif kind is bool:
+        out.append(b'\xc3' if value else b'\xc2')
+    elif isinstance(value, dict):
+        out.append(_header(len(value), 0x80, 16, _MAP_CODES))
+        for key, item in value.items():
+            _pack(key, out, memo)
+            _pack(item, out, memo)
+    elif isinstance(value, (list, tuple)):
+        out.append(_header(len(value), 0x90, 16, _ARRAY_CODES))
+        for item in value:
+            _pack(item, out, memo)
+    elif kind is float:
+        out.append(b'\xcb' + _FLOAT64(value))
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        data = bytes(value)
+        out.append(_header(len(data), 0, 0, _BIN_CODES) + data)
+    elif isinstance(value, str):
+        _pack(str(value), out, memo)
+    elif isinstance(value, int):
+        _pack(int(value), out, memo)
+    else:
+        _pack(_encoder.default(value), out, memo)
+
+
+def packb(value):
+    """Encode ``value`` as MessagePack."""
+    if msgpack is not None:
+        return msgpack.packb(value, default=_encoder.default, use_bin_type=True)
+    out = []
+    _pack(value, out, {})
+    return b''.join(out)
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def take(self, size):
+        start = self.pos
+        self.pos += size
+        if self.pos > len(self.data):
+            raise ValueError('truncated MessagePack data')
+        return self.data[start:self.pos]
+
+    def unpack(self, fmt, size):
+        return struct.unpack(fmt, self.take(size))[0]
+
+    def read(self):
+        code = self.take(1)[0]
+        if code <= 0x7f:
+            return code
+        if code >= 0xe0:
+            return code - 0x100
+        if 0xa0 <= code <= 0xbf:
+            return str(self.take(code & 0x1f), 'utf-8')
+        if 0x90 <= code <= 0x9f:
+            return [self.read() for _ in range(code & 0x0f)]
+        if 0x80 <= code <= 0x8f:
+            return self.read_map(code & 0x0f)
+        if code == 0xc0:
+            return None
+        if code in (0xc2, 0xc3):
+            return code == 0xc3
+        if code in _SIZED:
+            fmt, size, kind = _SIZED[code]
+            length = self.unpack(fmt, size)
+            if kind == 'str':
+                return str(self.take(length), 'utf-8')
+            if kind == 'bin':
+                return bytes(self.take(length))
+            if kind == 'array':
+                return [self.read() for _ in range(length)]
+            return self.read_map(length)
+        if code in _SCALARS:
+            fmt, size = _SCALARS[code]
+            return self.unpack(fmt, size)
+        raise ValueError(f'unsupported MessagePack type 0x{code:02x}')
+
+    def read_map(self, length):
+        result = {}
+        for _ in range(length):
+            key = self.read()
+            result[key] = self.read()
+        return result
+
+
+_SIZED = {
+    0xd9: ('>B', 1, 'str'), 0xda: ('>H', 2, 'str'), 0xdb: ('>I', 4, 'str'),
+    0xc4: ('>B', 1, 'bin'), 0xc5: ('>H', 2, 'bin'), 0xc6: ('>I', 4, 'bin'),
+    0xdc: ('>H', 2, 'array'), 0xdd: ('>I', 4, 'array'),
+    0xde: ('>H', 2, 'map'), 0xdf: ('>I', 4, 'map'),
+}
+_SCALARS = {
+    0xcc: ('>B', 1), 0xcd: ('>H', 2), 0xce: ('>I', 4), 0xcf: ('>Q', 8),
+    0xd0: ('>b', 1), 0xd1: ('>h', 2), 0xd2: ('>i', 4), 0xd3: ('>q', 8),
+    0xca: ('>f', 4), 0xcb: ('>d', 8),
+}
+
+
+def unpackb(data):
+    """Decode one MessagePack value produced by ``packb``."""
+    reader = _Reader(data)
+    value = reader.read()
+    if reader.pos != len(reader.data):
+        raise ValueError('extra data after MessagePack value')
+    return value
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return packb(data)
+
+
+_CONTAINERS = (dict, list)
+
+
+def _columnar_rows(objects, columns):
+    # A column is only scanned for nested lists/objects if the first row
+    # holds one there (or None): serializer fields keep their shape per row
+    nested = [i for i, item in enumerate(objects[0].values()) if item is None or isinstance(item, _CONTAINERS)]
+    rows = [list(item.values()) for item in objects]
+    for i in nested:
+        for row in rows:
+            if isinstance(row[i], _CONTAINERS):
+                row[i] = columnar(row[i])
+    return {'columns': list(columns), 'rows': rows}
+
+
+def columnar(value):
+    """``value`` with every list of same-keyed dicts turned into columns/rows."""
+    if isinstance(value, dict):
+        return {key: columnar(item) if isinstance(item, _CONTAINERS) else item for key, item in value.items()}
+    if value and isinstance(value[0], dict):
+        columns = tuple(value[0])
+        if all(isinstance(item, dict) and tuple(item) == columns for item in value):
+            return _columnar_rows(value, columns)
+    return [columnar(item) if isinstance(item, _CONTAINERS) else item for item in value]
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = 'application/vnd.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, _CONTAINERS):
+            data = columnar(data)
+        return super().render(data, accepted_media_type, renderer_context)
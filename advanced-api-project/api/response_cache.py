@@ -0,0 +1,143 @@
+"""
+Cached GET responses for the read-mostly book endpoints.
+
+Every Book or Author write bumps a generation counter (``signals.py``, plus
+``api.bulk`` whose bulk writes send no signals). Serialized list and detail
+data is cached under a key built from that generation, the view, the object
+pk and the request's *normalized* query parameters - only the filter, search,
+ordering, pagination, projection (``?fields=`` & co) and format parameters
+the view understands, sorted - so
+a write never needs to find and evict keys: the next read simply looks under
+the new generation and old entries expire after ``BOOK_CACHE_TTL``.
+
+The key (with the negotiated format, as ``Accept`` may pick JSON or
+MessagePack for the same data) doubles as the ETag, so a client revalidating
+with ``If-None-Match`` gets a 304 without the data being loaded at all. When a hot key is missing,
+one worker takes a short lock (``cache.add``) and rebuilds it; the others
+wait up to ``BOOK_CACHE_LOCK_WAIT`` seconds for the entry rather than all
+querying at once, and build it themselves only if it never shows up.
+
+The counter lives in the default cache, so all processes must share it
+(Redis / Memcached) for a write in one to be seen by the others.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from . import sparse
+
+BOOK_CACHE_TTL = getattr(settings, 'BOOK_CACHE_TTL', 5 * 60)
+BOOK_CACHE_LOCK_TIMEOUT = getattr(settings, 'BOOK_CACHE_LOCK_TIMEOUT', 10)
+BOOK_CACHE_LOCK_WAIT = getattr(settings, 'BOOK_CACHE_LOCK_WAIT', 2.0)
+LOCK_POLL_INTERVAL = 0.05
+
+_PREFIX = 'api-books'
+GENERATION_KEY = f'{_PREFIX}:generation'
+
+PAGINATION_PARAMS = ('page', 'page_size', 'limit', 'offset', 'cursor')
+PROJECTION_PARAMS = (sparse.FIELDS_PARAM, sparse.EXCLUDE_PARAM, sparse.EXPAND_PARAM)
+
+
+def generation():
+    return cache.get_or_set(GENERATION_KEY, 0, None)
+
+
+def _incr():
+    # cache.incr() raises on missing keys; add() is a no-op on existing ones
+    cache.add(GENERATION_KEY, 0, None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        pass
+
+
+def bump_generation():
+    """Invalidate every cached book response.
+
+    Bumped right away and again once the surrounding transaction commits,
+    so a read racing the transaction cannot cache the old rows under the
+    new generation for good.
+    """
+    _incr()
+    transaction.on_commit(_incr)
+
+
+def normalized_params(request, view):
+    """The query parameters that can change ``view``'s response, sorted."""
+    names = {api_settings.SEARCH_PARAM, api_settings.ORDERING_PARAM, api_settings.URL_FORMAT_OVERRIDE}
+    names.update(getattr(view, 'filterset_fields', ()))
+    names.update(PAGINATION_PARAMS)
+    names.update(PROJECTION_PARAMS)
+    params = []
+    for name in sorted(names & set(request.query_params)):
+        values = sorted(value.strip() for value in request.query_params.getlist(name))
+        params.extend((name, value) for value in values if value)
+    return params
+
+
+class CachedReadMixin:
+    """Serve ``list`` / ``retrieve`` from the generation-keyed cache.
+
+    Only successful responses are cached. A cached detail skips
+    ``get_object()``, which is fine as long as every book is readable by
+    anyone (``IsAuthenticatedOrReadOnly``).
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(request, lambda: super(CachedReadMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(request, lambda: super(CachedReadMixin, self).retrieve(request, *args, **kwargs))
+
+    def _cache_key(self, request):
+        ident = repr((
+            type(self).__name__,
+            getattr(self, 'action', None) or request.method,
+            self.kwargs.get(self.lookup_url_kwarg or self.lookup_field),
+            normalized_params(request, self),
+        ))
+        digest = hashlib.md5(ident.encode()).hexdigest()
+        return f'{_PREFIX}:{generation()}:{digest}'
+
+    def _cached(self, request, build):
+        key = self._cache_key(request)
+        renderer = getattr(request, 'accepted_renderer', None)
+        etag = quote_etag(hashlib.md5(f'{key}:{getattr(renderer, "format", "")}'.encode()).hexdigest())
+        # Weak comparison: api.middleware weakens the ETag of compressed responses
+        if etag in {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(key)
+            response = self._build(key, build) if data is None else Response(data)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ('Accept',))
+        return response
+
+    def _build(self, key, build):
+        lock = f'{key}:lock'
+        if not cache.add(lock, 1, BOOK_CACHE_LOCK_TIMEOUT):
+            # Someone else is rebuilding this key: wait for their result
+            deadline = time.monotonic() + BOOK_CACHE_LOCK_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+                data = cache.get(key)
+                if data is not None:
+                    return Response(data)
+            return build()
+        try:
+            response = build()
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, BOOK_CACHE_TTL)
+            return response
+        finally:
+            cache.delete(lock)
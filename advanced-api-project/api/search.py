@@ -0,0 +1,216 @@
+"""
+Indexed ``?search=`` for books.
+
+DRF's ``SearchFilter`` turns every term into ``title ICONTAINS term OR
+author.name ICONTAINS term``, which no B-tree index can serve. Book titles
+and author names are instead copied into a substring (trigram) index, kept
+up to date by the signal handlers in ``signals.py`` and ``api.bulk``:
+
+* ``SQLiteTrigramBackend`` - an FTS5 table with the ``trigram`` tokenizer.
+* ``PostgresTrigramBackend`` - a text column with a ``pg_trgm`` GIN index,
+  queried with ILIKE.
+
+Matching keeps ``icontains`` semantics: every term must appear, anywhere,
+in the title or the author name. Trigram indexes cannot look up terms
+shorter than three characters; those (and every term on other databases)
+are still matched with ``icontains`` on the rows the index selected. The
+tables are created by migration ``0004_book_search``; ``manage.py
+rebuild_search_index`` re-populates them (e.g. after ``loaddata``).
+"""
+import operator
+from functools import reduce
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+# Shortest term a trigram index can look up
+MIN_TERM_LENGTH = 3
+
+
+class SearchBackend:
+    def index(self, book_ids):
+        """Add or replace the documents of ``book_ids``."""
+        raise NotImplementedError
+
+    def index_author(self, author_id):
+        """Re-index every book of ``author_id`` (after a rename)."""
+        raise NotImplementedError
+
+    def remove(self, book_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def matching(self, terms):
+        """A subquery of the ids of books matching all ``terms``."""
+        raise NotImplementedError
+
+
+class SQLiteTrigramBackend(SearchBackend):
+    table = 'api_book_search'
+
+    def _populate(self, condition, params):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid IN (SELECT b.id FROM api_book b WHERE {condition})', params
+            )
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, author_name) '
+                f'SELECT b.id, b.title, a.name FROM api_book b JOIN api_author a ON a.id = b.author_id '
+                f'WHERE {condition}',
+                params,
+            )
+
+    def index(self, book_ids):
+        book_ids = list(book_ids)
+        if book_ids:
+            self._populate(f"b.id IN ({', '.join(['%s'] * len(book_ids))})", book_ids)
+
+    def index_author(self, author_id):
+        self._populate('b.author_id = %s', [author_id])
+
+    def remove(self, book_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in book_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def matching(self, terms):
+        # Each term is quoted so FTS5 operators in user input are taken literally
+        match = ' AND '.join('"%s"' % term.replace('"', '""') for term in terms)
+        return RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [match])
+
+
+class PostgresTrigramBackend(SearchBackend):
+    table = 'api_book_search'
+    # Title and author name are kept apart by a newline, which no search
+    # term contains, so a term never matches across the two
+    document = "b.title || E'\\n' || a.name"
+
+    def _populate(self, condition, params):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {self.table} (book_id, document) '
+                f'SELECT b.id, {self.document} FROM api_book b JOIN api_author a ON a.id = b.author_id '
+                f'WHERE {condition} '
+                f'ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document',
+                params,
+            )
+
+    def index(self, book_ids):
+        book_ids = list(book_ids)
+        if book_ids:
+            self._populate('b.id = ANY(%s)', [book_ids])
+
+    def index_author(self, author_id):
+        self._populate('b.author_id = %s', [author_id])
+
+    def remove(self, book_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE book_id = ANY(%s)', [list(book_ids)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {self.table}')
+
+    def matching(self, terms):
+        patterns = [
+            '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            for term in terms
+        ]
+        where = ' AND '.join(['document ILIKE %s'] * len(patterns))
+        return RawSQL(f'SELECT book_id FROM {self.table} WHERE {where}', patterns)
+
+
+class NullBackend(SearchBackend):
+    """No index: ``BookSearchFilter`` matches every term with ``icontains``."""
+
+    def index(self, book_ids):
+        pass
+
+    def index_author(self, author_id):
+        pass
+
+    def remove(self, book_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def matching(self, terms):
+        return None
+
+
+BACKENDS = {
+    'sqlite': SQLiteTrigramBackend,
+    'postgresql': PostgresTrigramBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, NullBackend)()
+
+
+def index_books(book_ids):
+    get_backend().index(book_ids)
+
+
+def index_author(author_id):
+    get_backend().index_author(author_id)
+
+
+def remove_books(book_ids):
+    get_backend().remove(book_ids)
+
+
+def rebuild(batch_size=1000):
+    """Re-index every book; returns the number of books indexed."""
+    from .models import Book
+
+    backend = get_backend()
+    backend.clear()
+    indexed = 0
+    last_pk = 0
+    while True:
+        batch = list(Book.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return indexed
+        backend.index(batch)
+        indexed += len(batch)
+        last_pk = batch[-1]
+
+
+class BookSearchFilter(filters.SearchFilter):
+    """``SearchFilter`` answering ``?search=`` from the trigram index.
+
+    Terms of ``MIN_TERM_LENGTH`` characters or more go to the index; shorter
+    ones fall back to the usual ``icontains`` over the view's
+    ``search_fields``, applied to the rows the index already narrowed down.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if not search_fields or not search_terms:
+            return queryset
+
+        indexed = [term for term in search_terms if len(term) >= MIN_TERM_LENGTH]
+        subquery = get_backend().matching(indexed) if indexed else None
+        if subquery is None:
+            return super().filter_queryset(request, queryset, view)
+        queryset = queryset.filter(pk__in=subquery)
+
+        rest = [term for term in search_terms if len(term) < MIN_TERM_LENGTH]
+        if rest:
+            lookups = [self.construct_search(str(field), queryset) for field in search_fields]
+            conditions = (
+                reduce(operator.or_, (Q(**{lookup: term}) for lookup in lookups))
+                for term in rest
+            )
+            queryset = queryset.filter(reduce(operator.and_, conditions))
+        return queryset
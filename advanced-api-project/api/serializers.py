@@ -1,18 +1,26 @@
 from rest_framework import serializers
 from .models import Author, Book
+from .sparse import SparseFieldsMixin
 from datetime import date
 
-class BookSerializer(serializers.ModelSerializer):
+class AuthorSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Author
+        fields = ['id', 'name']
+
+class BookSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Reads honour ?fields= / ?exclude= / ?expand=author (api/sparse.py)
     class Meta:
         model = Book
         fields = '__all__'
+        expandable_fields = {'author': (AuthorSummarySerializer, {})}
 
     def validate_publication_year(self, value):
         if value > date.today().year:
             raise serializers.ValidationError("Publication year cannot be in the future.")
         return value
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     books = BookSerializer(many=True, read_only=True)
 
     class Meta:
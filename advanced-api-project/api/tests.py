@@ -1,10 +1,23 @@
-from django.urls import reverse
-from rest_framework import status
-from rest_framework.test import APITestCase
+import gzip
+import json
+import re
+import unittest
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection, transaction
 from django.contrib.auth import get_user_model
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers, status
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
 
+from . import authentication, bulk, compiled, profiling, renderers, response_cache, sparse
 from .models import Author, Book
+from .serializers import AuthorSerializer, BookSerializer
+from .views import BookViewSet
 
 
 User = get_user_model()
@@ -217,6 +230,480 @@ class BookAPITestCase(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.owner_token.key)
         resp = self.client.delete('/api/books/9999/')
         self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
-from django.test import TestCase
 
-# Create your tests here.
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    """Token lookups served from the auth cache and dropped on revocation."""
+
+    def setUp(self):
+        authentication.local_cache.clear()
+        self.user = User.objects.create_user(username='owner', password='pass')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = authentication.CachedTokenAuthentication()
+
+    def test_warm_lookup_runs_no_query(self):
+        self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual((user.pk, user.username, token.key), (self.user.pk, 'owner', self.token.key))
+
+    def test_unknown_keys_are_negatively_cached(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials('nope')
+        with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials('nope')
+
+    def test_revocation_and_deactivation(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+        # Without a signal the snapshot lives out its TTL
+        User.objects.filter(pk=self.user.pk).update(is_active=True)
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+        authentication.invalidate_users([self.user.pk])
+        self.auth.authenticate_credentials(self.token.key)
+
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+
+class BookBulkTestCase(APITestCase):
+    """Bulk import (JSON / CSV / NDJSON) and streamed export of books."""
+
+    def setUp(self):
+        authentication.local_cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass')
+        self.other = User.objects.create_user(username='other', password='pass')
+        self.author = Author.objects.create(name='Author A')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.owner).key)
+
+    def test_requires_auth(self):
+        self.client.credentials()
+        resp = self.client.post('/api/books/bulk/', [], format='json')
+        self.assertIn(resp.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+    def test_json_rows_with_errors_do_not_abort_batch(self):
+        rows = [
+            {'title': 'One', 'publication_year': 2001, 'author': self.author.id},
+            {'title': 'Two', 'publication_year': 2002, 'author_name': 'New Author'},
+            {'title': 'Three', 'publication_year': 2003, 'author_name': 'New Author'},
+            {'title': '', 'publication_year': 9999, 'author': self.author.id},
+            {'title': 'Ghost', 'publication_year': 2000, 'author': 999999},
+        ]
+        resp = self.client.post('/api/books/bulk/', rows, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        body = resp.json()
+        self.assertEqual(body['created'], 3)
+        self.assertEqual([e['row'] for e in body['errors']], [4, 5])
+        self.assertEqual(set(body['errors'][0]['errors']), {'title', 'publication_year'})
+        self.assertEqual(Author.objects.filter(name='New Author').count(), 1)
+        self.assertEqual(Book.objects.filter(owner=self.owner).count(), 3)
+
+    def test_batch_uses_constant_queries(self):
+        rows = [{'title': f'Book {i}', 'publication_year': 2000, 'author_name': f'Writer {i % 5}'}
+                for i in range(50)]
+        # authors by name, create authors, create books, index them (2)
+        # (+ savepoint/release)
+        with self.assertNumQueries(7):
+            report = bulk.import_books(rows, self.owner)
+        self.assertEqual((report.created, report.error_count), (50, 0))
+
+    def test_csv_and_ndjson_uploads(self):
+        body = 'title,publication_year,author_name\nCSV Book,1999,Author A\nBad,soon,Author A\n'
+        resp = self.client.post('/api/books/bulk/', body, content_type='text/csv')
+        self.assertEqual(resp.json()['created'], 1)
+        self.assertEqual(resp.json()['errors'][0]['row'], 2)
+        self.assertTrue(Book.objects.filter(title='CSV Book', author=self.author).exists())
+
+        body = '{"title": "ND Book", "publication_year": 2010, "author": %d}\n\nnot json\n' % self.author.id
+        resp = self.client.post('/api/books/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual(resp.json()['created'], 1)
+        self.assertEqual(resp.json()['error_count'], 1)
+
+    def test_upsert_updates_only_own_books(self):
+        Book.objects.create(title='Mine', publication_year=1990, author=self.author, owner=self.owner)
+        Book.objects.create(title='Theirs', publication_year=1990, author=self.author, owner=self.other)
+        rows = [
+            {'title': 'Mine', 'publication_year': 1995, 'author': self.author.id},
+            {'title': 'Theirs', 'publication_year': 1995, 'author': self.author.id},
+        ]
+        resp = self.client.post('/api/books/bulk/?upsert=true', rows, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual((resp.json()['created'], resp.json()['updated']), (0, 1))
+        self.assertEqual(resp.json()['errors'][0]['row'], 2)
+        self.assertEqual(Book.objects.get(title='Mine').publication_year, 1995)
+        self.assertEqual(Book.objects.get(title='Theirs').publication_year, 1990)
+
+    def test_export_formats_honour_filters(self):
+        Book.objects.create(title='Alpha', publication_year=2001, author=self.author, owner=self.owner)
+        Book.objects.create(title='Beta', publication_year=2002, author=self.author, owner=self.owner)
+
+        resp = self.client.get('/api/books/export/', {'export_format': 'csv', 'publication_year': 2001})
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,title,publication_year,author,author_name')
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Alpha', lines[1])
+
+        resp = self.client.get('/api/books/export/', {'export_format': 'json'})
+        data = json.loads(b''.join(resp.streaming_content))
+        self.assertEqual([b['title'] for b in data], ['Alpha', 'Beta'])
+        self.assertEqual(data[0]['author_name'], 'Author A')
+
+        resp = self.client.get('/api/books/export/', {'export_format': 'xml'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BookSearchTestCase(APITestCase):
+    """``?search=`` served from the trigram index, kept in sync on writes."""
+
+    def setUp(self):
+        self.author = Author.objects.create(name='Jane Austen')
+        self.emma = Book.objects.create(title='Emma', publication_year=1815, author=self.author)
+        Book.objects.create(title='Dracula', publication_year=1897, author=Author.objects.create(name='Bram Stoker'))
+
+    def search(self, query):
+        resp = self.client.get('/api/books/', {'search': query})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return [b['title'] for b in resp.json()]
+
+    def test_matches_substrings_of_title_and_author(self):
+        self.assertEqual(self.search('AUST'), ['Emma'])
+        self.assertEqual(self.search('acul stoker'), ['Dracula'])
+        self.assertEqual(self.search('emma stoker'), [])
+        # Two-letter terms are below the trigram size and use icontains
+        self.assertEqual(self.search('ra'), ['Dracula'])
+        self.assertEqual(self.search('bram ra'), ['Dracula'])
+
+    def test_index_follows_edits(self):
+        self.author.name = 'J. Austen-Leigh'
+        self.author.save()
+        self.assertEqual(self.search('leigh'), ['Emma'])
+
+        self.emma.title = 'Persuasion'
+        self.emma.save()
+        self.assertEqual(self.search('emma'), [])
+        self.assertEqual(self.search('suasion'), ['Persuasion'])
+
+        self.emma.delete()
+        self.assertEqual(self.search('leigh'), [])
+
+        bulk.import_books([{'title': 'Carmilla', 'publication_year': 1872, 'author_name': 'Le Fanu'}], None)
+        self.assertEqual(self.search('fanu'), ['Carmilla'])
+
+
+class QueryPlanTestCase(APITestCase):
+    """EXPLAIN every supported list query shape; none may fall back to a scan.
+
+    Filtered shapes must look rows up through an index, and shapes ordered
+    by a supported field must read rows in index order instead of sorting
+    them (search results, a small matched set, may be sorted). Search terms
+    shorter than ``api.search.MIN_TERM_LENGTH`` are not indexable and are
+    not covered.
+    """
+
+    # (query params, may sort)
+    SHAPES = [
+        ({}, False),
+        ({'ordering': '-title'}, False),
+        ({'ordering': 'publication_year'}, False),
+        ({'ordering': '-publication_year'}, False),
+        ({'ordering': 'author'}, False),
+        ({'title': 'Emma'}, False),
+        ({'author': 1}, False),
+        ({'publication_year': 1815}, False),
+        ({'search': 'austen'}, True),
+        ({'search': 'emma austen', 'publication_year': 1815}, True),
+    ]
+
+    def setUp(self):
+        author = Author.objects.create(name='Jane Austen')
+        Book.objects.create(title='Emma', publication_year=1815, author=author)
+
+    def queryset(self, params):
+        request = Request(APIRequestFactory().get('/api/books/', params))
+        view = BookViewSet(request=request, format_kwarg=None, action='list')
+        return view.filter_queryset(view.get_queryset())
+
+    def plan_problems(self, queryset, filtered, may_sort):
+        if connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            scans = re.findall(r'SCAN (api_book|api_author)\b(?! USING)', plan)
+            if filtered:
+                scans += re.findall(r'SCAN (api_book|api_author)\b', plan)
+            sort = 'USE TEMP B-TREE FOR ORDER BY' in plan
+        else:
+            # Tiny test tables are always cheaper to scan; only accept a
+            # sequential scan if no index could do the job
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                    cursor.execute('SET LOCAL enable_sort = off')
+                plan = queryset.explain()
+            scans = re.findall(r'Seq Scan on (api_book|api_author)\b', plan)
+            sort = bool(re.search(r'\bSort\b', plan))
+        problems = [f'full scan of {table}' for table in sorted(set(scans))]
+        if sort and not may_sort:
+            problems.append('sort instead of index order')
+        return problems, plan
+
+    @unittest.skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'EXPLAIN output not understood')
+    def test_supported_query_shapes_use_indexes(self):
+        for params, may_sort in self.SHAPES:
+            filtered = bool(set(params) - {'ordering'})
+            with self.subTest(params=params):
+                problems, plan = self.plan_problems(self.queryset(params), filtered, may_sort)
+                self.assertEqual(problems, [], plan)
+
+
+class BookResponseCacheTestCase(APITestCase):
+    """list/retrieve served from the generation-keyed response cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass')
+        self.author = Author.objects.create(name='Author A')
+        self.book = Book.objects.create(title='Emma', publication_year=1815, author=self.author, owner=self.owner)
+
+    def test_repeat_reads_need_no_queries(self):
+        first = self.client.get('/api/books/', {'ordering': 'title', 'junk': 1})
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/books/', {'ordering': 'title ', 'other': 2})
+        self.assertEqual(first.json(), second.json())
+
+        self.client.get(f'/api/books/{self.book.pk}/')
+        with self.assertNumQueries(0):
+            resp = self.client.get(f'/api/books/{self.book.pk}/')
+        self.assertEqual(resp.json()['title'], 'Emma')
+
+    def test_writes_invalidate(self):
+        self.client.get('/api/books/')
+        self.client.force_authenticate(self.owner)
+        self.client.patch(f'/api/books/{self.book.pk}/', {'title': 'Persuasion'})
+        self.assertEqual([b['title'] for b in self.client.get('/api/books/').json()], ['Persuasion'])
+
+        bulk.import_books([{'title': 'Sanditon', 'publication_year': 1817, 'author': self.author.pk}], self.owner)
+        self.assertEqual(len(self.client.get('/api/books/').json()), 2)
+
+        # Author names are searchable, so author writes count too
+        self.client.get('/api/books/', {'search': 'writer'})
+        self.author.name = 'Writer'
+        self.author.save()
+        self.assertEqual(len(self.client.get('/api/books/', {'search': 'writer'}).json()), 2)
+
+    def test_etag_revalidation(self):
+        resp = self.client.get('/api/books/')
+        etag = resp['ETag']
+        with self.assertNumQueries(0):
+            resp = self.client.get('/api/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Book.objects.create(title='Sanditon', publication_year=1817, author=self.author)
+        resp = self.client.get('/api/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_stampede_lock_waits_for_the_rebuilding_worker(self):
+        request = Request(APIRequestFactory().get('/api/books/'))
+        key = BookViewSet(request=request, format_kwarg=None, action='list', kwargs={})._cache_key(request)
+        # Another worker holds the lock and stores its result while we wait
+        cache.add(f'{key}:lock', 1)
+
+        def other_worker_finishes(seconds):
+            cache.set(key, [{'title': 'Built elsewhere'}])
+
+        with mock.patch.object(response_cache.time, 'sleep', side_effect=other_worker_finishes), \
+                self.assertNumQueries(0):
+            resp = self.client.get('/api/books/')
+        self.assertEqual(resp.json(), [{'title': 'Built elsewhere'}])
+
+
+class CompiledSerializerTestCase(APITestCase):
+    """The compiled read path must produce exactly what the serializers do."""
+
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(username='owner', password='pass')
+        self.austen = Author.objects.create(name='Jane Austen')
+        Author.objects.create(name='No Books Yet')
+        Book.objects.create(title='Emma', publication_year=1815, author=self.austen, owner=owner)
+        Book.objects.create(title='Persuasion', publication_year=1817, author=self.austen)
+
+    def test_matches_stock_serializers(self):
+        books = Book.objects.order_by('pk')
+        self.assertEqual(
+            compiled.compile_serializer(BookSerializer).serialize(books),
+            BookSerializer(books, many=True).data,
+        )
+        authors = Author.objects.order_by('pk')
+        with self.assertNumQueries(2):
+            fast = compiled.compile_serializer(AuthorSerializer).serialize(authors)
+        self.assertEqual(fast, AuthorSerializer(authors.prefetch_related('books'), many=True).data)
+
+    def test_list_view_uses_compiled_path(self):
+        to_dicts = compiled.CompiledSerializer.to_dicts
+        with mock.patch.object(compiled, 'API_COMPILED_READS', True), \
+                mock.patch.object(compiled.CompiledSerializer, 'to_dicts', autospec=True, side_effect=to_dicts) as spy:
+            resp = self.client.get('/api/books/', {'ordering': '-publication_year'})
+        spy.assert_called_once()
+        self.assertEqual(resp.json(), BookSerializer(Book.objects.order_by('-publication_year'), many=True).data)
+
+    def test_unsupported_serializers_are_not_compiled(self):
+        class DecoratedBookSerializer(BookSerializer):
+            label = serializers.SerializerMethodField()
+
+            def get_label(self, book):
+                return str(book)
+
+        with self.assertRaises(compiled.NotCompilable):
+            compiled.compile_serializer(DecoratedBookSerializer)
+
+
+class SparseFieldsTestCase(APITestCase):
+    """?fields= / ?exclude= / ?expand= trim responses and the columns read."""
+
+    def setUp(self):
+        cache.clear()
+        self.austen = Author.objects.create(name='Jane Austen')
+        self.emma = Book.objects.create(title='Emma', publication_year=1815, author=self.austen)
+        Book.objects.create(title='Persuasion', publication_year=1817, author=self.austen)
+
+    def test_fields_select_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get('/api/books/', {'fields': 'id,title', 'ordering': 'title'})
+        self.assertEqual(resp.json(), [{'id': self.emma.pk, 'title': 'Emma'}, {'id': self.emma.pk + 1, 'title': 'Persuasion'}])
+        sql = queries[-1]['sql']
+        self.assertIn('"title"', sql)
+        self.assertNotIn('"publication_year"', sql)
+
+    def test_detail_exclude_narrows_queryset(self):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(f'/api/books/{self.emma.pk}/', {'exclude': 'owner,author'})
+        self.assertEqual(set(resp.json()), {'id', 'title', 'publication_year'})
+        self.assertNotIn('"owner_id"', queries[-1]['sql'])
+
+    def test_expand_author_in_one_query(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get(f'/api/books/{self.emma.pk}/', {'expand': 'author', 'fields': 'title,author'})
+        self.assertEqual(resp.json(), {'title': 'Emma', 'author': {'id': self.austen.pk, 'name': 'Jane Austen'}})
+
+    def test_selection_is_part_of_the_cache_key(self):
+        full = self.client.get('/api/books/').json()
+        sparse = self.client.get('/api/books/', {'fields': 'title'}).json()
+        self.assertEqual(set(full[0]), {'id', 'title', 'publication_year', 'author', 'owner'})
+        self.assertEqual(set(sparse[0]), {'title'})
+
+    def test_nested_selection_in_compiled_author_serializer(self):
+        request = Request(APIRequestFactory().get('/', {'fields': 'name,books.title'}))
+        selection = sparse.selection_for(request)
+        data = compiled.compile_serializer(AuthorSerializer, selection).serialize(Author.objects.all())
+        self.assertEqual(data, [{'name': 'Jane Austen', 'books': [{'title': 'Emma'}, {'title': 'Persuasion'}]}])
+
+    def test_unknown_names_share_one_plan(self):
+        def selection(**params):
+            return sparse.normalize(sparse.selection_for(Request(APIRequestFactory().get('/', params))), AuthorSerializer)
+
+        plain = selection(fields='name,books.title')
+        for junk in ('name,books.title,nope', 'name,nope.x,books.title,books.zzz', 'name,books.title,books.nope.x'):
+            self.assertEqual(selection(fields=junk, exclude='missing', expand='books.nothing'), plain)
+        self.assertIs(compiled.compile_serializer(AuthorSerializer, selection(fields='name,junk')),
+                      compiled.compile_serializer(AuthorSerializer, selection(fields='name')))
+
+        sparse._load_plan.cache_clear()
+        for i in range(20):
+            self.client.get('/api/books/', {'fields': f'id,title,junk{i}'})
+        self.assertEqual(sparse._load_plan.cache_info().currsize, 1)
+
+
+class ResponseFormatTestCase(APITestCase):
+    """MessagePack / columnar renderers and response compression."""
+
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(name='Jane Austen')
+        for i in range(20):
+            Book.objects.create(title=f'Volume {i}', publication_year=1800 + i, author=author)
+
+    def test_msgpack_matches_json(self):
+        data = self.client.get('/api/books/').json()
+        resp = self.client.get('/api/books/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(resp['Content-Type'], 'application/msgpack')
+        self.assertEqual(renderers.unpackb(resp.content), data)
+        with mock.patch.object(renderers, 'msgpack', None):
+            self.assertEqual(renderers.unpackb(renderers.packb(data)), data)
+
+    def test_columnar_json(self):
+        data = self.client.get('/api/books/').json()
+        resp = self.client.get('/api/books/', {'format': 'columnar'})
+        self.assertEqual(resp.json(), {
+            'columns': list(data[0]),
+            'rows': [list(book.values()) for book in data],
+        })
+
+    def test_formats_get_their_own_etag(self):
+        json_etag = self.client.get('/api/books/')['ETag']
+        resp = self.client.get('/api/books/', HTTP_ACCEPT='application/msgpack', HTTP_IF_NONE_MATCH=json_etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertIn('Accept', resp['Vary'])
+
+    def test_compressed_response_revalidates_with_weak_etag(self):
+        plain = self.client.get('/api/books/')
+        resp = self.client.get('/api/books/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(resp.content), plain.content)
+        self.assertEqual(resp['ETag'], 'W/' + plain['ETag'])
+        resp = self.client.get('/api/books/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_html_is_never_compressed(self):
+        # The admin login page carries a CSRF token; compressing it would expose it to BREACH
+        resp = self.client.get('/admin/login/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertContains(resp, 'csrfmiddlewaretoken')
+        self.assertFalse(resp.has_header('Content-Encoding'))
+
+
+class ProfilingTestCase(APITestCase):
+    """Sampled request profiling and the /api/profiling/ report."""
+
+    def setUp(self):
+        cache.clear()
+        profiling.reset()
+        self.staff = User.objects.create_user(username='staff', password='pass', is_staff=True)
+        self.book = Book.objects.create(title='Emma', publication_year=1815,
+                                        author=Author.objects.create(name='Jane Austen'))
+
+    def tearDown(self):
+        profiling.reset()
+
+    def test_sampled_requests_are_reported_per_route(self):
+        with mock.patch.object(profiling, 'REQUEST_PROFILING_SAMPLE_RATE', 1.0):
+            self.client.get('/api/books/')
+            self.client.get(f'/api/books/{self.book.pk}/')
+        self.client.force_authenticate(self.staff)
+        resp = self.client.get('/api/profiling/')
+        routes = {route['route']: route for route in resp.json()['routes']}
+        self.assertEqual(set(routes), {'GET /api/books/', 'GET /api/books/<pk>/'})
+        self.assertGreater(routes['GET /api/books/']['queries']['max'], 0)
+        self.assertEqual(set(routes['GET /api/books/']['sql_ms']), {'p50', 'p95', 'p99', 'max'})
+        self.assertGreater(routes['GET /api/books/']['serialize_ms']['max'], 0)
+
+    def test_repeated_queries_are_reported(self):
+        def n_plus_one(book):
+            # One author query per book
+            return Author.objects.get(pk=book.author_id).name
+
+        Book.objects.create(title='Persuasion', publication_year=1817, author=self.book.author)
+        recorder = profiling.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            [n_plus_one(book) for book in Book.objects.all()]
+        (sql, repeats), = recorder.duplicates()
+        self.assertIn('"api_author"', sql)
+        self.assertEqual(repeats, 2)
+
+    def test_report_is_staff_only(self):
+        self.client.force_authenticate(User.objects.create_user(username='reader', password='pass'))
+        self.assertEqual(self.client.get('/api/profiling/').status_code, status.HTTP_403_FORBIDDEN)
@@ -1,11 +1,23 @@
-from rest_framework import generics, viewsets
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from django.http import StreamingHttpResponse
+from rest_framework import generics, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from django_filters import rest_framework as django_filters_rest
 from rest_framework import filters
 
+from . import bulk, profiling
+from .compiled import CompiledReadMixin
 from .models import Book
+from .parsers import CSVParser, NDJSONParser
+from .response_cache import CachedReadMixin
+from .search import BookSearchFilter
 from .serializers import BookSerializer
+from .sparse import SparseQuerysetMixin
 from .permissions import IsOwnerOrReadOnly  # your custom object-level permission
 
 
@@ -13,22 +25,22 @@ from .permissions import IsOwnerOrReadOnly  # your custom object-level permissio
 # Generic views (per-endpoint)
 # -------------------------
 
-class BookListView(generics.ListAPIView):
-    """GET: list books (readable by anyone)."""
+class BookListView(CachedReadMixin, CompiledReadMixin, SparseQuerysetMixin, generics.ListAPIView):
+    """GET: list books (readable by anyone, cached per query)."""
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     # enable filtering/search/order on this list view
-    filter_backends = [django_filters_rest.DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [django_filters_rest.DjangoFilterBackend, BookSearchFilter, filters.OrderingFilter]
     filterset_fields = ['title', 'author', 'publication_year']
     search_fields = ['title', 'author__name']
     ordering_fields = ['title', 'publication_year', 'author', 'id']
     ordering = ['title']
 
 
-class BookDetailView(generics.RetrieveAPIView):
-    """GET: retrieve a single book (readable by anyone)."""
+class BookDetailView(CachedReadMixin, SparseQuerysetMixin, generics.RetrieveAPIView):
+    """GET: retrieve a single book (readable by anyone, cached)."""
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -62,7 +74,7 @@ class BookDeleteView(generics.DestroyAPIView):
 # -------------------------
 # ViewSet (alternative)
 # -------------------------
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(CachedReadMixin, CompiledReadMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     A full CRUD ViewSet for Book with filtering, searching and ordering.
 
@@ -70,6 +82,15 @@ class BookViewSet(viewsets.ModelViewSet):
       - Filtering:    ?title=The%20Alchemist
       - Searching:    ?search=alchemist
       - Ordering:     ?ordering=-publication_year
+      - Projection:   ?fields=id,title  ?exclude=owner  ?expand=author
+
+    list/retrieve responses are cached until the next Book/Author write
+    (api/response_cache.py); list pages are built from values_list() rows
+    when API_COMPILED_READS is on (api/compiled.py).
+
+    Bulk endpoints:
+      - POST /api/books/bulk/         JSON array, CSV or NDJSON rows; ?upsert=true
+      - GET  /api/books/export/       ?export_format=csv|ndjson|json (honours the filters above)
     """
     queryset = Book.objects.all()
     serializer_class = BookSerializer
@@ -81,12 +102,12 @@ class BookViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
 
     # Backends to power filtering, search, ordering
-    filter_backends = [django_filters_rest.DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [django_filters_rest.DjangoFilterBackend, BookSearchFilter, filters.OrderingFilter]
 
     # Simple exact/contains filters
     filterset_fields = ['title', 'author', 'publication_year']
 
-    # Search across these fields with ?search=
+    # Search across these fields with ?search= (served from the trigram index, api/search.py)
     search_fields = ['title', 'author__name']
 
     # Fields allowed for ordering and default ordering
@@ -96,3 +117,49 @@ class BookViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         # ensure owner is set on create
         serializer.save(owner=self.request.user)
+
+    EXPORT_CONTENT_TYPES = {
+        'csv': 'text/csv',
+        'ndjson': 'application/x-ndjson',
+        'json': 'application/json',
+    }
+
+    @action(detail=False, methods=['post'], url_path='bulk',
+            parser_classes=[JSONParser, CSVParser, NDJSONParser],
+            permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        """Create (or with ?upsert=true, update) many books in one request.
+
+        Rows are {"title", "publication_year", "author"} with ``author`` an
+        id, or ``author_name`` instead (missing authors are created). Bad rows
+        are reported by row number and skipped; the rest are saved.
+        """
+        rows = request.data
+        if isinstance(rows, (dict, str)) or not hasattr(rows, '__iter__'):
+            raise ValidationError({'non_field_errors': ['Expected a list of books.']})
+        upsert = request.query_params.get('upsert', '').lower() in ('1', 'true', 'yes')
+        report = bulk.import_books(rows, request.user, upsert=upsert)
+        code = status.HTTP_201_CREATED if report.created else status.HTTP_200_OK
+        return Response(report.as_dict(), status=code)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """Stream every matching book without building serializer instances."""
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in self.EXPORT_CONTENT_TYPES:
+            raise ValidationError({'export_format': [f'Choose one of: {", ".join(self.EXPORT_CONTENT_TYPES)}.']})
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            bulk.export_rows(queryset, export_format),
+            content_type=self.EXPORT_CONTENT_TYPES[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="books.{export_format}"'
+        return response
+
+
+class ProfilingReportView(APIView):
+    """GET /api/profiling/ - latency and SQL percentiles per route (api/profiling.py)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(profiling.report())
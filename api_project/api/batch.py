@@ -0,0 +1,137 @@
+"""
+Batched create / update / delete of books in one request.
+
+``apply_operations`` takes a list of operations such as::
+
+    [{"op": "create", "data": {"title": "...", "author": "..."}},
+     {"op": "update", "id": 7, "data": {"title": "..."}},
+     {"op": "delete", "id": 9}]
+
+Every operation is validated first (``BookSerializer``, plus one query
+loading all the books to update or delete). If any of them fails, nothing
+is written and every operation's result is returned so the client can fix
+the batch. Otherwise the whole batch is applied in one transaction with one
+``bulk_create``, one ``bulk_update`` and one ``DELETE ... WHERE id IN``,
+regardless of its size.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework import status
+
+from .models import Book
+from .serializers import BookSerializer
+
+BOOK_BATCH_MAX_OPERATIONS = getattr(settings, 'BOOK_BATCH_MAX_OPERATIONS', 1000)
+BOOK_BATCH_SIZE = getattr(settings, 'BOOK_BATCH_SIZE', 500)
+
+OPERATIONS = ('create', 'update', 'delete')
+
+
+class BatchError(Exception):
+    """The batch itself is malformed (not a list, too long)."""
+
+
+def _error(index, op, code, errors):
+    return {'index': index, 'op': op, 'status': code, 'errors': errors}
+
+
+def _as_id(value):
+    """``value`` as a primary key, or None if it cannot be one."""
+    # isdigit() alone accepts non-ASCII digits such as '²', which int() rejects
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool):
+        return None
+    # Out-of-range ids would overflow the database's integer parameter
+    low, high = connection.ops.integer_field_range(Book._meta.pk.get_internal_type())
+    return value if max(low, 1) <= value <= high else None
+
+
+def _parse(operations):
+    """Validate ``operations``; returns ``(plan, results, ok)``.
+
+    ``plan`` holds ``(index, op, book_or_None, validated_data)`` tuples.
+    """
+    ids = {
+        _as_id(op.get('id')) for op in operations
+        if isinstance(op, dict) and op.get('op') in ('update', 'delete')
+    }
+    ids.discard(None)
+    books = Book.objects.select_for_update().in_bulk(ids)
+
+    plan, results, seen = [], [], set()
+    for index, op in enumerate(operations):
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind not in OPERATIONS:
+            results.append(_error(index, kind, status.HTTP_400_BAD_REQUEST,
+                                  {'op': [f'Must be one of: {", ".join(OPERATIONS)}.']}))
+            continue
+        book = None
+        if kind != 'create':
+            pk = _as_id(op.get('id'))
+            book = books.get(pk)
+            if book is None:
+                results.append(_error(index, kind, status.HTTP_404_NOT_FOUND, {'id': ['No book with this id.']}))
+                continue
+            if pk in seen:
+                results.append(_error(index, kind, status.HTTP_400_BAD_REQUEST,
+                                      {'id': ['Book already changed by an earlier operation in this batch.']}))
+                continue
+            seen.add(pk)
+        data = None
+        if kind != 'delete':
+            serializer = BookSerializer(book, data=op.get('data'), partial=kind == 'update')
+            if not serializer.is_valid():
+                results.append(_error(index, kind, status.HTTP_400_BAD_REQUEST, serializer.errors))
+                continue
+            data = serializer.validated_data
+        plan.append((index, kind, book, data))
+        results.append(None)
+    return plan, results, len(plan) == len(operations)
+
+
+def apply_operations(operations):
+    """Validate and apply ``operations``; returns ``(applied, results)``.
+
+    ``results`` has one entry per operation, in order.
+    """
+    if not isinstance(operations, list):
+        raise BatchError('Expected a list of operations.')
+    if len(operations) > BOOK_BATCH_MAX_OPERATIONS:
+        raise BatchError(f'At most {BOOK_BATCH_MAX_OPERATIONS} operations per batch.')
+
+    with transaction.atomic():
+        plan, results, ok = _parse(operations)
+        if not ok:
+            # Valid operations are reported as not applied
+            for index, kind, book, data in plan:
+                results[index] = {'index': index, 'op': kind, 'status': status.HTTP_424_FAILED_DEPENDENCY}
+            return False, results
+
+        created, updated, deleted, fields = [], [], [], set()
+        for index, kind, book, data in plan:
+            if kind == 'create':
+                created.append((index, Book(**data)))
+            elif kind == 'update':
+                for name, value in data.items():
+                    setattr(book, name, value)
+                fields.update(data)
+                updated.append((index, book))
+            else:
+                deleted.append((index, book.pk))
+
+        Book.objects.bulk_create([book for _, book in created], batch_size=BOOK_BATCH_SIZE)
+        if updated and fields:
+            Book.objects.bulk_update([book for _, book in updated], sorted(fields), batch_size=BOOK_BATCH_SIZE)
+        if deleted:
+            Book.objects.filter(pk__in=[pk for _, pk in deleted]).delete()
+
+    for index, book in created:
+        results[index] = {'index': index, 'op': 'create', 'status': status.HTTP_201_CREATED,
+                          'id': book.pk, 'data': BookSerializer(book).data}
+    for index, book in updated:
+        results[index] = {'index': index, 'op': 'update', 'status': status.HTTP_200_OK,
+                          'id': book.pk, 'data': BookSerializer(book).data}
+    for index, pk in deleted:
+        results[index] = {'index': index, 'op': 'delete', 'status': status.HTTP_204_NO_CONTENT, 'id': pk}
+    return True, results
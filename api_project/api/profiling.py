@@ -0,0 +1,246 @@
+"""
+Sampled request profiling: latency, SQL and repeated queries per route.
+
+``ProfilingMiddleware`` profiles a ``REQUEST_PROFILING_SAMPLE_RATE`` share of
+requests, so it can stay on in production. For each one it records the
+route, the wall time, the number and total time of SQL queries, the time
+spent in serializers' ``.data`` (where the view turns objects into
+primitives, including any queries that triggers), the time DRF then spends
+rendering the response body, and every query shape that ran more than once -
+the usual sign of an N+1. Queries are grouped by their SQL with parameters
+left out and ``IN (...)`` lists of any length collapsed.
+
+Samples go into a ring buffer of the last ``REQUEST_PROFILING_BUFFER_SIZE``
+requests of this process; ``report()`` summarizes them per route with
+p50/p95/p99. Each worker process keeps its own buffer.
+"""
+import contextvars
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque, namedtuple
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+REQUEST_PROFILING = getattr(settings, 'REQUEST_PROFILING', True)
+REQUEST_PROFILING_SAMPLE_RATE = getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', 0.05)
+REQUEST_PROFILING_BUFFER_SIZE = getattr(settings, 'REQUEST_PROFILING_BUFFER_SIZE', 5000)
+REQUEST_PROFILING_EXEMPT = getattr(settings, 'REQUEST_PROFILING_EXEMPT', ('/admin/', '/static/'))
+# Repeated query shapes listed per route in the report
+REPORT_DUPLICATES = 10
+
+Sample = namedtuple('Sample', 'route status wall sql_time queries serialize_time render_time duplicates')
+
+_samples = deque(maxlen=REQUEST_PROFILING_BUFFER_SIZE)
+_lock = threading.Lock()
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_SPACE = re.compile(r'\s+')
+# Router (regex) routes such as ``api/posts/(?P<pk>[^/.]+)/$``
+_REGEX_GROUP = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+_REGEX_SYNTAX = re.compile(r'/\?\$$|[\\^$]')
+
+
+def fingerprint(sql):
+    """``sql`` with ``IN`` lists of any length made alike."""
+    return _SPACE.sub(' ', _IN_LIST.sub('(%s, ...)', sql)).strip()
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` hook timing and fingerprinting queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return tuple((sql, count) for sql, count in self.fingerprints.items() if count > 1)
+
+
+class SerializerTimer:
+    """Time spent in the outermost serializer ``.data`` calls of one request."""
+
+    def __init__(self):
+        self.time = 0.0
+        self.depth = 0
+
+
+_timer = contextvars.ContextVar('profiling_serializer_timer', default=None)
+
+
+@contextmanager
+def serializing():
+    """Count the block as serialization time of the request being profiled.
+
+    Serializer ``.data`` is timed this way automatically; other code turning
+    objects into response data (e.g. a compiled serializer) can use it too.
+    Nested blocks are counted once.
+    """
+    timer = _timer.get()
+    if timer is None or timer.depth:
+        yield
+        return
+    timer.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.depth -= 1
+        timer.time += time.perf_counter() - start
+
+
+def _timed_data(prop):
+    fget = prop.fget
+
+    @wraps(fget)
+    def data(self):
+        if _timer.get() is None:
+            return fget(self)
+        with serializing():
+            return fget(self)
+
+    data.profiled = True
+    return property(data)
+
+
+def _install_serializer_timer():
+    """Wrap ``.data`` of DRF's serializers; unsampled requests skip the timing."""
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, 'profiled', False):
+            cls.data = _timed_data(cls.data)
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        # Unresolved paths share one entry so 404 probes cannot grow the report
+        return f'{request.method} <unresolved>'
+    route = _REGEX_SYNTAX.sub('', _REGEX_GROUP.sub(r'<\1>', match.route))
+    return f'{request.method} /{route}'
+
+
+class ProfilingMiddleware:
+    """Record a ``Sample`` for a random share of requests.
+
+    Goes first in ``MIDDLEWARE`` so the wall time covers the whole stack.
+    """
+
+    def __init__(self, get_response):
+        if not REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        _install_serializer_timer()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= REQUEST_PROFILING_SAMPLE_RATE or request.path.startswith(tuple(REQUEST_PROFILING_EXEMPT)):
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        timer = SerializerTimer()
+        request.profiling_render_time = 0.0
+        start = time.perf_counter()
+        token = _timer.set(timer)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            _timer.reset(token)
+        sample = Sample(
+            route=_route(request),
+            status=response.status_code,
+            wall=time.perf_counter() - start,
+            sql_time=recorder.time,
+            queries=recorder.count,
+            serialize_time=timer.time,
+            render_time=request.profiling_render_time,
+            duplicates=recorder.duplicates(),
+        )
+        with _lock:
+            _samples.append(sample)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook
+        if hasattr(request, 'profiling_render_time'):
+            start = time.perf_counter()
+
+            def rendered(response):
+                request.profiling_render_time = time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+def _percentiles(values, scale=1):
+    ordered = sorted(values)
+
+    def rank(p):
+        return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] * scale, 2)
+
+    return {'p50': rank(50), 'p95': rank(95), 'p99': rank(99), 'max': rank(100)}
+
+
+def samples():
+    with _lock:
+        return list(_samples)
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+
+def report():
+    """Per-route percentiles of the buffered samples, slowest p95 first."""
+    by_route = defaultdict(list)
+    buffered = samples()
+    for sample in buffered:
+        by_route[sample.route].append(sample)
+
+    routes = []
+    for route, items in by_route.items():
+        repeated = defaultdict(lambda: [0, 0])
+        for sample in items:
+            for sql, count in sample.duplicates:
+                repeated[sql][0] += 1
+                repeated[sql][1] = max(repeated[sql][1], count)
+        worst = sorted(repeated.items(), key=lambda item: (-item[1][0] * item[1][1], item[0]))
+        routes.append({
+            'route': route,
+            'requests': len(items),
+            'server_errors': sum(sample.status >= 500 for sample in items),
+            'wall_ms': _percentiles((sample.wall for sample in items), 1000),
+            'sql_ms': _percentiles((sample.sql_time for sample in items), 1000),
+            'queries': _percentiles(sample.queries for sample in items),
+            'serialize_ms': _percentiles((sample.serialize_time for sample in items), 1000),
+            'render_ms': _percentiles((sample.render_time for sample in items), 1000),
+            'repeated_queries': [
+                {'sql': sql, 'requests': requests, 'max_repeats': repeats}
+                for sql, (requests, repeats) in worst[:REPORT_DUPLICATES]
+            ],
+        })
+    routes.sort(key=lambda entry: entry['wall_ms']['p95'], reverse=True)
+    return {
+        'sample_rate': REQUEST_PROFILING_SAMPLE_RATE,
+        'buffer_size': REQUEST_PROFILING_BUFFER_SIZE,
+        'samples': len(buffered),
+        'routes': routes,
+    }
@@ -1,8 +1,10 @@
 # api/serializers.py
 from rest_framework import serializers
 from .models import Book
+from .sparse import SparseFieldsMixin
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Reads honour ?fields= / ?exclude= (api/sparse.py)
     class Meta:
         model = Book
         fields = '__all__'  # Include all fields of the Book model
@@ -0,0 +1,304 @@
+"""
+Sparse fieldsets: ``?fields=``, ``?exclude=`` and ``?expand=``.
+
+Read requests can trim a response to the fields a client actually uses::
+
+    ?fields=id,title,comments.content     only these (dotted = nested)
+    ?exclude=comments                     everything but these
+    ?expand=author                        swap a related id for an object
+
+Expansions are declared per serializer in
+``Meta.expandable_fields = {'author': (serializer class or dotted path,
+kwargs)}``; other names are ignored, as are unknown field names. Writes
+(unsafe methods) always use the full serializer.
+
+Query plans are cached per serializer class and selection. Selections are
+pruned to the names a serializer actually has first (``normalize``), so
+junk in the query string cannot mint new cache entries, and the caches are
+bounded by ``SPARSE_PLAN_CACHE_SIZE``.
+
+The selection also narrows the queryset: ``narrow_queryset`` works out the
+columns the remaining fields read and applies ``only()`` (plus the
+``select_related`` calls for forward relations they traverse), so columns
+nobody asked for are never read. When a field's source cannot be traced to
+a column - method fields, properties - the queryset is left unrestricted.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+EXPAND_PARAM = 'expand'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Cached plans per serializer class and selection
+SPARSE_PLAN_CACHE_SIZE = getattr(settings, 'SPARSE_PLAN_CACHE_SIZE', 512)
+
+
+class Selection:
+    """Fields to render for one serializer, and nested selections by field name.
+
+    ``include`` is None for "every default field". Instances are immutable
+    and hashable, so query plans can be cached per selection.
+    """
+
+    def __init__(self, include=None, exclude=(), expand=(), children=None):
+        self.include = None if include is None else frozenset(include)
+        self.exclude = frozenset(exclude)
+        self.expand = frozenset(expand)
+        self.children = tuple(sorted((children or {}).items()))
+
+    def _key(self):
+        return (self.include, self.exclude, self.expand, self.children)
+
+    def __eq__(self, other):
+        return isinstance(other, Selection) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f'Selection(include={self.include}, exclude={self.exclude}, expand={self.expand})'
+
+    def child(self, name):
+        return dict(self.children).get(name)
+
+    @classmethod
+    def from_paths(cls, include=None, exclude=(), expand=()):
+        """Build from dotted paths such as ``['title', 'comments.content']``."""
+        def split(paths):
+            top, nested = [], {}
+            for path in paths:
+                name, _, rest = path.partition('.')
+                if rest:
+                    nested.setdefault(name, []).append(rest)
+                else:
+                    top.append(name)
+            return top, nested
+
+        include_top, include_nested = split(include or ())
+        exclude_top, exclude_nested = split(exclude)
+        expand_top, expand_nested = split(expand)
+        children = {
+            name: cls.from_paths(include_nested.get(name), exclude_nested.get(name, ()), expand_nested.get(name, ()))
+            for name in set(include_nested) | set(exclude_nested) | set(expand_nested)
+        }
+        return cls(
+            include=None if include is None else set(include_top) | set(include_nested),
+            exclude=exclude_top,
+            # Expanding a nested field's relation needs the nested field too
+            expand=set(expand_top) | set(expand_nested),
+            children=children,
+        )
+
+
+def _names(query_params, param):
+    values = query_params.getlist(param)
+    return [name.strip() for value in values for name in value.split(',') if name.strip()]
+
+
+def selection_for(request):
+    """The ``Selection`` asked for by ``request``, or None for the full serializer."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = request.query_params
+    if not any(param in params for param in (FIELDS_PARAM, EXCLUDE_PARAM, EXPAND_PARAM)):
+        return None
+    include = _names(params, FIELDS_PARAM) if FIELDS_PARAM in params else None
+    return Selection.from_paths(include, _names(params, EXCLUDE_PARAM), _names(params, EXPAND_PARAM))
+
+
+class SparseFieldsMixin:
+    """Serializer mixin applying a ``Selection`` to its fields.
+
+    The outermost serializer reads the selection from the request in its
+    context; nested serializers receive theirs from the parent.
+    """
+
+    def __init__(self, *args, selection=None, **kwargs):
+        self.selection = selection
+        super().__init__(*args, **kwargs)
+
+    def _is_root(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.selection
+        if selection is None and self._is_root():
+            selection = selection_for(self.context.get('request'))
+        if selection is None:
+            return fields
+
+        expandable = getattr(getattr(self, 'Meta', None), 'expandable_fields', {})
+        for name in selection.expand & set(expandable):
+            serializer_class, kwargs = expandable[name]
+            if isinstance(serializer_class, str):
+                serializer_class = import_string(serializer_class)
+            fields[name] = serializer_class(**{'read_only': True, **kwargs})
+
+        kept = {}
+        for name, field in fields.items():
+            if selection.include is not None and name not in selection.include:
+                continue
+            if name in selection.exclude:
+                continue
+            child = selection.child(name)
+            target = field.child if isinstance(field, serializers.ListSerializer) else field
+            if child is not None and isinstance(target, SparseFieldsMixin):
+                target.selection = child
+            kept[name] = field
+        return kept
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def serializer_for(serializer_class, selection=None):
+    """An unbound instance of ``serializer_class`` rendering ``selection``."""
+    if issubclass(serializer_class, SparseFieldsMixin):
+        return serializer_class(selection=selection)
+    return serializer_class()
+
+
+def _sparse_class(serializer_class):
+    """``serializer_class`` if it takes a selection, else None."""
+    return serializer_class if issubclass(serializer_class, SparseFieldsMixin) else None
+
+
+@lru_cache(maxsize=None)
+def _known_fields(serializer_class):
+    """``(fields, expandable)`` of ``serializer_class``, mapping each field name
+    to the serializer class its nested selection applies to (or None)."""
+    fields = {}
+    for name, field in serializer_for(serializer_class).fields.items():
+        target = field.child if isinstance(field, serializers.ListSerializer) else field
+        fields[name] = _sparse_class(type(target)) if isinstance(target, serializers.BaseSerializer) else None
+    expandable = {}
+    for name, (nested_class, _) in getattr(getattr(serializer_class, 'Meta', None), 'expandable_fields', {}).items():
+        if isinstance(nested_class, str):
+            nested_class = import_string(nested_class)
+        expandable[name] = _sparse_class(nested_class)
+    return fields, expandable
+
+
+def normalize(selection, serializer_class):
+    """``selection`` without the names ``serializer_class`` would ignore.
+
+    Renders the same fields as ``selection``, but requests that only differ
+    in unknown names get the same (cacheable) selection.
+    """
+    if selection is None:
+        return None
+    fields, expandable = _known_fields(serializer_class)
+    expand = selection.expand & set(expandable)
+    names = set(fields) | expand
+    include = None if selection.include is None else selection.include & names
+    exclude = selection.exclude & names
+    children = {}
+    for name, child in selection.children:
+        if (include is not None and name not in include) or name in exclude:
+            continue
+        child_class = expandable[name] if name in expand else fields.get(name)
+        if child_class is not None:
+            children[name] = normalize(child, child_class)
+    return Selection(include, exclude, expand, children)
+
+
+def load_plan(serializer_class, model, selection=None):
+    """Return ``(only, select_related)`` lookups for rendering ``serializer_class``.
+
+    ``only`` is None when some field reads something other than a column.
+    Relations rendered as nested lists are loaded by prefetching and only
+    need the primary key here.
+    """
+    return _load_plan(serializer_class, model, normalize(selection, serializer_class))
+
+
+@lru_cache(maxsize=SPARSE_PLAN_CACHE_SIZE)
+def _load_plan(serializer_class, model, selection):
+    only, select = {model._meta.pk.name}, set()
+    for name, field in serializer_for(serializer_class, selection).fields.items():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            return None, tuple(sorted(select))
+        attrs = field.source.split('.')
+        model_field = _model_field(model, attrs[0])
+        if model_field is None:
+            return None, tuple(sorted(select))
+        if isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField)) \
+                or model_field.one_to_many or model_field.many_to_many:
+            continue
+
+        if isinstance(field, serializers.BaseSerializer):
+            # Nested object over a forward relation
+            child_selection = selection.child(name) if selection else None
+            child_only, child_select = _load_plan(type(field), model_field.related_model, child_selection)
+            only.add(attrs[0])
+            select.add(attrs[0])
+            select.update(f'{attrs[0]}__{lookup}' for lookup in child_select)
+            if child_only is not None:
+                only.update(f'{attrs[0]}__{lookup}' for lookup in child_only)
+        elif len(attrs) > 1:
+            # e.g. source='author.username'
+            related_model, path = model, []
+            for attr in attrs[:-1]:
+                relation = _model_field(related_model, attr)
+                if relation is None or not (relation.many_to_one or relation.one_to_one):
+                    return None, tuple(sorted(select))
+                path.append(attr)
+                related_model = relation.related_model
+            target = _model_field(related_model, attrs[-1])
+            if target is None or not target.concrete:
+                return None, tuple(sorted(select))
+            only.add(attrs[0])
+            only.add('__'.join(attrs))
+            select.add('__'.join(path))
+        elif isinstance(field, serializers.RelatedField) and not isinstance(field, serializers.PrimaryKeyRelatedField):
+            # e.g. StringRelatedField renders the whole related object
+            only.add(attrs[0])
+            select.add(attrs[0])
+        elif model_field.concrete:
+            only.add(attrs[0])
+        else:
+            return None, tuple(sorted(select))
+    return tuple(sorted(only)), tuple(sorted(select))
+
+
+def narrow_queryset(queryset, serializer_class, selection, extra=()):
+    """Restrict ``queryset`` to what ``serializer_class`` renders under ``selection``.
+
+    ``extra`` names more fields to keep loaded (e.g. the foreign key a
+    prefetch groups by). The queryset's ordering fields are always kept, so
+    pagination cursors can be read without extra queries.
+    """
+    if selection is None:
+        return queryset
+    only, select = load_plan(serializer_class, queryset.model, selection)
+    if select:
+        queryset = queryset.select_related(*select)
+    if only is None:
+        return queryset
+    ordering = [
+        name.lstrip('-') for name in (queryset.query.order_by or queryset.model._meta.ordering)
+        if isinstance(name, str) and _model_field(queryset.model, name.lstrip('-')) is not None
+    ]
+    return queryset.only(*only, *extra, *ordering)
+
+
+class SparseQuerysetMixin:
+    """View mixin narrowing ``get_queryset()`` to the requested fields."""
+
+    def get_queryset(self):
+        return narrow_queryset(super().get_queryset(), self.get_serializer_class(), selection_for(self.request))
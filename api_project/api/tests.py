@@ -1,3 +1,244 @@
-from django.test import TestCase
+import gzip
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APITestCase
+
+from . import authentication, batch, profiling, renderers, sparse
+from .models import Book
+
+User = get_user_model()
+
+
+class BookBatchTestCase(APITestCase):
+    """POST books_all/batch/: validated, all-or-nothing book writes."""
+
+    url = '/api/books_all/batch/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.books = [Book.objects.create(title=f'Book {i}', author='Author') for i in range(3)]
+        self.client.force_authenticate(self.admin)
+
+    def post(self, ops):
+        return self.client.post(self.url, ops, format='json')
+
+    def mixed_batch(self, size):
+        books = [Book.objects.create(title=f'Old {i}', author='Author') for i in range(2 * size)]
+        ops = [{'op': 'create', 'data': {'title': f'New {i}', 'author': 'Writer'}} for i in range(size)]
+        ops += [{'op': 'update', 'id': book.id, 'data': {'title': 'Renamed'}} for book in books[:size]]
+        ops += [{'op': 'delete', 'id': str(book.id)} for book in books[size:]]
+        return books, ops
+
+    def test_admin_only(self):
+        ops = [{'op': 'create', 'data': {'title': 'New', 'author': 'Writer'}}]
+        self.client.force_authenticate(None)
+        self.assertEqual(self.post(ops).status_code, 401)
+        self.client.force_authenticate(User.objects.create_user(username='reader', password='pass'))
+        self.assertEqual(self.post(ops).status_code, 403)
+        self.assertFalse(Book.objects.filter(title='New').exists())
+
+    def test_mixed_batch_in_fixed_query_count(self):
+        counts = []
+        for size in (2, 20):
+            books, ops = self.mixed_batch(size)
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.post(ops)
+            counts.append(len(queries))
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(resp.data['applied'])
+            self.assertEqual([r['status'] for r in resp.data['results']], [201] * size + [200] * size + [204] * size)
+            self.assertEqual(Book.objects.filter(author='Writer').count(), size)
+            self.assertEqual(Book.objects.filter(pk__in=[b.id for b in books[:size]], title='Renamed').count(), size)
+            self.assertFalse(Book.objects.filter(pk__in=[b.id for b in books[size:]]).exists())
+            Book.objects.filter(author='Writer').delete()
+        self.assertEqual(counts[0], counts[1])
+
+    def test_one_invalid_operation_rolls_back_the_batch(self):
+        first, second, third = self.books
+        resp = self.post([
+            {'op': 'create', 'data': {'title': 'New', 'author': 'Writer'}},
+            {'op': 'update', 'id': first.id, 'data': {'title': ''}},
+            {'op': 'delete', 'id': second.id},
+            {'op': 'rename', 'id': third.id},
+        ])
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(resp.data['applied'])
+        results = resp.data['results']
+        self.assertEqual([r['status'] for r in results], [424, 400, 424, 400])
+        self.assertIn('title', results[1]['errors'])
+        self.assertIn('op', results[3]['errors'])
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertFalse(Book.objects.filter(title='New').exists())
+        first.refresh_from_db()
+        self.assertEqual(first.title, 'Book 0')
+
+    def test_duplicate_id_in_one_batch(self):
+        book = self.books[0]
+        resp = self.post([
+            {'op': 'update', 'id': book.id, 'data': {'title': 'Renamed'}},
+            {'op': 'delete', 'id': book.id},
+        ])
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual([r['status'] for r in resp.data['results']], [424, 400])
+        self.assertIn('id', resp.data['results'][1]['errors'])
+        book.refresh_from_db()
+        self.assertEqual(book.title, 'Book 0')
+
+    def test_missing_id_is_not_found(self):
+        resp = self.post([{'op': 'delete', 'id': self.books[0].id}, {'op': 'update', 'id': 999999, 'data': {}}])
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual([r['status'] for r in resp.data['results']], [424, 404])
+        self.assertEqual(Book.objects.count(), 3)
+
+    def test_batch_must_be_a_bounded_list(self):
+        resp = self.post({'op': 'delete', 'id': self.books[0].id})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('non_field_errors', resp.data)
+
+        ops = [{'op': 'create', 'data': {'title': f'New {i}', 'author': 'Writer'}} for i in range(3)]
+        with mock.patch.object(batch, 'BOOK_BATCH_MAX_OPERATIONS', 2):
+            resp = self.post(ops)
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('non_field_errors', resp.data)
+        self.assertEqual(Book.objects.count(), 3)
+
+    def test_malformed_ids_are_not_found(self):
+        ops = [
+            {'op': 'delete', 'id': '²'},
+            {'op': 'delete', 'id': 2 ** 80},
+            {'op': 'update', 'id': str(2 ** 80), 'data': {'title': 'x'}},
+            {'op': 'delete', 'id': -1},
+            {'op': 'delete', 'id': True},
+        ]
+        resp = self.post(ops)
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual([r['status'] for r in resp.data['results']], [404] * 5)
+        self.assertEqual(Book.objects.count(), 3)
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    """Token lookups served from the auth cache and dropped on revocation."""
+
+    def setUp(self):
+        authentication.local_cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pass')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = authentication.CachedTokenAuthentication()
+
+    def test_warm_lookup_runs_no_query(self):
+        self.assertEqual(self.client.get('/api/books/', HTTP_AUTHORIZATION=f'Token {self.token.key}').status_code, 200)
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual((user.pk, user.username, token.key), (self.user.pk, 'reader', self.token.key))
+
+    def test_unknown_keys_are_negatively_cached(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials('nope')
+        with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials('nope')
+
+    def test_revocation_and_deactivation(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+        self.user.is_active = True
+        self.user.save()
+        self.auth.authenticate_credentials(self.token.key)
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+
+class SparseFieldsTestCase(APITestCase):
+    """?fields= / ?exclude= trim responses and the columns read."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='reader', password='pass'))
+        self.book = Book.objects.create(title='Emma', author='Jane Austen')
+
+    def test_fields_select_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get('/api/books/', {'fields': 'id,title'})
+        self.assertEqual(resp.json(), [{'id': self.book.pk, 'title': 'Emma'}])
+        self.assertNotIn('"author"', queries[-1]['sql'])
+
+        resp = self.client.get(f'/api/books_all/{self.book.pk}/', {'exclude': 'author'})
+        self.assertEqual(resp.json(), {'id': self.book.pk, 'title': 'Emma'})
+
+    def test_unknown_names_share_one_plan(self):
+        sparse._load_plan.cache_clear()
+        for i in range(10):
+            resp = self.client.get('/api/books/', {'fields': f'title,junk{i}', 'exclude': f'other{i}'})
+            self.assertEqual(resp.json(), [{'title': 'Emma'}])
+        self.assertEqual(sparse._load_plan.cache_info().currsize, 1)
+
+
+class ResponseFormatTestCase(APITestCase):
+    """MessagePack / columnar renderers and response compression."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='reader', password='pass'))
+        for i in range(40):
+            Book.objects.create(title=f'Book {i}', author='Some Author')
+
+    def test_msgpack_and_columnar_match_json(self):
+        data = self.client.get('/api/books/').json()
+        resp = self.client.get('/api/books/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(resp['Content-Type'], 'application/msgpack')
+        self.assertEqual(renderers.unpackb(resp.content), data)
+
+        table = self.client.get('/api/books/', {'format': 'columnar'}).json()
+        self.assertEqual([dict(zip(table['columns'], row)) for row in table['rows']], data)
+
+    def test_large_json_is_compressed_html_is_not(self):
+        plain = self.client.get('/api/books/')
+        resp = self.client.get('/api/books/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(resp.content), plain.content)
+
+        # Browsable API pages carry CSRF tokens
+        resp = self.client.get('/api/books/', {'format': 'api'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(resp['Content-Type'].startswith('text/html'))
+        self.assertFalse(resp.has_header('Content-Encoding'))
+
+
+class ProfilingTestCase(APITestCase):
+    """Sampled request profiling and the /api/profiling/ report."""
+
+    def setUp(self):
+        profiling.reset()
+        self.staff = User.objects.create_user(username='staff', password='pass', is_staff=True)
+        Book.objects.create(title='Emma', author='Jane Austen')
+
+    def tearDown(self):
+        profiling.reset()
+
+    def test_sampled_requests_are_reported_per_route(self):
+        self.client.force_authenticate(self.staff)
+        with mock.patch.object(profiling, 'REQUEST_PROFILING_SAMPLE_RATE', 1.0):
+            self.client.get('/api/books/')
+            self.client.get('/api/books/')
+        resp = self.client.get('/api/profiling/')
+        routes = {route['route']: route for route in resp.json()['routes']}
+        books = routes['GET /api/books/']
+        self.assertEqual(books['requests'], 2)
+        self.assertGreater(books['queries']['max'], 0)
+        self.assertGreater(books['serialize_ms']['max'], 0)
+
+    def test_report_is_staff_only(self):
+        self.client.force_authenticate(User.objects.create_user(username='reader', password='pass'))
+        self.assertEqual(self.client.get('/api/profiling/').status_code, 403)
+
+    def test_in_lists_share_a_fingerprint(self):
+        self.assertEqual(
+            profiling.fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+            profiling.fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+        )
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
-from .views import BookList, BookViewSet
+from .views import BookList, BookViewSet, ProfilingReportView
 
 # Router for CRUD operations
 router = DefaultRouter()
@@ -14,6 +14,9 @@ urlpatterns = [
     # Token authentication endpoint
     path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
 
+    # Request profiling report (staff only)
+    path('profiling/', ProfilingReportView.as_view(), name='profiling-report'),
+
     # Include all CRUD routes from BookViewSet
     path('', include(router.urls)),
 ]
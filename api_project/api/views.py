@@ -1,20 +1,28 @@
-from rest_framework import viewsets, generics
+from rest_framework import viewsets, generics, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from . import profiling
+from .batch import BatchError, apply_operations
 from .models import Book
 from .serializers import BookSerializer
+from .sparse import SparseQuerysetMixin
 
 # Optional ListAPIView (if you want a separate list endpoint)
-class BookList(generics.ListAPIView):
+class BookList(SparseQuerysetMixin, generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticated]
 
 # Full CRUD with custom permissions
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     Custom permissions:
     - Any authenticated user can read (GET, HEAD, OPTIONS)
-    - Only admin users can create, update, or delete
+    - Only admin users can create, update, or delete (also in bulk, through
+      POST books_all/batch/ - see api/batch.py)
     """
     queryset = Book.objects.all()
     serializer_class = BookSerializer
@@ -25,3 +33,25 @@ class BookViewSet(viewsets.ModelViewSet):
         else:
             permission_classes = [IsAdminUser]      # admin users can write
         return [permission() for permission in permission_classes]
+
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """Apply a list of create/update/delete operations in one transaction.
+
+        200 with one result per operation if all were applied; 400 with the
+        same list (failed operations carry their errors) if none were.
+        """
+        try:
+            applied, results = apply_operations(request.data)
+        except BatchError as exc:
+            raise ValidationError({'non_field_errors': [str(exc)]})
+        code = status.HTTP_200_OK if applied else status.HTTP_400_BAD_REQUEST
+        return Response({'applied': applied, 'results': results}, status=code)
+
+# Request profiling report (staff only)
+class ProfilingReportView(APIView):
+    """GET /api/profiling/ - latency and SQL percentiles per route (api/profiling.py)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(profiling.report())
@@ -0,0 +1,72 @@
+"""
+Development guard against N+1 queries.
+
+With ``DEBUG = True`` every request is counted, including template
+rendering, and a page that runs more than ``BLOG_QUERY_BUDGET`` SQL queries
+fails with ``QueryBudgetExceeded`` listing the queries it ran. A view that
+legitimately needs more can raise its own limit with ``@query_budget(n)``;
+paths under ``BLOG_QUERY_BUDGET_EXEMPT`` (the admin by default) are not
+checked. In production (``DEBUG = False``) the middleware removes itself.
+"""
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+BLOG_QUERY_BUDGET = getattr(settings, 'BLOG_QUERY_BUDGET', 10)
+BLOG_QUERY_BUDGET_EXEMPT = getattr(settings, 'BLOG_QUERY_BUDGET_EXEMPT', ('/admin/',))
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Allow the decorated view to run up to ``limit`` queries per request."""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+class QueryCounter:
+    """``connection.execute_wrapper`` hook recording every statement run."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path.startswith(tuple(BLOG_QUERY_BUDGET_EXEMPT)):
+            return self.get_response(request)
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        budget = getattr(request, 'query_budget', BLOG_QUERY_BUDGET)
+        if len(counter.queries) > budget:
+            raise QueryBudgetExceeded(
+                f"{request.method} {request.path} ran {len(counter.queries)} queries "
+                f"(budget {budget}):\n" + '\n'.join(counter.queries)
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Class-based views keep the attribute on the view class
+        limit = getattr(view_func, 'query_budget', None)
+        if limit is None and hasattr(view_func, 'view_class'):
+            limit = getattr(view_func.view_class, 'query_budget', None)
+        if limit is not None:
+            request.query_budget = limit
@@ -0,0 +1,72 @@
+"""
+Create the full-text index used by blog.search.
+
+The index structure depends on the database: an FTS5 virtual table on
+SQLite, a tsvector table with a GIN index on PostgreSQL, nothing elsewhere
+(blog.search falls back to LIKE queries). Existing posts are indexed here;
+``manage.py rebuild_search_index`` does the same at any later time.
+"""
+from django.db import migrations
+
+# Tag names of each post, space separated
+TAGS_SQL = """
+    SELECT {agg}
+    FROM taggit_taggeditem ti
+    JOIN taggit_tag t ON t.id = ti.tag_id
+    JOIN django_content_type ct ON ct.id = ti.content_type_id
+    WHERE ct.app_label = 'blog' AND ct.model = 'post' AND ti.object_id = p.id
+"""
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE blog_post_fts USING fts5(title, content, tags, tokenize = 'porter unicode61')",
+    "INSERT INTO blog_post_fts (rowid, title, content, tags) "
+    "SELECT p.id, p.title, p.content, COALESCE((" + TAGS_SQL.format(agg="group_concat(t.name, ' ')") + "), '') "
+    "FROM blog_post p",
+]
+SQLITE_BACKWARD = ["DROP TABLE IF EXISTS blog_post_fts"]
+
+POSTGRES_FORWARD = [
+    "CREATE TABLE blog_post_search ("
+    "post_id integer PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX blog_post_search_document_gin ON blog_post_search USING GIN (document)",
+    "INSERT INTO blog_post_search (post_id, document) "
+    "SELECT p.id, "
+    "setweight(to_tsvector('english', p.title), 'A') || "
+    "setweight(to_tsvector('english', p.content), 'D') || "
+    "setweight(to_tsvector('english', COALESCE((" + TAGS_SQL.format(agg="string_agg(t.name, ' ')") + "), '')), 'B') "
+    "FROM blog_post p",
+]
+POSTGRES_BACKWARD = ["DROP TABLE IF EXISTS blog_post_search"]
+
+STATEMENTS = {
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+    'postgresql': (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+}
+
+
+def _run(schema_editor, direction):
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements:
+        for sql in statements[direction]:
+            schema_editor.execute(sql)
+
+
+def create_index(apps, schema_editor):
+    _run(schema_editor, 0)
+
+
+def drop_index(apps, schema_editor):
+    _run(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_post_tags_comment'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
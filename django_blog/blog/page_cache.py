@@ -0,0 +1,118 @@
+"""
+HTTP caching for blog pages.
+
+Anonymous GETs of the post, tag and search pages go through
+``cached_page``. One aggregate query derives the page's validators from
+``Post.updated_at`` and ``Comment.updated_at`` (plus row counts, so
+deletions change them too):
+
+* a matching ``If-None-Match`` / ``If-Modified-Since`` gets a 304;
+* otherwise the rendered response is served from the cache, keyed by URL
+  and ETag, so any change produces a new key and needs no eviction;
+* only on a miss does the view run and render.
+
+Logged-in users always get a freshly rendered page (it carries their name,
+CSRF token and edit links), but the comment list on ``post_detail`` is a
+fragment cached per user and comment page. The comment views bump a per-post
+version with ``bump_comments_version`` to invalidate it.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import Post
+
+BLOG_PAGE_CACHE_TTL = getattr(settings, 'BLOG_PAGE_CACHE_TTL', 10 * 60)
+
+
+def _validators(*parts, last_modified):
+    etag = hashlib.md5(':'.join(str(p) for p in parts).encode()).hexdigest()
+    return quote_etag(etag), last_modified
+
+
+def post_validators(request, post_id):
+    row = (
+        Post.objects.filter(pk=post_id)
+        .annotate(last_comment=Max('comments__updated_at'), comment_count=Count('comments'))
+        .values_list('updated_at', 'last_comment', 'comment_count')
+        .first()
+    )
+    if row is None:
+        return None
+    updated_at, last_comment, comment_count = row
+    return _validators('post', post_id, updated_at, last_comment, comment_count,
+                       last_modified=max(filter(None, (updated_at, last_comment))))
+
+
+def tag_validators(request, tag_slug):
+    row = Post.objects.filter(tags__slug=tag_slug).aggregate(last=Max('updated_at'), count=Count('id'))
+    return _validators('tag', tag_slug, row['last'], row['count'], last_modified=row['last'])
+
+
+def search_validators(request):
+    # Any post change can change any search's results
+    row = Post.objects.aggregate(last=Max('updated_at'), count=Count('id'))
+    return _validators('search', row['last'], row['count'], last_modified=row['last'])
+
+
+def cached_page(validators):
+    """Conditional GET plus a full-page cache for anonymous requests.
+
+    ``validators(request, *args, **kwargs)`` returns ``(etag, last_modified)``
+    or None to skip caching (e.g. missing object: the view's 404 applies).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+            found = validators(request, *args, **kwargs)
+            if found is None:
+                return view_func(request, *args, **kwargs)
+            etag, last_modified = found
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                key = 'blog-page:' + hashlib.md5(f'{request.get_full_path()}:{etag}'.encode()).hexdigest()
+                response = cache.get(key)
+                if response is None:
+                    response = view_func(request, *args, **kwargs)
+                    if hasattr(response, 'render') and callable(response.render):
+                        response.render()
+                    if response.status_code == 200 and not response.cookies and not response.streaming:
+                        cache.set(key, response, BLOG_PAGE_CACHE_TTL)
+
+            response.headers.setdefault('ETag', etag)
+            if timestamp is not None:
+                response.headers.setdefault('Last-Modified', http_date(timestamp))
+            # Browsers revalidate every time (cheap 304s); shared caches must
+            # not hand an anonymous page to a logged-in user
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+def _comments_version_key(post_id):
+    return f'blog-comments-version:{post_id}'
+
+
+def comments_version(post_id):
+    return cache.get_or_set(_comments_version_key(post_id), 1, None)
+
+
+def bump_comments_version(post_id):
+    """Invalidate every cached comment-list fragment of ``post_id``."""
+    key = _comments_version_key(post_id)
+    cache.add(key, 1, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
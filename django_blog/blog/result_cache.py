@@ -0,0 +1,155 @@
+"""
+Cache of search and tag-page results.
+
+Entries hold only post ids (plus the total count), keyed by the normalized
+query (or tag slug) and the slice a page asks for; the posts themselves are
+always fetched fresh, so editing a post's title never needs an eviction.
+
+Invalidation is targeted. Each search entry is registered under a *bucket*
+per query term - the term's first ``BUCKET_LENGTH`` characters, so prefix
+matches and stemmed forms ("run" / "running") share a bucket - and each tag
+entry under its tag slug. When a post's indexed text changes, only the
+buckets of words in its old and new text are evicted; when a post is tagged,
+untagged or deleted, only the entries of those tag slugs are. If the old text
+of a post is unknown (the unindexed LIKE search backend), all search entries
+are dropped by bumping a generation number.
+
+Lookups update hit/miss counters in the cache, shown by the staff-only
+``search/stats/`` view, to help tune ``BLOG_RESULT_CACHE_TTL``.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import search
+
+BLOG_RESULT_CACHE_TTL = getattr(settings, 'BLOG_RESULT_CACHE_TTL', 5 * 60)
+BUCKET_LENGTH = 3
+
+SEARCH = 'search'
+TAG = 'tag'
+KINDS = (SEARCH, TAG)
+
+_PREFIX = 'blog-results'
+_GENERATION_KEY = f'{_PREFIX}:search-generation'
+
+
+def _registry_key(kind, name):
+    return f'{_PREFIX}:registry:{kind}:{name}'
+
+
+def _stats_key(kind, outcome):
+    return f'{_PREFIX}:stats:{kind}:{outcome}'
+
+
+def bucket(term):
+    return term[:BUCKET_LENGTH]
+
+
+def _incr(key):
+    # cache.incr() raises on missing keys; add() is a no-op on existing ones
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+class CachedResults(search.PostResults):
+    """Wrap a ``PostResults`` so its count and id slices are served from the cache.
+
+    ``kind`` is ``SEARCH`` or ``TAG``; ``names`` are the registry names the
+    entries are evicted by (term buckets or tag slugs).
+    """
+
+    def __init__(self, source, kind, ident, names):
+        self.source = source
+        self.kind = kind
+        self.names = sorted(set(names))
+        generation = cache.get_or_set(_GENERATION_KEY, 0, None) if kind == SEARCH else 0
+        digest = hashlib.md5(f'{generation}:{ident}'.encode()).hexdigest()
+        self.prefix = f'{_PREFIX}:{kind}:{digest}'
+        self._count = None
+
+    def _fetch(self, suffix, compute):
+        key = f'{self.prefix}:{suffix}'
+        value = cache.get(key)
+        _incr(_stats_key(self.kind, 'hits' if value is not None else 'misses'))
+        if value is None:
+            value = compute()
+            cache.set(key, value, BLOG_RESULT_CACHE_TTL)
+            self._register(key)
+        return value
+
+    def _register(self, key):
+        for name in self.names:
+            registry = _registry_key(self.kind, name)
+            keys = cache.get(registry, [])
+            if key not in keys:
+                keys.append(key)
+                cache.set(registry, keys, BLOG_RESULT_CACHE_TTL)
+
+    def count(self):
+        if self._count is None:
+            self._count = self._fetch('count', self.source.count)
+        return self._count
+
+    def ids(self, offset, limit):
+        return self._fetch(f'{offset}:{limit}', lambda: self.source.ids(offset, limit))
+
+
+def cached_search(query):
+    results = search.search(query)
+    return CachedResults(results, SEARCH, ' '.join(results.terms), [bucket(t) for t in results.terms])
+
+
+def cached_tag(slug):
+    return CachedResults(search.TaggedResults(slug), TAG, slug, [slug])
+
+
+def _evict(kind, names):
+    registries = [_registry_key(kind, name) for name in set(names)]
+    if not registries:
+        return
+    stale = [key for keys in cache.get_many(registries).values() for key in keys]
+    cache.delete_many(stale + registries)
+
+
+def evict_text(*texts):
+    """Evict search entries whose terms could match any word of ``texts``.
+
+    A ``None`` text means "unknown" and drops every search entry.
+    """
+    if any(text is None for text in texts):
+        cache.add(_GENERATION_KEY, 0, None)
+        cache.incr(_GENERATION_KEY)
+        return
+    buckets = set()
+    for text in texts:
+        for word in search.words(text):
+            # Every prefix, so short query terms ("dj") are caught too
+            buckets.update(word[:n] for n in range(1, BUCKET_LENGTH + 1))
+    _evict(SEARCH, buckets)
+
+
+def evict_tags(slugs):
+    """Evict tag-page entries of ``slugs``."""
+    _evict(TAG, slugs)
+
+
+def stats():
+    keys = [_stats_key(kind, outcome) for kind in KINDS for outcome in ('hits', 'misses')]
+    values = cache.get_many(keys)
+    report = {}
+    for kind in KINDS:
+        hits = values.get(_stats_key(kind, 'hits'), 0)
+        misses = values.get(_stats_key(kind, 'misses'), 0)
+        lookups = hits + misses
+        report[kind] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / lookups, 3) if lookups else None,
+        }
+    report['ttl'] = BLOG_RESULT_CACHE_TTL
+    return report
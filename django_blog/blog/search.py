@@ -0,0 +1,370 @@
+"""
+Full-text search over blog posts.
+
+Every post has one document in an inverted index made of its title, content
+and tag names. The index is kept up to date incrementally by the signal
+handlers in ``signals.py`` (post save/delete, tag changes) and can be rebuilt
+from scratch with ``manage.py rebuild_search_index``.
+
+The index lives in the database next to the posts, behind a small backend
+interface so the same views work on both databases ``edit_db.py`` /
+``revert_db.py`` switch between:
+
+* ``SQLiteFTSBackend`` - an FTS5 virtual table ranked with bm25().
+* ``PostgresBackend`` - a weighted ``tsvector`` column with a GIN index,
+  ranked with ts_rank_cd().
+* ``LikeBackend`` - no index, ``icontains`` per term; used on any other
+  database so search keeps working, just slowly, and for any query the
+  index backend fails on (e.g. the index table is missing).
+
+The backend is picked from the connection vendor unless
+``BLOG_SEARCH_BACKEND`` names one explicitly. The tables are created by
+migration ``0003_search_index``.
+
+Queries are split into word terms that must all match; the last term is
+matched as a prefix so results update while the user is still typing.
+"""
+import logging
+import re
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Terms beyond this are ignored, bounding the cost of pathological queries
+MAX_TERMS = 8
+
+_TERM_RE = re.compile(r'\w+')
+
+
+def terms(query):
+    """Lower-cased word terms of a user query, in order, without duplicates."""
+    seen = []
+    for term in _TERM_RE.findall(query.lower()):
+        if term not in seen:
+            seen.append(term)
+    return seen[:MAX_TERMS]
+
+
+def words(text):
+    """Every distinct lower-cased word of ``text``."""
+    return set(_TERM_RE.findall(text.lower()))
+
+
+def document(post):
+    """The ``(title, content, tags)`` text indexed for ``post``."""
+    # tags.all() rather than tags.names() so prefetch_related('tags') is used
+    return post.title, post.content, ' '.join(sorted(tag.name for tag in post.tags.all()))
+
+
+class SearchBackend:
+    def index(self, posts):
+        """Add or replace the documents of ``posts``."""
+        raise NotImplementedError
+
+    def remove(self, post_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, terms, offset, limit):
+        """Ids of matching posts, best match first."""
+        raise NotImplementedError
+
+    def count(self, terms):
+        raise NotImplementedError
+
+    def indexed_text(self, post_id):
+        """Text currently indexed for ``post_id`` ('' if none), or None if unknown."""
+        return None
+
+
+class SQLiteFTSBackend(SearchBackend):
+    table = 'blog_post_fts'
+    # bm25() column weights for (title, content, tags)
+    weights = (10.0, 1.0, 5.0)
+
+    def index(self, posts):
+        rows = [(post.pk, *document(post)) for post in posts]
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, content, tags) VALUES (%s, %s, %s, %s)', rows
+            )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in post_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def match(self, terms):
+        # Each term is quoted so FTS5 operators in user input are taken literally
+        quoted = ['"%s"' % term for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def search(self, terms, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s '
+                f'ORDER BY bm25({self.table}, %s, %s, %s), rowid DESC LIMIT %s OFFSET %s',
+                [self.match(terms), *self.weights, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def count(self, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {self.table} WHERE {self.table} MATCH %s', [self.match(terms)])
+            return cursor.fetchone()[0]
+
+    def indexed_text(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT title, content, tags FROM {self.table} WHERE rowid = %s', [post_id])
+            row = cursor.fetchone()
+        return ' '.join(row) if row else ''
+
+
+class PostgresBackend(SearchBackend):
+    table = 'blog_post_search'
+    config = 'english'
+    # Title weighs most, then tags, then the body
+    vector = (
+        "setweight(to_tsvector(%(config)s, %%s), 'A') || "
+        "setweight(to_tsvector(%(config)s, %%s), 'D') || "
+        "setweight(to_tsvector(%(config)s, %%s), 'B')"
+    )
+
+    def _vector(self):
+        return self.vector % {'config': f"'{self.config}'"}
+
+    def index(self, posts):
+        rows = [(post.pk, *document(post)) for post in posts]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (post_id, document) VALUES (%s, {self._vector()}) '
+                f'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+                rows,
+            )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE post_id = ANY(%s)', [list(post_ids)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {self.table}')
+
+    def tsquery(self, terms):
+        return ' & '.join(terms) + ':*'
+
+    def search(self, terms, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM {self.table}, to_tsquery(%s, %s) query '
+                f'WHERE document @@ query ORDER BY ts_rank_cd(document, query) DESC, post_id DESC '
+                f'LIMIT %s OFFSET %s',
+                [self.config, self.tsquery(terms), limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def count(self, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {self.table} WHERE document @@ to_tsquery(%s, %s)',
+                [self.config, self.tsquery(terms)],
+            )
+            return cursor.fetchone()[0]
+
+    def indexed_text(self, post_id):
+        # Stemmed lexemes rather than the original words, which is what
+        # matching works on anyway
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT array_to_string(tsvector_to_array(document), ' ') FROM {self.table} WHERE post_id = %s",
+                [post_id],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else ''
+
+
+class LikeBackend(SearchBackend):
+    """Unindexed fallback: every term must appear in the title, body or a tag."""
+
+    def index(self, posts):
+        pass
+
+    def remove(self, post_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def _queryset(self, terms):
+        from .models import Post
+
+        queryset = Post.objects.all()
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(content__icontains=term) | Q(tags__name__icontains=term)
+            )
+        return queryset.distinct()
+
+    def search(self, terms, offset, limit):
+        queryset = self._queryset(terms).order_by('-published_date', '-id')
+        return list(queryset.values_list('id', flat=True)[offset:offset + limit])
+
+    def count(self, terms):
+        return self._queryset(terms).count()
+
+
+_BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresBackend,
+}
+
+
+def get_backend():
+    path = getattr(settings, 'BLOG_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    return _BACKENDS.get(connection.vendor, LikeBackend)()
+
+
+class PostResults:
+    """Lazily evaluated list of posts, sliceable like a queryset.
+
+    ``django.core.paginator.Paginator`` only calls ``count()`` and slices,
+    so a page costs one count, one id query and one post fetch. Subclasses
+    provide ``count()`` and ``ids(offset, limit)``.
+    """
+
+    def count(self):
+        raise NotImplementedError
+
+    def ids(self, offset, limit):
+        raise NotImplementedError
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[0:self.count()])
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError(f'{type(self).__name__} only supports slicing')
+        start = key.start or 0
+        stop = self.count() if key.stop is None else key.stop
+        if stop <= start:
+            return []
+        return posts_in_order(self.ids(start, stop - start))
+
+
+class SearchResults(PostResults):
+    """Ranked full-text matches for ``query``.
+
+    If the index backend fails, the query is answered by ``LikeBackend``
+    instead (unranked, newest first).
+    """
+
+    def __init__(self, query, backend=None):
+        self.query = query
+        self.terms = terms(query)
+        self.backend = backend or get_backend()
+        self._count = None
+
+    def _run(self, method, *args):
+        try:
+            # In a transaction a failed statement needs its own savepoint,
+            # or PostgreSQL refuses the fallback query too
+            with transaction.atomic() if connection.in_atomic_block else nullcontext():
+                return getattr(self.backend, method)(self.terms, *args)
+        except DatabaseError:
+            if isinstance(self.backend, LikeBackend):
+                raise
+            logger.exception("%s failed for %r; falling back to LIKE", type(self.backend).__name__, self.query)
+            self.backend = LikeBackend()
+            self._count = None
+            return getattr(self.backend, method)(self.terms, *args)
+
+    def count(self):
+        if self._count is None:
+            self._count = self._run('count') if self.terms else 0
+        return self._count
+
+    def ids(self, offset, limit):
+        if not self.terms:
+            return []
+        return self._run('search', offset, limit)
+
+
+class TaggedResults(PostResults):
+    """Posts carrying the tag ``slug``, newest first."""
+
+    def __init__(self, slug):
+        from .models import Post
+
+        self.slug = slug
+        self.queryset = Post.objects.filter(tags__slug=slug).order_by('-published_date', '-id')
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.queryset.count()
+        return self._count
+
+    def ids(self, offset, limit):
+        return list(self.queryset.values_list('id', flat=True)[offset:offset + limit])
+
+
+def posts_in_order(ids):
+    """Posts with the given ids, in the same order, skipping deleted ones.
+
+    Authors and tags are loaded up front: two queries however many posts.
+    """
+    from .models import Post
+
+    posts = Post.objects.select_related('author').prefetch_related('tags').in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
+
+
+def search(query):
+    return SearchResults(query)
+
+
+def indexed_text(post_id):
+    return get_backend().indexed_text(post_id)
+
+
+def index_posts(posts):
+    get_backend().index(posts)
+
+
+def remove_posts(post_ids):
+    get_backend().remove(post_ids)
+
+
+def rebuild(batch_size=500):
+    """Re-index every post; returns the number of posts indexed."""
+    from .models import Post
+
+    backend = get_backend()
+    backend.clear()
+    indexed = 0
+    queryset = Post.objects.prefetch_related('tags').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return indexed
+        backend.index(batch)
+        indexed += len(batch)
+        last_pk = batch[-1].pk
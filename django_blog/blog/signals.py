@@ -0,0 +1,60 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from taggit.models import Tag
+
+from . import result_cache, search
+from .models import Post
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old_text = search.indexed_text(instance.pk)
+    search.index_posts([instance])
+    result_cache.evict_text(old_text, ' '.join(search.document(instance)))
+
+
+@receiver(pre_delete, sender=Post)
+def remember_deleted_post(sender, instance, **kwargs):
+    # Tagged items are deleted along with the post, before post_delete runs
+    instance._search_tag_slugs = list(instance.tags.values_list('slug', flat=True))
+    instance._search_text = search.indexed_text(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_posts([instance.pk])
+    result_cache.evict_text(getattr(instance, '_search_text', None))
+    result_cache.evict_tags(getattr(instance, '_search_tag_slugs', ()))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reindex_retagged_post(sender, instance, action, model=None, pk_set=None, **kwargs):
+    # The tagged-item table is shared by every taggable model
+    if not isinstance(instance, Post):
+        return
+    if action == 'pre_clear':
+        instance._search_tag_slugs = list(instance.tags.values_list('slug', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if action == 'post_clear':
+            slugs = getattr(instance, '_search_tag_slugs', [])
+        else:
+            slugs = model.objects.filter(pk__in=pk_set).values_list('slug', flat=True)
+        old_text = search.indexed_text(instance.pk)
+        search.index_posts([instance])
+        result_cache.evict_text(old_text, ' '.join(search.document(instance)))
+        result_cache.evict_tags(slugs)
+        # Tags are part of the page: move the post's ETag/Last-Modified on
+        Post.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Tag)
+def reindex_renamed_tag(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.index_posts(Post.objects.filter(tags=instance).prefetch_related('tags'))
+        # The old name is gone by now, so drop every cached search
+        result_cache.evict_text(None)
+        result_cache.evict_tags([instance.slug])
+        Post.objects.filter(tags=instance).update(updated_at=timezone.now())
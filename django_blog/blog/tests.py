@@ -1,3 +1,323 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import middleware, page_cache, result_cache, search
+from .models import Comment, Post
+
+
+class SearchTestCase(TestCase):
+    """Full-text index, its ranking and paging, and the LIKE fallback."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass')
+
+    def post(self, title, content='', tags=()):
+        post = Post.objects.create(author=self.author, title=title, content=content)
+        if tags:
+            post.tags.add(*tags)
+        return post
+
+    def ids(self, query):
+        return [post.id for post in search.search(query)]
+
+    def test_title_outranks_tags_outranks_body(self):
+        body = self.post('Notes', 'Why I like django so much')
+        tagged = self.post('Weekend', 'Nothing to see', tags=['django'])
+        titled = self.post('Django tips', 'A few tricks')
+        self.assertEqual(self.ids('django'), [titled.id, tagged.id, body.id])
+
+    def test_all_terms_must_match_and_last_is_a_prefix(self):
+        both = self.post('Django testing', 'Fixtures and factories')
+        self.post('Django views', 'Class based')
+        self.assertEqual(self.ids('django test'), [both.id])
+        self.assertEqual(self.ids('fact'), [both.id])
+
+    def test_short_and_operator_queries(self):
+        post = self.post('Django ORM', 'Querysets')
+        self.assertEqual(self.ids('dj'), [post.id])
+        # FTS5 syntax in user input is matched literally, not parsed
+        self.assertEqual(self.ids('orm AND NOT "query'), [])
+        self.assertEqual(self.ids('NEAR( * ^'), [])
+        self.assertEqual(self.ids('   '), [])
+
+    def test_search_view_pages_ranked_results(self):
+        posts = [self.post(f'Python {i}', 'django' if i == 0 else 'python') for i in range(12)]
+        first = self.client.get(reverse('blog:search_posts'), {'q': 'python'})
+        page = first.context['results']
+        self.assertEqual(page.paginator.count, 12)
+        self.assertEqual(len(page), 10)
+
+        second = self.client.get(reverse('blog:search_posts'), {'q': 'python', 'page': 2})
+        seen = [post.id for post in page] + [post.id for post in second.context['results']]
+        self.assertEqual(sorted(seen), sorted(post.id for post in posts))
+        # Title and body both match, so the post matching only by title is last
+        self.assertEqual(seen[-1], posts[0].id)
+
+    def test_index_failure_falls_back_to_like(self):
+        post = self.post('Django ORM', 'Querysets')
+        self.post('Flask', 'Routing')
+        broken = OperationalError('no such table: blog_post_fts')
+        with mock.patch.object(search.SQLiteFTSBackend, 'count', side_effect=broken), \
+                mock.patch.object(search.SQLiteFTSBackend, 'search', side_effect=broken), \
+                self.assertLogs('blog.search', 'ERROR'):
+            results = search.search('query')
+            self.assertEqual(results.count(), 1)
+            self.assertEqual([p.id for p in results[0:10]], [post.id])
+        self.assertIsInstance(results.backend, search.LikeBackend)
+
+    @override_settings(BLOG_SEARCH_BACKEND='blog.search.LikeBackend')
+    def test_like_backend(self):
+        older = self.post('Django ORM', 'Querysets')
+        newer = self.post('Weekend', 'Nothing', tags=['orm'])
+        self.post('Flask', 'Routing')
+        results = search.search('or')
+        self.assertIsInstance(results.backend, search.LikeBackend)
+        self.assertEqual(results.count(), 2)
+        self.assertEqual([p.id for p in results[0:10]], [newer.id, older.id])
+
+    def test_index_follows_post_save_and_delete(self):
+        post = self.post('Draft', 'Placeholder')
+        self.assertEqual(self.ids('draft'), [post.id])
+
+        post.title = 'Published'
+        post.save()
+        self.assertEqual(self.ids('draft'), [])
+        self.assertEqual(self.ids('published'), [post.id])
+
+        post.delete()
+        self.assertEqual(self.ids('published'), [])
+        self.assertEqual(search.indexed_text(post.id), '')
+
+    def test_index_follows_tag_changes(self):
+        post = self.post('Weekend', 'Nothing', tags=['django'])
+        self.assertEqual(self.ids('django'), [post.id])
+
+        post.tags.remove('django')
+        self.assertEqual(self.ids('django'), [])
+        post.tags.add('python')
+        self.assertEqual(self.ids('python'), [post.id])
+        post.tags.clear()
+        self.assertEqual(self.ids('python'), [])
+
+        post.tags.add('flask')
+        tag = post.tags.get()
+        tag.name = 'bottle'
+        tag.save()
+        self.assertEqual(self.ids('bottle'), [post.id])
+        self.assertEqual(self.ids('flask'), [])
+
+    def test_rebuild_reindexes_every_post(self):
+        posts = [self.post(f'Post {i}', 'rebuild me') for i in range(3)]
+        search.get_backend().clear()
+        self.assertEqual(self.ids('rebuild'), [])
+        self.assertEqual(search.rebuild(batch_size=2), 3)
+        self.assertEqual(sorted(self.ids('rebuild')), sorted(post.id for post in posts))
+
+
+class ResultCacheTestCase(TestCase):
+    """Cached search / tag-page id lists, their eviction and hit counters."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass')
+        self.post = Post.objects.create(author=self.author, title='Django tips', content='A few tricks')
+        self.post.tags.add('python')
+
+    def search_ids(self, query):
+        results = result_cache.cached_search(query)
+        return results.count(), results.ids(0, 10)
+
+    def tag_ids(self, slug):
+        results = result_cache.cached_tag(slug)
+        return results.count(), results.ids(0, 10)
+
+    def test_hits_skip_the_database(self):
+        warm = self.search_ids('django'), self.tag_ids('python')
+        with self.assertNumQueries(0):
+            self.assertEqual((self.search_ids('django'), self.tag_ids('python')), warm)
+        self.assertEqual(warm, ((1, [self.post.id]), (1, [self.post.id])))
+
+        stats = result_cache.stats()
+        self.assertEqual((stats['search']['hits'], stats['search']['misses']), (2, 2))
+        self.assertEqual(stats['search']['hit_ratio'], 0.5)
+
+    def test_post_writes_evict_matching_searches(self):
+        self.assertEqual(self.search_ids('django'), (1, [self.post.id]))
+        unrelated = self.search_ids('flask')
+
+        other = Post.objects.create(author=self.author, title='More django', content='...')
+        self.assertEqual(self.search_ids('django'), (2, [other.id, self.post.id]))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.search_ids('flask'), unrelated)  # no shared bucket
+
+        self.post.title = 'Flask tips'
+        self.post.save()
+        self.assertEqual(self.search_ids('django'), (1, [other.id]))
+        self.assertEqual(self.search_ids('flask'), (1, [self.post.id]))
+
+        other.delete()
+        self.assertEqual(self.search_ids('django'), (0, []))
+
+    def test_tag_changes_evict_tag_pages(self):
+        self.assertEqual(self.tag_ids('python'), (1, [self.post.id]))
+        other = Post.objects.create(author=self.author, title='Other', content='...')
+        other.tags.add('python')
+        self.assertEqual(self.tag_ids('python'), (2, [other.id, self.post.id]))
+
+        self.post.tags.remove('python')
+        self.assertEqual(self.tag_ids('python'), (1, [other.id]))
+        other.delete()
+        self.assertEqual(self.tag_ids('python'), (0, []))
+
+    @override_settings(BLOG_SEARCH_BACKEND='blog.search.LikeBackend')
+    def test_unknown_old_text_drops_every_search(self):
+        self.assertEqual(self.search_ids('tips'), (1, [self.post.id]))
+        self.post.content = 'Nothing in common'
+        self.post.title = 'Renamed'
+        self.post.save()  # LikeBackend cannot tell what was indexed before
+        self.assertEqual(self.search_ids('tips'), (0, []))
+
+    def test_stats_view_is_staff_only(self):
+        url = reverse('blog:search_cache_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        staff = User.objects.create_user(username='staff', password='pass', is_staff=True)
+        self.client.force_login(staff)
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(set(resp.json()), {'search', 'tag', 'ttl'})
+
+
+class PageCacheTestCase(TestCase):
+    """Conditional GET, the anonymous page cache and the comment fragment."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass')
+        self.reader = User.objects.create_user(username='reader', password='pass')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='World')
+        self.post.tags.add('python')
+        self.url = reverse('blog:post_detail', args=[self.post.id])
+
+    def comment(self, content):
+        self.client.force_login(self.reader)
+        resp = self.client.post(reverse('blog:add_comment', args=[self.post.id]), {'content': content})
+        self.assertEqual(resp.status_code, 302)
+        self.client.logout()
+        return Comment.objects.latest('id')
+
+    def test_revalidation_gets_304(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        with self.assertNumQueries(1):  # the validators only
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        resp = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_anonymous_page_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+
+    def test_comment_changes_give_a_fresh_page(self):
+        etag = self.client.get(self.url)['ETag']
+
+        comment = self.comment('First!')
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'First!')
+
+        etag = resp['ETag']
+        self.client.force_login(self.reader)
+        self.client.post(reverse('blog:edit_comment', args=[comment.id]), {'content': 'Edited'})
+        self.client.logout()
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'Edited')
+        self.assertNotContains(resp, 'First!')
+
+        etag = resp['ETag']
+        self.client.force_login(self.reader)
+        self.client.post(reverse('blog:delete_comment', args=[comment.id]))
+        self.client.logout()
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotContains(resp, 'Edited')
+
+    def test_comment_views_invalidate_the_fragment(self):
+        self.client.force_login(self.author)
+        self.assertContains(self.client.get(self.url), 'No comments yet.')
+        version = page_cache.comments_version(self.post.id)
+
+        comment = self.comment('First!')
+        self.assertGreater(page_cache.comments_version(self.post.id), version)
+        self.client.force_login(self.author)
+        self.assertContains(self.client.get(self.url), 'First!')
+
+        self.client.force_login(self.reader)
+        self.client.post(reverse('blog:edit_comment', args=[comment.id]), {'content': 'Edited'})
+        self.client.force_login(self.author)
+        self.assertContains(self.client.get(self.url), 'Edited')
+
+        self.client.force_login(self.reader)
+        self.client.post(reverse('blog:delete_comment', args=[comment.id]))
+        self.client.force_login(self.author)
+        self.assertContains(self.client.get(self.url), 'No comments yet.')
+
+    def test_removing_a_tag_gives_fresh_pages(self):
+        tag_url = reverse('blog:posts_by_tag', args=['python'])
+        post_etag = self.client.get(self.url)['ETag']
+        tag_page = self.client.get(tag_url)
+        self.assertContains(tag_page, 'Hello')
+
+        self.post.tags.remove('python')
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=post_etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotContains(resp, '#python')
+        resp = self.client.get(tag_url, HTTP_IF_NONE_MATCH=tag_page['ETag'])
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'No posts found for this tag.')
+
+
+class QueryBudgetTestCase(TestCase):
+    """The DEBUG-only N+1 guard."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='World')
+        self.url = reverse('blog:post_detail', args=[self.post.id])
+        self.client.force_login(self.author)  # no page cache: the view always runs
+
+    @override_settings(DEBUG=True)
+    def test_fires_in_debug_when_over_budget(self):
+        with mock.patch.object(middleware, 'BLOG_QUERY_BUDGET', 2), self.assertLogs('django.request', 'ERROR'), \
+                self.assertRaisesMessage(middleware.QueryBudgetExceeded, f'GET {self.url} ran'):
+            self.client.get(self.url)
+
+    @override_settings(DEBUG=True)
+    def test_silent_within_budget(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(DEBUG=True)
+    def test_views_can_raise_their_budget(self):
+        with mock.patch.object(middleware, 'BLOG_QUERY_BUDGET', 2), \
+                mock.patch('blog.views.post_detail.query_budget', 100, create=True):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(DEBUG=False)
+    def test_inactive_in_production(self):
+        with mock.patch.object(middleware, 'BLOG_QUERY_BUDGET', 2):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
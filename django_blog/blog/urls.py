@@ -21,7 +21,11 @@ urlpatterns = [
 
     # Search
     path('search/', views.search_posts, name='search_posts'),
+    path('search/stats/', views.search_cache_stats, name='search_cache_stats'),
+
+    # Request profiling report (staff only)
+    path('profiling/', views.profiling_report, name='profiling_report'),
 
     # Tags (required by checker)
-    path('tags/<slug:tag_slug>/', PostByTagListView.as_view(), name='posts_by_tag'),
+    path('tags/<slug:tag_slug>/', views.PostByTagListView.as_view(), name='posts_by_tag'),
 ]
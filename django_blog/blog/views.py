@@ -1,13 +1,17 @@
-from django.db.models import Q
+from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login, authenticate
+from django.contrib.auth import login, logout, authenticate
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import CreateView, UpdateView, DeleteView, ListView
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from .models import Post, Comment
 from .forms import CommentForm
+from . import page_cache, profiling, result_cache
 
 
 # -----------------------------
@@ -27,6 +31,11 @@ def login_view(request):
     return render(request, 'blog/login.html')
 
 
+def logout_view(request):
+    logout(request)
+    return redirect('blog:login')
+
+
 def register_view(request):
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
@@ -47,13 +56,19 @@ def profile(request):
 # -----------------------------
 # Post Detail View
 # -----------------------------
+COMMENTS_PAGE_SIZE = 20
+
+
+@page_cache.cached_page(page_cache.post_validators)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.select_related('author').prefetch_related('tags'), id=post_id)
+    # Going through post.comments sets comment.post to `post` without a query
+    comments = Paginator(post.comments.select_related('author'), COMMENTS_PAGE_SIZE)
     comment_form = CommentForm()
     return render(request, 'blog/post_detail.html', {
         'post': post,
-        'comments': comments,
+        'comments': comments.get_page(request.GET.get('page')),
+        'comments_version': page_cache.comments_version(post.pk),
         'comment_form': comment_form
     })
 
@@ -62,22 +77,31 @@ def post_detail(request, post_id):
 # Comment Class-Based Views
 # -----------------------------
 
-class CommentCreateView(LoginRequiredMixin, CreateView):
+class CommentCacheMixin:
+    """Invalidate the post's cached comment list once the form succeeds."""
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        page_cache.bump_comments_version(self.object.post_id)
+        return response
+
+
+class CommentCreateView(LoginRequiredMixin, CommentCacheMixin, CreateView):
     model = Comment
     form_class = CommentForm
     template_name = 'blog/add_comment.html'
 
     def form_valid(self, form):
         form.instance.author = self.request.user
-        post_id = self.kwargs['post_id']
+        post_id = self.kwargs['pk']
         form.instance.post = get_object_or_404(Post, id=post_id)
         return super().form_valid(form)
 
     def get_success_url(self):
-        return reverse_lazy('blog:post_detail', kwargs={'post_id': self.kwargs['post_id']})
+        return reverse_lazy('blog:post_detail', kwargs={'post_id': self.kwargs['pk']})
 
 
-class CommentUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class CommentUpdateView(LoginRequiredMixin, UserPassesTestMixin, CommentCacheMixin, UpdateView):
     model = Comment
     form_class = CommentForm
     template_name = 'blog/edit_comment.html'
@@ -89,7 +113,7 @@ class CommentUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return self.request.user == self.get_object().author
 
 
-class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, CommentCacheMixin, DeleteView):
     model = Comment
     template_name = 'blog/delete_comment.html'
 
@@ -98,23 +122,52 @@ class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
     def test_func(self):
         return self.request.user == self.get_object().author
+
+
+# -----------------------------
+# Search
+# -----------------------------
+SEARCH_PAGE_SIZE = 10
+
+
+@page_cache.cached_page(page_cache.search_validators)
 def search_posts(request):
-    query = request.GET.get('q')
+    query = request.GET.get('q', '').strip()
     results = []
     if query:
-        results = Post.objects.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct()
+        # Ranked full-text search (blog/search.py), id lists cached by blog/result_cache.py
+        paginator = Paginator(result_cache.cached_search(query), SEARCH_PAGE_SIZE)
+        results = paginator.get_page(request.GET.get('page'))
     return render(request, 'blog/search_results.html', {'results': results, 'query': query})
+
+
+@staff_member_required
+def search_cache_stats(request):
+    """Hit/miss counters of the search and tag-page result cache."""
+    return JsonResponse(result_cache.stats())
+
+
+@staff_member_required
+def profiling_report(request):
+    """Latency and SQL percentiles per route from this process's samples."""
+    return JsonResponse(profiling.report())
+
+
 from django.views.generic import ListView
 
+@method_decorator(page_cache.cached_page(page_cache.tag_validators), name='dispatch')
 class PostByTagListView(ListView):
     model = Post
     template_name = 'blog/posts_by_tag.html'
     context_object_name = 'posts'
+    paginate_by = 10
 
     def get_queryset(self):
+        # Pages load posts with their author and tags (blog.search.posts_in_order)
         tag_slug = self.kwargs.get('tag_slug')
-        return Post.objects.filter(tags__slug=tag_slug)
+        return result_cache.cached_tag(tag_slug)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['tag_slug'] = self.kwargs.get('tag_slug')
+        return context
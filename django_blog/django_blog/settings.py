@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Sampled latency/SQL profiling, reported at /blog/profiling/ (blog/profiling.py)
+    'blog.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,6 +51,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # DEBUG only: fail pages that run more than BLOG_QUERY_BUDGET queries
+    'blog.middleware.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'django_blog.urls'
@@ -119,5 +123,9 @@ USE_TZ = True
 STATIC_URL = 'static/'
 
 
+# Most SQL queries a page may run while DEBUG is on (blog/middleware.py)
+BLOG_QUERY_BUDGET = 10
 
-
+# Share of requests profiled, and how many recent samples each process keeps
+REQUEST_PROFILING_SAMPLE_RATE = 0.05
+REQUEST_PROFILING_BUFFER_SIZE = 5000
@@ -0,0 +1,108 @@
+"""
+Follow-graph adjacency cache.
+
+Each user's following and follower ids are kept in the cache as a sorted,
+packed ``array('q')`` (8 bytes per id), loaded from the follow table on first
+use and dropped whenever a follow involving the user changes. Membership
+tests are a binary search over the packed array and mutual-follow / overlap
+queries are linear merges of two sorted arrays, so none of them touch the
+join table once the adjacency lists are warm.
+
+The lists only speed up reads: writes always go to the follow table, which
+stays the source of truth. Without a shared cache backend each process keeps
+its own copy, which can lag another process's writes by up to
+``FOLLOW_GRAPH_TTL``.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import User
+
+FOLLOW_GRAPH_TTL = getattr(settings, 'FOLLOW_GRAPH_TTL', 60 * 60)
+
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+
+# Column holding the neighbour id, and the column filtered on, per direction.
+# In the through table `from_user` is followed by `to_user`.
+_COLUMNS = {
+    FOLLOWING: ('from_user_id', 'to_user_id'),
+    FOLLOWERS: ('to_user_id', 'from_user_id'),
+}
+
+
+def _key(kind, user_id):
+    return f'follow-graph:{kind}:{user_id}'
+
+
+def _unpack(data):
+    ids = array('q')
+    ids.frombytes(data)
+    return ids
+
+
+def _load(kind, user_id):
+    data = cache.get(_key(kind, user_id))
+    if data is not None:
+        return _unpack(data)
+    neighbour, owner = _COLUMNS[kind]
+    ids = array('q', (
+        User.followers.through.objects.filter(**{owner: user_id})
+        .order_by(neighbour)
+        .values_list(neighbour, flat=True)
+    ))
+    cache.set(_key(kind, user_id), ids.tobytes(), FOLLOW_GRAPH_TTL)
+    return ids
+
+
+def following_ids(user_id):
+    """Sorted ids of the accounts ``user_id`` follows."""
+    return _load(FOLLOWING, user_id)
+
+
+def follower_ids(user_id):
+    """Sorted ids of the accounts following ``user_id``."""
+    return _load(FOLLOWERS, user_id)
+
+
+def contains(ids, value):
+    """Membership test on a sorted id array."""
+    i = bisect_left(ids, value)
+    return i < len(ids) and ids[i] == value
+
+
+def is_following(follower_id, target_id):
+    return contains(following_ids(follower_id), target_id)
+
+
+def intersect(a, b):
+    """Intersection of two sorted id arrays, itself sorted."""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) * 16 < len(b):
+        # Very uneven sizes: binary-search the short list into the long one
+        return array('q', (x for x in a if contains(b, x)))
+    result, i, j = array('q'), 0, 0
+    while i < len(a) and j < len(b):
+        if a[i] == b[j]:
+            result.append(a[i])
+            i += 1
+            j += 1
+        elif a[i] < b[j]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def mutual_ids(user_id):
+    """Accounts that ``user_id`` follows and that follow ``user_id`` back."""
+    return intersect(following_ids(user_id), follower_ids(user_id))
+
+
+def invalidate(user_ids):
+    """Forget the cached adjacency lists of ``user_ids`` in both directions."""
+    cache.delete_many([_key(kind, user_id) for user_id in user_ids for kind in (FOLLOWING, FOLLOWERS)])
@@ -0,0 +1,78 @@
+"""
+Bounded pool for password-hash verification.
+
+A PBKDF2 check is deliberately slow (hundreds of milliseconds of CPU). Under
+ASGI every sync request gets its own thread, so a login flood turns into as
+many concurrent hash computations as there are requests and starves every
+other endpoint. Logins instead hand the hash to a small shared pool of
+``LOGIN_HASH_WORKERS`` threads; at most ``LOGIN_HASH_MAX_PENDING`` checks may
+be running or queued, and anything beyond that is shed with a 503 straight
+away instead of piling up.
+
+Only the CPU-bound hash runs on the pool. The user lookup and any hash
+upgrade (``must_update``) are done by the calling request thread, so pool
+threads never touch the database.
+
+``LOGIN_HASH_OFFLOAD = False`` falls back to plain ``authenticate()``.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+LOGIN_HASH_OFFLOAD = getattr(settings, 'LOGIN_HASH_OFFLOAD', True)
+LOGIN_HASH_WORKERS = getattr(settings, 'LOGIN_HASH_WORKERS', 4)
+LOGIN_HASH_MAX_PENDING = getattr(settings, 'LOGIN_HASH_MAX_PENDING', 32)
+
+_executor = None
+_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(LOGIN_HASH_MAX_PENDING)
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, try again shortly.'
+    default_code = 'hashing_busy'
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=LOGIN_HASH_WORKERS, thread_name_prefix='password-hash')
+        return _executor
+
+
+def run(func, *args):
+    """Run ``func(*args)`` on the hashing pool and wait for the result.
+
+    Raises ``HashingBusy`` without queuing when the pool is saturated.
+    """
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return _get_executor().submit(func, *args).result()
+    finally:
+        _slots.release()
+
+
+def verify_password(user, raw_password):
+    """``user.check_password(raw_password)`` with the hash computed on the pool.
+
+    ``user=None`` still burns one hash so unknown usernames take as long to
+    reject as wrong passwords.
+    """
+    if user is None:
+        run(make_password, raw_password)
+        return False
+    upgrade = []
+    valid = run(check_password, raw_password, user.password, upgrade.append)
+    if upgrade:
+        # The stored hash uses outdated parameters; re-hash it like
+        # AbstractBaseUser.check_password does, but from this thread
+        user.set_password(raw_password)
+        user.save(update_fields=['password'])
+    return valid
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from accounts.suggestions import SUGGESTIONS_BATCH_SIZE, refresh_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute \"people you may know\" suggestions for users whose list is "
+        "stale or missing. Run periodically (e.g. from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SUGGESTIONS_BATCH_SIZE)
+        parser.add_argument(
+            '--max-users', type=int, default=None,
+            help='Stop after refreshing this many users (default: until none are pending).',
+        )
+
+    def handle(self, *args, **options):
+        refreshed = refresh_pending(batch_size=options['batch_size'], max_users=options['max_users'])
+        self.stdout.write(f"Refreshed suggestions for {refreshed} users")
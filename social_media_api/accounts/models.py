@@ -7,6 +7,23 @@ class User(AbstractUser):
     followers = models.ManyToManyField(
         'self', symmetrical=False, related_name='following', blank=True
     )
+    # Denormalized counters, kept in step with F() updates by the follow views
+    # (rebuild with `manage.py rebuild_counters`)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.username
+
+
+class FollowSuggestions(models.Model):
+    """Precomputed "people you may know" list for one user.
+
+    Filled by ``manage.py refresh_suggestions``; follow changes only flip
+    ``is_stale`` so the next background pass recomputes the affected users.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='suggestions')
+    # [[candidate_id, mutual_count], ...], best candidate first, at most SUGGESTIONS_TOP_K
+    candidates = models.JSONField(default=list)
+    is_stale = models.BooleanField(default=True, db_index=True)
+    computed_at = models.DateTimeField(null=True, blank=True)
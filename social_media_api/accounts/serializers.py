@@ -4,6 +4,8 @@ from django.contrib.auth import authenticate
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
 from .models import User  # <- Custom User model
+from . import hashing
+from social_media_api.sparse import SparseFieldsMixin
 
 # -------------------------------
 # Register Serializer
@@ -33,10 +35,13 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
     def validate(self, attrs):
-        user = authenticate(
-            username=attrs["username"],
-            password=attrs["password"]
-        )
+        if hashing.LOGIN_HASH_OFFLOAD:
+            user = self.authenticate_offloaded(attrs["username"], attrs["password"])
+        else:
+            user = authenticate(
+                username=attrs["username"],
+                password=attrs["password"]
+            )
         if not user:
             raise serializers.ValidationError("Invalid credentials")
 
@@ -46,15 +51,27 @@ class LoginSerializer(serializers.Serializer):
             "token": token.key
         }
 
+    def authenticate_offloaded(self, username, password):
+        """ModelBackend's checks, with the password hash run on the bounded pool."""
+        user = User._default_manager.filter(**{User.USERNAME_FIELD: username}).first()
+        if not hashing.verify_password(user, password):
+            return None
+        return user if user.is_active else None
+
 # -------------------------------
 # Profile Serializer
 # -------------------------------
-class ProfileSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-
+class ProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ("username", "email", "bio", "followers_count")
+        fields = ("username", "email", "bio", "followers_count", "following_count")
+        read_only_fields = ("followers_count", "following_count")
+
 
-    def get_followers_count(self, obj):
-        return obj.followers.count()
+# -------------------------------
+# User Summary Serializer (embedded by ?expand=author / ?expand=actor)
+# -------------------------------
+class UserSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ("id", "username")
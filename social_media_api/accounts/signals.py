@@ -0,0 +1,29 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import graph
+from .authentication import invalidate_tokens, invalidate_users
+from .models import User
+
+
+@receiver(m2m_changed, sender=User.followers.through)
+def drop_cached_adjacency(sender, instance, action, pk_set, **kwargs):
+    """Keep the follow-graph cache honest when followers are edited directly
+    (admin, shell, ``user.followers.add()``) rather than via the follow views."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        graph.invalidate([instance.pk, *(pk_set or ())])
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def drop_cached_token(sender, instance, **kwargs):
+    """Revoked or rotated tokens must stop authenticating immediately."""
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    """Deactivated or edited users must not be served from the auth cache."""
+    invalidate_users([instance.pk])
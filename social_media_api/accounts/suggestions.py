@@ -0,0 +1,103 @@
+"""
+"People you may know" suggestions.
+
+Candidates are ranked by second-degree follow overlap: for every account the
+user follows, each account *it* follows scores one point, so the score is the
+number of people you follow who follow the candidate. Accounts the user
+already follows (and the user itself) are excluded, and only the best
+``SUGGESTIONS_TOP_K`` are kept.
+
+Scores are computed off the request path by ``manage.py refresh_suggestions``
+and stored per user in ``FollowSuggestions``. A follow or unfollow only marks
+the affected rows stale; the next batched pass recomputes just those users.
+"""
+import heapq
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import graph
+from .models import FollowSuggestions, User
+
+SUGGESTIONS_TOP_K = getattr(settings, 'SUGGESTIONS_TOP_K', 20)
+# Second-degree lists scanned per user, to bound the cost of following
+# thousands of accounts; the first N by id are used.
+SUGGESTIONS_MAX_FANIN = getattr(settings, 'SUGGESTIONS_MAX_FANIN', 500)
+SUGGESTIONS_BATCH_SIZE = getattr(settings, 'SUGGESTIONS_BATCH_SIZE', 200)
+
+
+def compute(user_id, top_k=SUGGESTIONS_TOP_K):
+    """Best ``top_k`` ``[candidate_id, score]`` pairs for ``user_id``, highest first."""
+    following = graph.following_ids(user_id)
+    scores = Counter()
+    for followed_id in following[:SUGGESTIONS_MAX_FANIN]:
+        scores.update(graph.following_ids(followed_id))
+    scores.pop(user_id, None)
+    ranked = (
+        (score, -candidate_id) for candidate_id, score in scores.items()
+        if not graph.contains(following, candidate_id)
+    )
+    return [[-neg_id, score] for score, neg_id in heapq.nlargest(top_k, ranked)]
+
+
+def mark_stale(user_id):
+    """Flag ``user_id`` and everyone following them for recomputation.
+
+    Called after ``user_id`` follows or unfollows someone: their own
+    first-degree list changed, and so did the second-degree lists of their
+    followers. One UPDATE; users without a row are picked up as new anyway.
+    """
+    followers = User.followers.through.objects.filter(from_user_id=user_id).values('to_user_id')
+    FollowSuggestions.objects.filter(Q(user_id=user_id) | Q(user_id__in=followers)).update(is_stale=True)
+
+
+def pending_user_ids(limit):
+    """Up to ``limit`` users whose suggestions are stale or were never computed."""
+    stale = list(
+        FollowSuggestions.objects.filter(is_stale=True).order_by('computed_at').values_list('user_id', flat=True)[:limit]
+    )
+    if len(stale) < limit:
+        stale += User.objects.filter(suggestions__isnull=True).order_by('pk').values_list('pk', flat=True)[:limit - len(stale)]
+    return stale
+
+
+def refresh(user_ids):
+    """Recompute and store suggestions for ``user_ids`` with a single upsert."""
+    now = timezone.now()
+    rows = [
+        FollowSuggestions(user_id=user_id, candidates=compute(user_id), is_stale=False, computed_at=now)
+        for user_id in user_ids
+    ]
+    FollowSuggestions.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['candidates', 'is_stale', 'computed_at'],
+    )
+    return len(rows)
+
+
+def refresh_pending(batch_size=SUGGESTIONS_BATCH_SIZE, max_users=None):
+    """Run batched passes until nothing is stale (or ``max_users`` were refreshed)."""
+    refreshed = 0
+    while max_users is None or refreshed < max_users:
+        limit = batch_size if max_users is None else min(batch_size, max_users - refreshed)
+        user_ids = pending_user_ids(limit)
+        if not user_ids:
+            break
+        refreshed += refresh(user_ids)
+    return refreshed
+
+
+def suggestions_for(user):
+    """Stored suggestions for ``user`` as ``[(User, score), ...]``; never computes."""
+    row = FollowSuggestions.objects.filter(user=user).values_list('candidates', flat=True).first()
+    if not row:
+        return []
+    following = graph.following_ids(user.pk)
+    # The stored list may predate a follow that hasn't been recomputed yet
+    row = [(candidate_id, score) for candidate_id, score in row if not graph.contains(following, candidate_id)]
+    users = User.objects.only('id', 'username').in_bulk([candidate_id for candidate_id, _ in row])
+    return [(users[candidate_id], score) for candidate_id, score in row if candidate_id in users]
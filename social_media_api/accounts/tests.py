@@ -1,3 +1,368 @@
-from django.test import TestCase
+import json
+import threading
+from array import array
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from . import authentication, graph, hashing, suggestions
+from .models import FollowSuggestions, User
+from .throttling import LoginRateThrottle
+
+
+class FollowCounterTestCase(APITestCase):
+    """Denormalized follower/following counters on User."""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='pass')
+        self.bob = User.objects.create_user(username='bob', password='pass')
+        self.client.force_authenticate(self.alice)
+
+    def test_follow_and_unfollow_update_counts(self):
+        self.client.post(f'/api/accounts/follow/{self.bob.id}/')
+        self.client.post(f'/api/accounts/follow/{self.bob.id}/')  # already following
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.bob.followers_count, self.alice.following_count), (1, 1))
+        self.assertTrue(self.bob.followers.filter(pk=self.alice.pk).exists())
+
+        self.client.post(f'/api/accounts/unfollow/{self.bob.id}/')
+        self.client.post(f'/api/accounts/unfollow/{self.bob.id}/')  # not following any more
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.bob.followers_count, self.alice.following_count), (0, 0))
+
+    def test_unfollow_of_drifted_counters_is_floored(self):
+        self.bob.followers.add(self.alice)  # no counter update
+        resp = self.client.post(f'/api/accounts/unfollow/{self.bob.id}/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.bob.refresh_from_db()
+        self.alice.refresh_from_db()
+        self.assertEqual((self.bob.followers_count, self.alice.following_count), (0, 0))
+
+    def test_profile_reads_counter_columns(self):
+        self.bob.followers.add(self.alice)
+        User.objects.filter(pk=self.alice.pk).update(followers_count=7)
+        self.client.force_authenticate(User.objects.get(pk=self.alice.pk))
+        with self.assertNumQueries(0):
+            resp = self.client.get('/api/accounts/profile/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['followers_count'], 7)
+
+
+class FollowGraphTestCase(APITestCase):
+    """Cached adjacency lists behind follow checks, fan-out and suggestions."""
+
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass') for i in range(4)]
+        self.client.force_authenticate(self.users[0])
+
+    def follow(self, follower, target):
+        self.client.force_authenticate(follower)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/accounts/follow/{target.id}/')
+
+    def test_membership_and_mutuals_are_served_from_cache(self):
+        a, b, c, d = self.users
+        self.follow(a, b)
+        self.follow(a, c)
+        self.follow(b, a)
+        self.follow(d, a)
+
+        graph.following_ids(a.id), graph.follower_ids(a.id)  # warm
+        with self.assertNumQueries(0):
+            self.assertTrue(graph.is_following(a.id, b.id))
+            self.assertFalse(graph.is_following(a.id, d.id))
+            self.assertEqual(list(graph.mutual_ids(a.id)), [b.id])
+
+    def test_follow_views_invalidate(self):
+        a, b, c, _ = self.users
+        self.follow(a, b)
+        self.assertEqual(list(graph.following_ids(a.id)), [b.id])
+        self.assertEqual(list(graph.follower_ids(c.id)), [])
+
+        self.follow(a, c)
+        self.assertEqual(list(graph.following_ids(a.id)), [b.id, c.id])
+        self.assertEqual(list(graph.follower_ids(c.id)), [a.id])
+
+        self.client.force_authenticate(a)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/accounts/unfollow/{b.id}/')
+        self.assertEqual(list(graph.following_ids(a.id)), [c.id])
+
+    def test_stale_cache_does_not_decide_writes(self):
+        # Another process changed the table; this one still has the old lists
+        a, b, _, _ = self.users
+        Follow = User.followers.through
+        self.follow(a, b)
+        self.assertTrue(graph.is_following(a.id, b.id))
+        Follow.objects.filter(from_user=b, to_user=a).delete()
+
+        self.follow(a, b)
+        self.assertTrue(Follow.objects.filter(from_user=b, to_user=a).exists())
+        b.refresh_from_db()
+        self.assertEqual(b.followers_count, 2)  # the counter was never decremented by the raw delete
+
+        # And the other way round: cached as not following, row present
+        Follow.objects.filter(from_user=b, to_user=a).delete()
+        graph.invalidate([a.id])
+        self.assertFalse(graph.is_following(a.id, b.id))
+        Follow.objects.create(from_user=b, to_user=a)
+
+        self.client.force_authenticate(a)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/accounts/unfollow/{b.id}/')
+        self.assertFalse(Follow.objects.filter(from_user=b, to_user=a).exists())
+        self.assertFalse(graph.is_following(a.id, b.id))
+        self.assertEqual(list(graph.follower_ids(b.id)), [])
+
+    def test_direct_m2m_edits_invalidate(self):
+        a, b, _, _ = self.users
+        self.assertEqual(list(graph.follower_ids(b.id)), [])
+        b.followers.add(a)
+        self.assertEqual(list(graph.follower_ids(b.id)), [a.id])
+
+    def test_intersect_uneven_sizes(self):
+        small = array('q', [3, 50, 999])
+        large = array('q', range(0, 1000, 2))
+        self.assertEqual(list(graph.intersect(small, large)), [50])
+        self.assertEqual(list(graph.intersect(large, small)), [50])
+
+
+class SuggestionsTestCase(APITestCase):
+    """Precomputed friends-of-friends suggestions."""
+
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass') for i in range(5)]
+
+    def follow(self, follower, target):
+        self.client.force_authenticate(follower)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/accounts/follow/{target.id}/')
+
+    def test_ranked_by_second_degree_overlap(self):
+        a, b, c, d, e = self.users
+        self.follow(a, b)
+        self.follow(a, c)
+        self.follow(b, d)
+        self.follow(c, d)
+        self.follow(c, e)
+        self.follow(c, a)  # a itself is never suggested
+        self.assertEqual(suggestions.compute(a.id), [[d.id, 2], [e.id, 1]])
+        self.assertEqual(suggestions.compute(a.id, top_k=1), [[d.id, 2]])
+
+    def test_request_path_only_reads_stored_list(self):
+        a, b, c, d, _ = self.users
+        self.follow(a, b)
+        self.follow(b, c)
+        self.client.force_authenticate(a)
+        self.assertEqual(self.client.get('/api/accounts/suggestions/').data, [])
+
+        self.assertEqual(suggestions.refresh_pending(batch_size=2), len(self.users))
+        self.assertEqual(suggestions.refresh_pending(), 0)
+        resp = self.client.get('/api/accounts/suggestions/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data, [{'id': c.id, 'username': c.username, 'mutual_count': 1}])
+
+    def test_follow_marks_user_and_followers_stale(self):
+        a, b, c, d, e = self.users
+        self.follow(a, b)
+        self.follow(e, a)
+        suggestions.refresh_pending()
+
+        self.follow(b, c)
+        stale = set(FollowSuggestions.objects.filter(is_stale=True).values_list('user_id', flat=True))
+        self.assertEqual(stale, {b.id, a.id})
+        self.assertEqual(suggestions.refresh_pending(), 2)
+        self.assertEqual(FollowSuggestions.objects.get(user=a).candidates, [[c.id, 1]])
+
+        # Following a suggestion hides it before the next pass runs
+        self.follow(a, c)
+        self.client.force_authenticate(a)
+        self.assertEqual(self.client.get('/api/accounts/suggestions/').data, [])
+
+
+class ListUsersTestCase(APITestCase):
+    """Keyset-paginated user listing and the staff NDJSON export."""
+
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass') for i in range(5)]
+        self.client.force_authenticate(self.users[0])
+
+    def test_pages_walk_by_id(self):
+        seen = []
+        url = '/api/accounts/users/?page_size=2'
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            seen += resp.data['results']
+            url = resp.data['next']
+        self.assertEqual(seen, [{'id': u.id, 'username': u.username} for u in self.users])
+
+    def test_page_is_a_single_projected_query(self):
+        with self.assertNumQueries(1) as ctx:
+            self.client.get('/api/accounts/users/')
+        sql = ctx.captured_queries[0]['sql']
+        self.assertNotIn('password', sql)
+        self.assertNotIn('COUNT(', sql.upper())
+
+    def test_ndjson_export(self):
+        resp = self.client.get('/api/accounts/users/?export=ndjson')
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+
+        User.objects.filter(pk=self.users[0].pk).update(is_staff=True)
+        self.client.force_authenticate(User.objects.get(pk=self.users[0].pk))
+        resp = self.client.get('/api/accounts/users/?export=ndjson')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [{'id': u.id, 'username': u.username} for u in self.users])
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    """Token lookups served from the auth cache and dropped on revocation."""
+
+    def setUp(self):
+        cache.clear()
+        authentication.local_cache.clear()
+        self.user = User.objects.create_user(username='alice', password='pass')
+        self.token = Token.objects.create(user=self.user)
+
+    def get_profile(self, key):
+        return self.client.get('/api/accounts/profile/', HTTP_AUTHORIZATION=f'Token {key}')
+
+    def test_warm_authentication_runs_no_query(self):
+        auth = authentication.CachedTokenAuthentication()
+        auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = auth.authenticate_credentials(self.token.key)
+        self.assertEqual((user.pk, user.username, user.is_active, token.key), (self.user.pk, 'alice', True, self.token.key))
+        with self.assertNumQueries(1):  # fields outside the snapshot are deferred
+            self.assertEqual(user.bio, '')
+
+    def test_client_keys_cannot_name_user_entries(self):
+        self.get_profile(self.token.key)
+        self.assertEqual(self.get_profile(f'user:{self.user.pk}').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_unknown_keys_are_negatively_cached(self):
+        self.assertEqual(self.get_profile('nope').status_code, status.HTTP_401_UNAUTHORIZED)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_profile('nope').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_stops_working(self):
+        self.get_profile(self.token.key)
+        self.token.delete()
+        self.assertEqual(self.get_profile(self.token.key).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_stops_working(self):
+        self.get_profile(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_profile(self.token.key).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_queryset_deactivation_applies_after_the_user_ttl(self):
+        with mock.patch.object(authentication, 'TOKEN_AUTH_USER_TTL', -1):
+            self.get_profile(self.token.key)
+            User.objects.filter(pk=self.user.pk).update(is_active=False)  # no signals
+            self.assertEqual(self.get_profile(self.token.key).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_delete_drops_the_snapshot(self):
+        self.get_profile(self.token.key)
+        self.user.delete()
+        self.assertEqual(self.get_profile(self.token.key).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_shared_cache_survives_local_eviction(self):
+        with mock.patch.object(authentication, 'TOKEN_AUTH_SHARED_CACHE', 'default'):
+            self.get_profile(self.token.key)
+            authentication.local_cache.clear()  # as seen from another worker
+            with self.assertNumQueries(1):  # just the profile itself
+                self.assertEqual(self.get_profile(self.token.key).status_code, status.HTTP_200_OK)
+            self.user.is_active = False
+            self.user.save()
+            authentication.local_cache.clear()
+            self.assertEqual(self.get_profile(self.token.key).status_code, status.HTTP_401_UNAUTHORIZED)
+            self.token.delete()
+            authentication.local_cache.clear()
+            self.assertEqual(self.get_profile(self.token.key).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_follow_refreshes_cached_counters(self):
+        bob = User.objects.create_user(username='bob', password='pass')
+        self.get_profile(self.token.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/accounts/follow/{bob.id}/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.get_profile(self.token.key).data['following_count'], 1)
+
+    def test_lru_is_bounded(self):
+        lru = authentication.LRUCache(maxsize=2)
+        lru.set('a', 1, 60)
+        lru.set('b', 2, 60)
+        lru.get('a')
+        lru.set('c', 3, 60)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        lru.set('d', 4, -1)
+        self.assertIsNone(lru.get('d'))
+
+
+class LoginFlowTestCase(APITestCase):
+    """Registration token, pooled password checks and login throttling."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', password='s3cret')
+
+    def login(self, username='alice', password='s3cret'):
+        return self.client.post('/api/accounts/login/', {'username': username, 'password': password})
+
+    def test_register_creates_one_token(self):
+        resp = self.client.post('/api/accounts/register/', {'username': 'bob', 'password': 'pw12345'})
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(list(Token.objects.filter(user__username='bob').values_list('key', flat=True)), [resp.data['token']])
+
+    def test_login(self):
+        resp = self.login()
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['token'], Token.objects.get(user=self.user).key)
+        self.assertEqual(self.login(password='wrong').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.login(username='nobody').status_code, status.HTTP_400_BAD_REQUEST)
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.login().status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login_without_offload(self):
+        with mock.patch.object(hashing, 'LOGIN_HASH_OFFLOAD', False):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+            self.assertEqual(self.login(password='wrong').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_flood_is_throttled_per_username_before_hashing(self):
+        with mock.patch.object(LoginRateThrottle, 'THROTTLE_RATES', {'login': '3/min'}):
+            for _ in range(3):
+                self.assertEqual(self.login(password='wrong').status_code, status.HTTP_400_BAD_REQUEST)
+            with mock.patch.object(hashing, 'run') as run:
+                self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+                # Other accounts are unaffected
+                self.assertEqual(self.login(username='ALICE2').status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(run.call_count, 1)
+            self.assertEqual(self.login(username='Alice ').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_saturated_pool_sheds_load(self):
+        with mock.patch.object(hashing, '_slots', threading.BoundedSemaphore(1)) as slots:
+            slots.acquire()
+            self.assertEqual(self.login().status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            slots.release()
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    def test_outdated_hash_is_upgraded(self):
+        # A short salt makes the hasher report must_update
+        User.objects.filter(pk=self.user.pk).update(password=make_password('s3cret', salt='ab'))
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.password.split('$')[1], 'ab')
+        self.assertTrue(self.user.check_password('s3cret'))
@@ -0,0 +1,19 @@
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginRateThrottle(SimpleRateThrottle):
+    """Limit login attempts per username (``DEFAULT_THROTTLE_RATES['login']``).
+
+    Throttles run before the view, so a brute-force flood against one account
+    is rejected with 429 before any password hashing happens. Requests without
+    a username are limited per client IP instead.
+    """
+    scope = 'login'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if isinstance(username, str) and username.strip():
+            ident = 'user:' + username.strip().lower()
+        else:
+            ident = 'ip:' + self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
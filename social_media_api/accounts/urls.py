@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import RegisterView, LoginView, ProfileView, FollowUserView, UnfollowUserView, ListUsersView
+from .views import RegisterView, LoginView, ProfileView, FollowUserView, UnfollowUserView, ListUsersView, SuggestionsView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
@@ -8,4 +8,5 @@ urlpatterns = [
     path('follow/<int:user_id>/', FollowUserView.as_view(), name='follow'),
     path('unfollow/<int:user_id>/', UnfollowUserView.as_view(), name='unfollow'),
     path('users/', ListUsersView.as_view(), name='list-users'),
+    path('suggestions/', SuggestionsView.as_view(), name='suggestions'),
 ]
@@ -1,10 +1,20 @@
+import json
+
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
 from .serializers import RegisterSerializer, LoginSerializer, ProfileSerializer
 from .models import User  # Custom user model
+from . import graph, suggestions
+from .throttling import LoginRateThrottle
+from posts.counters import decrement
+from posts.timeline import backfill_timeline, purge_timeline
+from social_media_api.pagination import UserPagination
 
 from django.contrib.auth import authenticate
+from django.db import transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
 
 # -------------------------------
 # Register View
@@ -17,7 +27,7 @@ class RegisterView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        token = Token.objects.create(user=user)
+        token = user.auth_token  # created by RegisterSerializer.create
         return Response(
             {"message": "User registered successfully", "token": token.key},
             status=status.HTTP_201_CREATED
@@ -30,6 +40,7 @@ class RegisterView(generics.GenericAPIView):
 class LoginView(generics.GenericAPIView):
     serializer_class = LoginSerializer
     permission_classes = []
+    throttle_classes = [LoginRateThrottle]
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -45,19 +56,67 @@ class ProfileView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        serializer = self.get_serializer(request.user)
+        user = request.user
+        if user.get_deferred_fields():
+            # The token cache's snapshot: load the profile fields in one query
+            user = User.objects.get(pk=user.pk)
+        serializer = self.get_serializer(user)
         return Response(serializer.data)
 
 
 # -------------------------------
-# List All Users (uses CustomUser.objects.all())
+# List Users (keyset-paginated, optional NDJSON export)
 # -------------------------------
 class ListUsersView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = UserPagination
+    # Rows fetched per round trip while streaming an export
+    export_chunk_size = 2000
+
+    def get_queryset(self):
+        # Only the two columns we return; no model instances are built
+        return User.objects.values_list('id', 'username', named=True)
+
+    def get(self, request, *args, **kwargs):
+        if request.query_params.get('export') == 'ndjson':
+            return self.export(request)
+        page = self.paginate_queryset(self.get_queryset())
+        data = [{"id": u.id, "username": u.username} for u in page]
+        return self.get_paginated_response(data)
+
+    def export(self, request):
+        """Stream every user as one JSON object per line (staff only)."""
+        if not request.user.is_staff:
+            raise PermissionDenied("Only staff can export users")
+        rows = self.get_queryset().order_by('id').iterator(chunk_size=self.export_chunk_size)
+        response = StreamingHttpResponse(self._ndjson(rows), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="users.ndjson"'
+        return response
+
+    def _ndjson(self, rows):
+        # Join each chunk into a single write instead of one per user
+        lines = []
+        for user_id, username in rows:
+            lines.append(json.dumps({"id": user_id, "username": username}))
+            if len(lines) == self.export_chunk_size:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+
+# -------------------------------
+# People You May Know (Authenticated)
+# -------------------------------
+class SuggestionsView(generics.GenericAPIView):
+    """Precomputed friends-of-friends suggestions; see accounts.suggestions."""
+    permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        users = User.objects.all()  # <- satisfies "CustomUser.objects.all()"
-        data = [{"id": u.id, "username": u.username} for u in users]
+        data = [
+            {"id": u.id, "username": u.username, "mutual_count": score}
+            for u, score in suggestions.suggestions_for(request.user)
+        ]
         return Response(data)
 
 
@@ -76,7 +135,18 @@ class FollowUserView(generics.GenericAPIView):
         if request.user == target_user:
             return Response({"error": "You cannot follow yourself"}, status=status.HTTP_400_BAD_REQUEST)
 
-        target_user.followers.add(request.user)
+        with transaction.atomic():
+            _, created = User.followers.through.objects.get_or_create(
+                from_user=target_user, to_user=request.user
+            )
+            # The table decides; a cached list saying otherwise was stale
+            transaction.on_commit(lambda: graph.invalidate([request.user.pk, target_user.pk]))
+            if created:
+                User.objects.filter(pk=target_user.pk).update(followers_count=F('followers_count') + 1)
+                User.objects.filter(pk=request.user.pk).update(following_count=F('following_count') + 1)
+                transaction.on_commit(lambda: suggestions.mark_stale(request.user.pk))
+        if created:
+            backfill_timeline(request.user, target_user)
         return Response({"message": f"You are now following {target_user.username}"})
 
 
@@ -89,5 +159,14 @@ class UnfollowUserView(generics.GenericAPIView):
         except User.DoesNotExist:
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        target_user.followers.remove(request.user)
+        with transaction.atomic():
+            deleted, _ = User.followers.through.objects.filter(
+                from_user=target_user, to_user=request.user
+            ).delete()
+            transaction.on_commit(lambda: graph.invalidate([request.user.pk, target_user.pk]))
+            if deleted:
+                User.objects.filter(pk=target_user.pk).update(followers_count=decrement('followers_count'))
+                User.objects.filter(pk=request.user.pk).update(following_count=decrement('following_count'))
+                transaction.on_commit(lambda: suggestions.mark_stale(request.user.pk))
+        purge_timeline(request.user, target_user)
         return Response({"message": f"You have unfollowed {target_user.username}"})
@@ -0,0 +1,179 @@
+"""
+Background notification delivery.
+
+Request handlers call :func:`notify`, which only inserts a row into the
+``NotificationOutbox`` table as part of the caller's transaction. Once that
+transaction commits, a single-thread worker pool drains the outbox in
+batches: bursts of events on the same target are coalesced into one
+notification ("X and 41 others liked your post") and written with
+``bulk_create`` / ``bulk_update``.
+
+Other apps can hand their own outboxes to the same worker with
+:func:`register` (``posts.timeline`` does, for the fan-out of new posts):
+every drain pass then drains those as well.
+
+Set ``NOTIFICATIONS_ASYNC = False`` to drain synchronously on commit (tests,
+management shells). ``manage.py drain_notifications`` flushes anything left
+in the outboxes, e.g. after a restart.
+"""
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Notification, NotificationOutbox
+from .pubsub import broker
+from .serializers import NotificationSerializer
+from .unread import add_unread
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATIONS_ASYNC = getattr(settings, 'NOTIFICATIONS_ASYNC', True)
+NOTIFICATION_BATCH_SIZE = getattr(settings, 'NOTIFICATION_BATCH_SIZE', 500)
+# Seconds to wait before retrying a failed drain (events stay in the outbox)
+NOTIFICATION_RETRY_DELAY = getattr(settings, 'NOTIFICATION_RETRY_DELAY', 5)
+
+_executor = None
+_lock = threading.Lock()
+_scheduled = False
+# Drain functions of other outboxes, run after the notification one
+_outboxes = []
+
+
+def notify(recipient, actor, verb, target):
+    """Queue a notification for ``recipient`` about ``actor`` acting on ``target``."""
+    NotificationOutbox.objects.create(
+        recipient=recipient,
+        actor=actor,
+        verb=verb,
+        content_type=ContentType.objects.get_for_model(target),
+        object_id=target.pk,
+    )
+    transaction.on_commit(schedule_drain)
+
+
+def register(drain_outbox):
+    """Have every drain pass also call ``drain_outbox()``.
+
+    It must process its pending rows and return how many it processed.
+    """
+    if drain_outbox not in _outboxes:
+        _outboxes.append(drain_outbox)
+    return drain_outbox
+
+
+def registered_outboxes():
+    return tuple(_outboxes)
+
+
+def schedule_drain():
+    """Make sure a drain pass runs soon; repeated calls are coalesced."""
+    global _executor, _scheduled
+    if not NOTIFICATIONS_ASYNC:
+        drain_all()
+        return
+    with _lock:
+        if _scheduled:
+            return
+        _scheduled = True
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notifications')
+    _executor.submit(_run_drain)
+
+
+def _run_drain():
+    global _scheduled
+    with _lock:
+        # Cleared before draining so events committed mid-pass schedule another one
+        _scheduled = False
+    try:
+        drain_all()
+    except Exception:
+        logger.exception("Outbox drain failed; retrying in %ss", NOTIFICATION_RETRY_DELAY)
+        retry = threading.Timer(NOTIFICATION_RETRY_DELAY, schedule_drain)
+        retry.daemon = True
+        retry.start()
+    finally:
+        close_old_connections()
+
+
+def drain(batch_size=NOTIFICATION_BATCH_SIZE):
+    """Write every pending outbox event; returns the number of events processed."""
+    processed = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                NotificationOutbox.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size]
+            )
+            if not events:
+                return processed
+            write_events(events)
+            NotificationOutbox.objects.filter(id__in=[e.id for e in events]).delete()
+        processed += len(events)
+
+
+def drain_all():
+    """Drain the notification outbox, then every registered one."""
+    processed = drain()
+    for drain_outbox in _outboxes:
+        processed += drain_outbox()
+    return processed
+
+
+def write_events(events):
+    """Coalesce ``events`` per target and write them as notifications."""
+    groups = {}
+    for event in events:
+        key = (event.recipient_id, event.verb, event.content_type_id, event.object_id)
+        groups.setdefault(key, []).append(event)
+
+    unread = Notification.objects.filter(
+        is_read=False,
+        recipient_id__in={key[0] for key in groups},
+        object_id__in={key[3] for key in groups},
+    )
+    existing = {}
+    for notification in unread:
+        key = (notification.recipient_id, notification.verb, notification.content_type_id, notification.object_id)
+        existing.setdefault(key, notification)
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for key, group in groups.items():
+        latest = group[-1]
+        notification = existing.get(key)
+        if notification is None:
+            to_create.append(Notification(
+                recipient_id=latest.recipient_id,
+                actor_id=latest.actor_id,
+                verb=latest.verb,
+                content_type_id=latest.content_type_id,
+                object_id=latest.object_id,
+                actor_count=len(group),
+            ))
+        else:
+            notification.actor_id = latest.actor_id
+            notification.actor_count += len(group)
+            notification.timestamp = now
+            to_update.append(notification)
+
+    if to_update:
+        Notification.objects.bulk_update(to_update, ['actor', 'actor_count', 'timestamp'])
+    created = Notification.objects.bulk_create(to_create)
+    transaction.on_commit(lambda: add_unread(Counter(n.recipient_id for n in created)))
+    transaction.on_commit(lambda: publish(created + to_update))
+    return created + to_update
+
+
+def publish(notifications):
+    """Push freshly written notifications to any open live streams."""
+    ids = [n.pk for n in notifications if broker.has_subscribers(n.recipient_id)]
+    if not ids:
+        return
+    for notification in Notification.objects.filter(pk__in=ids).select_related('actor'):
+        broker.publish(notification.recipient_id, NotificationSerializer(notification).data)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from notifications.dispatch import NOTIFICATION_BATCH_SIZE, drain, registered_outboxes
+
+
+class Command(BaseCommand):
+    help = "Write every pending notification event left in the outbox, then drain the registered outboxes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=NOTIFICATION_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        processed = drain(batch_size=options['batch_size'])
+        self.stdout.write(f"Processed {processed} notification events")
+        for drain_outbox in registered_outboxes():
+            self.stdout.write(f"{drain_outbox.__module__}: processed {drain_outbox()} events")
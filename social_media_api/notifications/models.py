@@ -23,9 +23,34 @@ class Notification(models.Model):
 
     is_read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Unread events on the same target are coalesced into one row:
+    # "<actor> and <actor_count - 1> others liked your post"
+    actor_count = models.PositiveIntegerField(default=1)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination scans (recipient, timestamp, id) newest first
+            models.Index(fields=['recipient', '-timestamp', '-id'], name='notif_recipient_ts_idx'),
+            # Unread listing and unread count for one recipient
+            models.Index(fields=['recipient', 'is_read', '-timestamp'], name='notif_recipient_unread_idx'),
+        ]
 
     def __str__(self):
+        if self.actor_count > 1:
+            return f"{self.actor.username} and {self.actor_count - 1} others {self.verb}"
         return f"{self.actor.username} {self.verb}"
+
+
+class NotificationOutbox(models.Model):
+    """A notification event waiting to be written by the background worker.
+
+    Rows are inserted in the same transaction as the action that caused them,
+    so nothing is lost if the process restarts before the worker runs.
+    """
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+    verb = models.CharField(max_length=255)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
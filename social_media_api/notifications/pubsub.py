@@ -0,0 +1,67 @@
+"""
+In-process publish/subscribe for live notification streams.
+
+Each open stream subscribes with an ``asyncio.Queue`` bound to its event
+loop; the notification writer (which runs on a worker thread) publishes to
+it with ``call_soon_threadsafe``. Subscribers only see notifications written
+by the same process, so run the ASGI server and the notification worker
+together (the default: the worker is started by the web process itself).
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+# Events buffered per stream before newer ones are dropped; a client that
+# falls this far behind catches up through Last-Event-ID on reconnect.
+STREAM_QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, user_id, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+    def _put(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            pass
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, user_id):
+        """Register a stream for ``user_id``; must be called from its event loop."""
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def has_subscribers(self, user_id):
+        return user_id in self._subscribers
+
+    def publish(self, user_id, payload):
+        """Deliver ``payload`` to every stream of ``user_id``; safe from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, payload)
+            except RuntimeError:
+                # The stream's event loop has already shut down
+                self.unsubscribe(subscription)
+
+
+broker = Broker()
@@ -1,9 +1,12 @@
 from rest_framework import serializers
 from .models import Notification
+from social_media_api.sparse import SparseFieldsMixin
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     actor = serializers.StringRelatedField()
 
     class Meta:
         model = Notification
-        fields = ['id', 'actor', 'verb', 'is_read', 'timestamp']
+        fields = ['id', 'actor', 'actor_count', 'verb', 'is_read', 'timestamp']
+        # ?expand=actor embeds {id, username} instead of the actor's name
+        expandable_fields = {'actor': ('accounts.serializers.UserSummarySerializer', {})}
@@ -1,3 +1,222 @@
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from posts.models import Post
+from social_media_api.pagination import encode_cursor
+from .dispatch import drain
+from .models import Notification, NotificationOutbox
+from .pubsub import broker
+from .serializers import NotificationSerializer
+
+
+class NotificationListTestCase(APITestCase):
+    """Paginated listing of the current user's notifications."""
+
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient', password='pass')
+        self.actor = User.objects.create_user(username='actor', password='pass')
+        user_type = ContentType.objects.get_for_model(User)
+        self.notifications = [
+            Notification.objects.create(
+                recipient=self.recipient, actor=self.actor, verb='followed you',
+                content_type=user_type, object_id=self.actor.id,
+            )
+            for _ in range(15)
+        ]
+
+    def test_list_is_paginated_by_cursor(self):
+        self.client.force_authenticate(self.recipient)
+        first = self.client.get('/api/notifications/')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first.data['results']), 10)
+
+        second = self.client.get(first.data['next'])
+        ids = [n['id'] for n in first.data['results'] + second.data['results']]
+        self.assertEqual(ids, [n.id for n in reversed(self.notifications)])
+        self.assertIsNone(second.data['next'])
+
+    def test_requires_authentication(self):
+        resp = self.client.get('/api/notifications/')
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class NotificationDispatchTestCase(APITestCase):
+    """Outbox-backed notification writes, coalesced per target."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='World')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='pass') for i in range(3)]
+
+    def like(self, user):
+        self.client.force_authenticate(user)
+        return self.client.post(f'/api/posts/{self.post.id}/like/')
+
+    def test_like_writes_outbox_and_worker_creates_notification(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.like(self.fans[0])
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(NotificationOutbox.objects.exists())
+        notification = Notification.objects.get()
+        self.assertEqual((notification.recipient, notification.actor), (self.author, self.fans[0]))
+
+    def test_burst_of_likes_is_coalesced(self):
+        with self.captureOnCommitCallbacks():
+            for fan in self.fans:
+                self.like(fan)
+        self.assertEqual(drain(), 3)
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor, self.fans[-1])
+        self.assertEqual(notification.actor_count, 3)
+        self.assertEqual(str(notification), 'fan2 and 2 others liked your post')
+
+    def test_later_likes_fold_into_unread_notification(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.like(self.fans[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.like(self.fans[1])
+        self.assertEqual(Notification.objects.get().actor_count, 2)
+
+        Notification.objects.update(is_read=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.like(self.fans[2])
+        self.assertEqual(Notification.objects.filter(is_read=False).get().actor_count, 1)
+
+    def test_liking_own_post_does_not_notify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.like(self.author)
+        self.assertFalse(NotificationOutbox.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+
+class UnreadNotificationsTestCase(APITestCase):
+    """Unread count endpoint and bulk mark-all-read."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass')
+        self.fan = User.objects.create_user(username='fan', password='pass')
+        self.posts = [Post.objects.create(author=self.author, title=f'Post {i}', content='...') for i in range(3)]
+        self.client.force_authenticate(self.author)
+
+    def like_all(self):
+        self.client.force_authenticate(self.fan)
+        for post in self.posts:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'/api/posts/{post.id}/like/')
+        self.client.force_authenticate(self.author)
+
+    def test_unread_count_is_cached_and_kept_current(self):
+        resp = self.client.get('/api/notifications/unread_count/')
+        self.assertEqual(resp.data, {'unread_count': 0})
+
+        self.like_all()
+        with self.assertNumQueries(0):
+            resp = self.client.get('/api/notifications/unread_count/')
+        self.assertEqual(resp.data, {'unread_count': 3})
+
+    def test_mark_all_read_is_a_single_update(self):
+        self.like_all()
+        with self.assertNumQueries(1):
+            resp = self.client.post('/api/notifications/mark_all_read/')
+        self.assertEqual(resp.data, {'marked_read': 3})
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').data, {'unread_count': 0})
+
+    def test_list_loads_actors_in_the_same_query(self):
+        self.like_all()
+        with self.assertNumQueries(1):
+            resp = self.client.get('/api/notifications/', {'unread': 'true'})
+        self.assertEqual([n['actor'] for n in resp.data['results']], ['fan'] * 3)
+
+
+class NotificationStreamTestCase(TestCase):
+    """Server-Sent Events stream fed by the in-process broker."""
+
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient', password='pass')
+        self.actor = User.objects.create_user(username='actor', password='pass')
+        self.token = Token.objects.create(user=self.recipient)
+        self.earlier = Notification.objects.create(
+            recipient=self.recipient, actor=self.actor, verb='followed you',
+            content_type=ContentType.objects.get_for_model(User), object_id=self.actor.id,
+        )
+
+    def event_id(self, notification):
+        return encode_cursor((NotificationSerializer(notification).data['timestamp'], notification.id))
+
+    async def open_stream(self, *args, **kwargs):
+        response = await self.async_client.get('/api/notifications/stream/', *args, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return aiter(response.streaming_content)
+
+    async def test_stream_replays_backlog_then_pushes_live_events(self):
+        before = encode_cursor((self.earlier.timestamp - timedelta(seconds=1), 0))
+        stream = await self.open_stream(headers={'Authorization': f'Token {self.token.key}', 'Last-Event-ID': before})
+
+        backlog = (await anext(stream)).decode()
+        self.assertIn(f'id: {self.event_id(self.earlier)}\n', backlog)
+        self.assertIn('"actor": "actor"', backlog)
+
+        timestamp = '2026-01-01T00:00:00Z'
+        broker.publish(self.recipient.id, {'id': 12345, 'verb': 'liked your post', 'timestamp': timestamp})
+        live = (await asyncio.wait_for(anext(stream), timeout=1)).decode()
+        self.assertTrue(live.startswith(f'id: {encode_cursor((timestamp, 12345))}\nevent: notification\n'))
+        await stream.aclose()
+
+    async def test_replay_includes_rows_coalesced_after_the_last_event(self):
+        later = await Notification.objects.acreate(
+            recipient=self.recipient, actor=self.actor, verb='liked your post',
+            content_type=await sync_to_async(ContentType.objects.get_for_model)(Post), object_id=1,
+        )
+        seen = self.event_id(later)
+        # What the outbox writer does when another like folds into the row
+        await Notification.objects.filter(pk=self.earlier.pk).aupdate(
+            actor_count=2, timestamp=timezone.now() + timedelta(seconds=1),
+        )
+
+        stream = await self.open_stream(headers={'Authorization': f'Token {self.token.key}', 'Last-Event-ID': seen})
+        replayed = (await anext(stream)).decode()
+        self.assertIn(f'"id": {self.earlier.id}', replayed)
+        self.assertIn('"actor_count": 2', replayed)
+        await stream.aclose()
+
+    async def test_ticket_opens_a_single_stream(self):
+        response = await self.async_client.post(
+            '/api/notifications/stream/ticket/', headers={'Authorization': f'Token {self.token.key}'},
+        )
+        ticket = response.json()['ticket']
+        self.assertNotIn(self.token.key, ticket)
+
+        stream = await self.open_stream({'ticket': ticket})
+        await stream.aclose()
+        reused = await self.async_client.get('/api/notifications/stream/', {'ticket': ticket})
+        self.assertEqual(reused.status_code, 401)
+
+    async def test_ticket_requires_authentication(self):
+        response = await self.async_client.post('/api/notifications/stream/ticket/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_requires_authentication(self):
+        response = await self.async_client.get('/api/notifications/stream/', {'ticket': 'bogus'})
+        self.assertEqual(response.status_code, 401)
 
-# Create your tests here.
+    async def test_api_token_is_not_accepted_in_the_url(self):
+        response = await self.async_client.get('/api/notifications/stream/', {'token': self.token.key})
+        self.assertEqual(response.status_code, 401)
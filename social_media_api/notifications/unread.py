@@ -0,0 +1,41 @@
+"""
+Cached per-user unread notification counters.
+
+The count is computed once from the ``(recipient, is_read)`` index and kept
+in the cache afterwards: the notification writer increments it and "mark all
+read" resets it, so polling clients read a single cache key.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Notification
+
+UNREAD_COUNT_TTL = getattr(settings, 'NOTIFICATIONS_UNREAD_COUNT_TTL', 300)
+
+
+def _key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def unread_count(user):
+    count = cache.get(_key(user.pk))
+    if count is None:
+        count = Notification.objects.filter(recipient=user, is_read=False).count()
+        cache.set(_key(user.pk), count, UNREAD_COUNT_TTL)
+    return count
+
+
+def add_unread(counts):
+    """Increment cached counters by ``{user_id: new_unread_rows}``."""
+    for user_id, n in counts.items():
+        try:
+            cache.incr(_key(user_id), n)
+        except ValueError:
+            pass  # Not cached: the next read counts from the table
+
+
+def mark_all_read(user):
+    """Mark every unread notification of ``user`` as read with one UPDATE."""
+    updated = Notification.objects.filter(recipient=user, is_read=False).update(is_read=True)
+    cache.set(_key(user.pk), 0, UNREAD_COUNT_TTL)
+    return updated
@@ -1,6 +1,10 @@
 from django.urls import path
-from .views import NotificationListView
+from .views import NotificationListView, UnreadCountView, MarkAllReadView, StreamTicketView, notification_stream
 
 urlpatterns = [
     path('notifications/', NotificationListView.as_view()),
+    path('notifications/unread_count/', UnreadCountView.as_view(), name='notifications-unread-count'),
+    path('notifications/mark_all_read/', MarkAllReadView.as_view(), name='notifications-mark-all-read'),
+    path('notifications/stream/', notification_stream, name='notifications-stream'),
+    path('notifications/stream/ticket/', StreamTicketView.as_view(), name='notifications-stream-ticket'),
 ]
@@ -1,17 +1,164 @@
-from rest_framework.views import APIView
+import asyncio
+import json
+import secrets
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import generics
+from rest_framework.exceptions import AuthenticationFailed, NotFound
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from accounts.authentication import CachedTokenAuthentication
+from social_media_api.eager import EagerLoadingMixin
+from social_media_api.pagination import NotificationPagination, decode_cursor, encode_cursor, keyset_filter
 from .models import Notification
+from .pubsub import broker
 from .serializers import NotificationSerializer
+from .unread import mark_all_read, unread_count
 
-class NotificationListView(APIView):
+class NotificationListView(EagerLoadingMixin, generics.ListAPIView):
+    """Paginated notifications of the current user; ``?unread=true`` for unread only."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = NotificationSerializer
+    pagination_class = NotificationPagination
+    queryset = Notification.objects.all()
+
+    def get_queryset(self):
+        queryset = super().get_queryset().filter(recipient=self.request.user)
+        if self.request.query_params.get('unread') in ('1', 'true'):
+            queryset = queryset.filter(is_read=False)
+        return queryset
+
+
+class UnreadCountView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        notifications = Notification.objects.filter(
-            recipient=request.user
-        ).order_by('-timestamp')
+        return Response({"unread_count": unread_count(request.user)})
+
+
+class MarkAllReadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({"marked_read": mark_all_read(request.user)})
+
+
+# -------------------------------
+# Live stream (Server-Sent Events, ASGI)
+# -------------------------------
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_BACKLOG_LIMIT = 50
+STREAM_TICKET_MAX_AGE = getattr(settings, 'NOTIFICATIONS_STREAM_TICKET_MAX_AGE', 30)
+_TICKET_SALT = 'notifications.stream'
+# Coalescing updates a row in place with a new timestamp, so replay walks
+# (timestamp, id) rather than id alone
+REPLAY_ORDERING = ('timestamp', 'id')
+
+
+class StreamTicketView(APIView):
+    """Issue a short-lived, single-use ticket for ``?ticket=`` on the stream.
+
+    EventSource cannot set headers, and the API token itself must not go in
+    a URL where access logs, proxies and browser history keep it.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        ticket = signing.dumps({'u': request.user.pk, 'n': secrets.token_urlsafe(16)}, salt=_TICKET_SALT)
+        return Response({"ticket": ticket, "expires_in": STREAM_TICKET_MAX_AGE})
+
+
+def _redeem_ticket(ticket):
+    try:
+        payload = signing.loads(ticket, salt=_TICKET_SALT, max_age=STREAM_TICKET_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    # First use wins; across processes only with a shared cache backend
+    if not cache.add(f'notifications:stream-ticket:{payload["n"]}', True, STREAM_TICKET_MAX_AGE):
+        return None
+    return get_user_model().objects.filter(pk=payload['u'], is_active=True).first()
+
+
+def _stream_user(request):
+    """Authenticate a stream request by ``?ticket=``, token header or session."""
+    ticket = request.GET.get('ticket')
+    if ticket:
+        return _redeem_ticket(ticket)
+    try:
+        result = CachedTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    if result is not None:
+        return result[0]
+    return request.user if request.user.is_authenticated else None
+
+
+def _event_id(payload):
+    return encode_cursor((payload['timestamp'], payload['id']))
+
+
+def _backlog(user, last_event_id):
+    fields = [Notification._meta.get_field(name) for name in REPLAY_ORDERING]
+    try:
+        position, _ = decode_cursor(last_event_id, fields)
+    except NotFound:
+        return []
+    notifications = (
+        Notification.objects.filter(recipient=user)
+        .filter(keyset_filter(REPLAY_ORDERING, position))
+        .select_related('actor')
+        .order_by(*REPLAY_ORDERING)[:STREAM_BACKLOG_LIMIT]
+    )
+    return [NotificationSerializer(n).data for n in notifications]
+
+
+def _sse(payload):
+    return f"id: {_event_id(payload)}\nevent: notification\ndata: {json.dumps(payload, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def notification_stream(request):
+    """Push new notifications to the client as they are written.
+
+    Holds the connection open and emits one ``notification`` event per new
+    or updated row, plus a comment line every few seconds as a keep-alive.
+    Browsers reconnect automatically and send ``Last-Event-ID``, a
+    ``(timestamp, id)`` cursor used to replay anything written or coalesced
+    while they were away (a row committed late with an older timestamp by
+    another process can still be missed). EventSource cannot set headers, so
+    browsers pass a ticket from ``notifications/stream/ticket/`` as
+    ``?ticket=``.
+    """
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    last_event_id = request.headers.get('Last-Event-ID', '')
+
+    async def events():
+        subscription = broker.subscribe(user.pk)
+        try:
+            if last_event_id:
+                for payload in await sync_to_async(_backlog)(user, last_event_id):
+                    yield _sse(payload)
+            while True:
+                try:
+                    payload = await asyncio.wait_for(subscription.queue.get(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(payload)
+        finally:
+            broker.unsubscribe(subscription)
 
-        serializer = NotificationSerializer(notifications, many=True)
-        return Response(serializer.data)
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
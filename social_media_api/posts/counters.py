@@ -0,0 +1,48 @@
+"""
+Denormalized counters: ``User.followers_count`` / ``following_count`` and
+``Post.like_count`` / ``comment_count``.
+
+The views keep them current with ``F()`` updates; the expressions here
+recompute them from the underlying tables, for the ``rebuild_counters``
+command and the backfill migration. They take querysets rather than
+models, so migrations can pass their historical models.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def count_of(queryset, group_field):
+    """Correlated subquery counting ``queryset`` rows per ``group_field``."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{group_field: OuterRef('pk')})
+            .order_by()
+            .values(group_field)
+            .annotate(n=Count('pk'))
+            .values('n'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def follow_counters(follows):
+    """``update()`` kwargs recomputing the user counters from the follow table."""
+    return {
+        'followers_count': count_of(follows, 'from_user'),
+        'following_count': count_of(follows, 'to_user'),
+    }
+
+
+def post_counters(likes, comments):
+    """``update()`` kwargs recomputing the post counters from likes and comments."""
+    return {
+        'like_count': count_of(likes, 'post'),
+        'comment_count': count_of(comments, 'post'),
+    }
+
+
+def decrement(field):
+    """``field - 1``, floored at 0 so a counter that drifted low cannot fail
+    its ``PositiveIntegerField`` check."""
+    return Greatest(F(field) - 1, 0)
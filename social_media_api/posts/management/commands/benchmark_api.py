@@ -0,0 +1,99 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from notifications import dispatch
+from social_media_api import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic social graph into a throwaway test database and "
+        "report throughput and latency percentiles of the API hot paths "
+        "(social_media_api.benchmark) as JSON. With --baseline, fail when a "
+        "scenario's p95 latency regressed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--following', type=int, default=20, help="Average accounts followed per user.")
+        parser.add_argument('--posts', type=int, default=5, help="Posts per user.")
+        parser.add_argument('--likes', type=int, default=3, help="Average likes per post.")
+        parser.add_argument('--comments', type=int, default=1, help="Average comments per post.")
+        parser.add_argument('--notifications', type=int, default=10, help="Notifications per user.")
+        parser.add_argument('--alpha', type=float, default=1.1, help="Power-law exponent of follower popularity.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=200, help="Measured requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=20, help="Unmeasured requests per scenario.")
+        parser.add_argument(
+            '--scenarios', default=','.join(benchmark.SCENARIOS),
+            help=f"Comma-separated subset of: {', '.join(benchmark.SCENARIOS)}.",
+        )
+        parser.add_argument(
+            '--fast-passwords', action='store_true',
+            help="Hash passwords with MD5 so register/login measure the API rather than PBKDF2.",
+        )
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--baseline', help="JSON report of an earlier run to compare against.")
+        parser.add_argument(
+            '--max-regression', type=float, default=0.25,
+            help="Allowed p95 growth over the baseline (0.25 = 25%%).",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = tuple(name.strip() for name in options['scenarios'].split(',') if name.strip())
+        try:
+            benchmark.check_scenarios(scenarios)
+        except ValueError as exc:
+            raise CommandError(exc)
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)
+
+        overrides = {
+            # Keep the shared cache (timelines, tokens, counters) out of it
+            'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            'ALLOWED_HOSTS': ['testserver'],
+            'SECURE_SSL_REDIRECT': False,
+        }
+        if options['fast_passwords']:
+            overrides['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(**overrides):
+                graph = benchmark.seed(
+                    users=options['users'], following=options['following'], posts=options['posts'],
+                    likes=options['likes'], comments=options['comments'],
+                    notifications=options['notifications'], alpha=options['alpha'], seed=options['seed'],
+                )
+                report = benchmark.run(graph, scenarios, options['iterations'], options['warmup'])
+                # Events queued by the requests, so no drain outlives the database
+                dispatch.drain_all()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        for name, result in report['scenarios'].items():
+            latency = result['latency_ms']
+            self.stderr.write(
+                f"{name:<14} {result['throughput_rps']:>8} req/s  p50 {latency['p50']:>8.2f} ms  "
+                f"p95 {latency['p95']:>8.2f} ms  p99 {latency['p99']:>8.2f} ms  errors {result['errors']}"
+            )
+
+        if baseline is not None:
+            regressions = benchmark.compare(report, baseline, options['max_regression'])
+            if regressions:
+                raise CommandError('p95 regressions: ' + ', '.join(
+                    f'{name} {old:.2f} -> {new:.2f} ms' for name, old, new in regressions
+                ))
+            self.stderr.write(f"No p95 regression above {options['max_regression']:.0%} of the baseline.")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User
+from posts.counters import follow_counters, post_counters
+from posts.models import Comment, Like, Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the denormalized counters (User.followers_count, "
+        "User.following_count, Post.like_count, Post.comment_count) "
+        "from the underlying tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Rows updated per UPDATE statement (by primary key range).',
+        )
+
+    def handle(self, *args, **options):
+        self._rebuild(User, options['batch_size'], follow_counters(User.followers.through.objects.all()))
+        self._rebuild(Post, options['batch_size'], post_counters(Like.objects.all(), Comment.objects.all()))
+
+    def _rebuild(self, model, batch_size, counters):
+        last_pk = model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        updated = 0
+        for start in range(0, last_pk + 1, batch_size):
+            with transaction.atomic():
+                updated += model.objects.filter(pk__gte=start, pk__lt=start + batch_size).update(**counters)
+        self.stdout.write(f"{model._meta.label}: rebuilt counters on {updated} rows")
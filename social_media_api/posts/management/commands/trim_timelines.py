@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import TIMELINE_MAX_LENGTH, trim_all_timelines
+
+
+class Command(BaseCommand):
+    help = (
+        "Drop home timeline entries beyond the newest TIMELINE_MAX_LENGTH "
+        f"({TIMELINE_MAX_LENGTH}) per reader. Run it periodically (e.g. from cron)."
+    )
+
+    def handle(self, *args, **options):
+        trimmed = trim_all_timelines()
+        self.stdout.write(f"Trimmed {trimmed} timelines")
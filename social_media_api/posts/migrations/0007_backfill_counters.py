@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from posts.counters import follow_counters, post_counters
+
+
+def backfill_counters(apps, schema_editor):
+    """Count the likes, comments and follows that predate the counter columns."""
+    User = apps.get_model('accounts', 'User')
+    Post = apps.get_model('posts', 'Post')
+    User.objects.update(**follow_counters(User.followers.through.objects.all()))
+    Post.objects.update(**post_counters(
+        apps.get_model('posts', 'Like').objects.all(),
+        apps.get_model('posts', 'Comment').objects.all(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_followers_count_user_following_count'),
+        ('posts', '0006_post_comment_count_post_like_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
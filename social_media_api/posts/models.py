@@ -10,6 +10,15 @@ class Post(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized counters, kept in step with F() updates by the like and
+    # comment views (rebuild with `manage.py rebuild_counters`)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='posts_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -21,6 +30,11 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='posts_comment_created_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.author} on {self.post}"
 
@@ -30,4 +44,33 @@ class Like(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('user', 'post')  # prevents multiple likes
\ No newline at end of file
+        unique_together = ('user', 'post')  # prevents multiple likes
+
+
+class TimelineEntry(models.Model):
+    """One post id pushed into a reader's precomputed home timeline.
+
+    Rows are written when a post is created (fan-out on write), so reading a
+    feed is a range scan over ``(user, created_at)`` instead of a join across
+    everyone the reader follows.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    # Copy of post.created_at so the feed scan never has to touch posts_post
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='posts_timeline_user_idx'),
+        ]
+
+
+class TimelineOutbox(models.Model):
+    """A new post waiting to be fanned out by the background worker.
+
+    Inserted in the transaction that creates the post, so the fan-out is not
+    lost if the process restarts before the worker runs.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
@@ -1,20 +1,29 @@
 from rest_framework import serializers
 from .models import Post, Comment
 from accounts.models import User  # or use get_user_model()
+from social_media_api.sparse import SparseFieldsMixin
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source='author.username')
 
     class Meta:
         model = Comment
         fields = ['id', 'post', 'author', 'author_username', 'content', 'created_at', 'updated_at']
         read_only_fields = ['author', 'created_at', 'updated_at']
+        # ?expand=author embeds {id, username} instead of the id
+        expandable_fields = {'author': ('accounts.serializers.UserSummarySerializer', {})}
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source='author.username')
     comments = CommentSerializer(many=True, read_only=True)
 
     class Meta:
         model = Post
-        fields = ['id', 'author', 'author_username', 'title', 'content', 'created_at', 'updated_at', 'comments']
-        read_only_fields = ['author', 'created_at', 'updated_at', 'comments']
+        fields = ['id', 'author', 'author_username', 'title', 'content', 'created_at', 'updated_at',
+                  'like_count', 'comment_count', 'comments']
+        read_only_fields = ['author', 'created_at', 'updated_at', 'like_count', 'comment_count', 'comments']
+        # Newest comments embedded per post; see social_media_api.eager
+        prefetch_limits = {'comments': 20}
+        # ?expand=author embeds {id, username}; ?exclude=comments skips the
+        # comments (and their prefetch) entirely
+        expandable_fields = {'author': ('accounts.serializers.UserSummarySerializer', {})}
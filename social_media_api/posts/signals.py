@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Post
+from .timeline import queue_fan_out
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, **kwargs):
+    # The fan-out itself runs on the outbox worker after commit
+    if created:
+        queue_fan_out(instance)
@@ -0,0 +1,76 @@
+"""
+Benchmark suite for the API hot paths (social_media_api.benchmark).
+
+Each test times one scenario on a small seeded graph and fails if any of
+its requests returns an unexpected status. By default it is a quick smoke
+run; ``BENCHMARK_ROUNDS`` raises the number of measured requests and
+``BENCHMARK_OUTPUT`` names a file receiving the JSON report of the class::
+
+    BENCHMARK_ROUNDS=200 BENCHMARK_OUTPUT=bench.json \\
+        python manage.py test posts.test_benchmarks --settings=social_media_api.test_settings
+
+For larger graphs and baseline comparison use ``manage.py benchmark_api``.
+"""
+import json
+import os
+
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from social_media_api import benchmark
+
+ROUNDS = int(os.environ.get('BENCHMARK_ROUNDS', 3))
+OUTPUT = os.environ.get('BENCHMARK_OUTPUT')
+
+
+class HotPathBenchmarks(APITestCase):
+    report = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.graph = benchmark.seed(users=40, following=8, posts=3, likes=2, comments=1, notifications=5)
+
+    def setUp(self):
+        cache.clear()
+
+    def bench(self, *scenarios):
+        report = benchmark.run(self.graph, scenarios, iterations=ROUNDS, warmup=1, client=self.client)
+        for name in scenarios:
+            result = report['scenarios'][name]
+            self.assertEqual(result['errors'], 0, result.get('failures'))
+            self.assertEqual(result['requests'], ROUNDS)
+        cls = type(self)
+        if cls.report is None:
+            cls.report = report
+        else:
+            cls.report['scenarios'].update(report['scenarios'])
+
+    def test_register_and_login(self):
+        self.bench('register', 'login')
+
+    def test_follow_and_unfollow(self):
+        self.bench('follow', 'unfollow')
+
+    def test_like_and_unlike(self):
+        self.bench('like', 'unlike')
+
+    def test_feed(self):
+        self.bench('feed')
+
+    def test_notifications(self):
+        self.bench('notifications')
+
+    def test_compare_flags_p95_regressions(self):
+        def report(**p95):
+            return {'scenarios': {name: {'latency_ms': {'p95': value}} for name, value in p95.items()}}
+
+        baseline = report(feed=10.0, like=4.0)
+        self.assertEqual(benchmark.compare(report(feed=12.0, like=4.1, login=9.0), baseline), [])
+        self.assertEqual(benchmark.compare(report(feed=13.0, like=4.0), baseline), [('feed', 10.0, 13.0)])
+
+    @classmethod
+    def tearDownClass(cls):
+        if OUTPUT and cls.report is not None:
+            with open(OUTPUT, 'w') as fh:
+                json.dump(cls.report, fh, indent=2)
+        super().tearDownClass()
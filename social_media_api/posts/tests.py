@@ -1,3 +1,423 @@
-from django.test import TestCase
+import gzip
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from social_media_api import eager, profiling, renderers
+from . import timeline
+from .models import Comment, Like, Post, TimelineEntry, TimelineOutbox
+from .serializers import PostSerializer
+
+
+class FeedTimelineTestCase(APITestCase):
+    """Fan-out-on-write home timeline behind /api/feed/."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader', password='pass')
+        self.author = User.objects.create_user(username='author', password='pass')
+        self.stranger = User.objects.create_user(username='stranger', password='pass')
+        self.author.followers.add(self.reader)
+
+    def publish(self, author, title):
+        """Create a post and run the fan-out its commit triggers."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(author=author, title=title, content='...')
+
+    def test_new_post_is_pushed_to_followers(self):
+        post = self.publish(self.author, 'Hello')
+        readers = set(TimelineEntry.objects.filter(post=post).values_list('user_id', flat=True))
+        self.assertEqual(readers, {self.author.id, self.reader.id})
+        self.assertFalse(TimelineOutbox.objects.exists())
+
+    def test_fan_out_waits_for_commit(self):
+        self.client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks() as callbacks:
+            resp = self.client.post('/api/posts/', {'title': 'Hello', 'content': 'World'})
+            self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+            self.assertFalse(TimelineEntry.objects.exists())
+            self.assertEqual(TimelineOutbox.objects.get().post_id, resp.data['id'])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(TimelineEntry.objects.filter(post_id=resp.data['id']).count(), 2)
+
+    def test_feed_returns_followed_posts_newest_first(self):
+        first = self.publish(self.author, 'First')
+        second = self.publish(self.author, 'Second')
+        self.publish(self.stranger, 'Unrelated')
+
+        self.client.force_authenticate(self.reader)
+        resp = self.client.get('/api/feed/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in resp.data['results']], [second.id, first.id])
+
+    def test_feed_cursor_pages_through_timeline(self):
+        posts = [self.publish(self.author, f'Post {i}') for i in range(25)]
+
+        self.client.force_authenticate(self.reader)
+        first = self.client.get('/api/feed/')
+        self.assertEqual(len(first.data['results']), 20)
+        second = self.client.get('/api/feed/', {'cursor': first.data['next']})
+        self.assertEqual([p['id'] for p in second.data['results']], [p.id for p in reversed(posts[:5])])
+        self.assertIsNone(second.data['next'])
+
+    def test_invalid_cursor_is_rejected(self):
+        self.client.force_authenticate(self.reader)
+        resp = self.client.get('/api/feed/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_timeline_is_bounded_by_periodic_trim(self):
+        posts = [self.publish(self.author, f'Post {i}') for i in range(5)]
+        with mock.patch.object(timeline, 'TIMELINE_MAX_LENGTH', 3):
+            call_command('trim_timelines', stdout=StringIO())
+        kept = TimelineEntry.objects.filter(user=self.reader).values_list('post_id', flat=True)
+        self.assertEqual(set(kept), {post.id for post in posts[2:]})
+
+    def test_high_audience_authors_are_merged_at_read_time(self):
+        call_command('rebuild_counters', stdout=StringIO())
+        self.author.refresh_from_db()
+        with mock.patch.object(timeline, 'TIMELINE_FANOUT_LIMIT', 0):
+            post = self.publish(self.author, 'Big news')
+            self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+            self.client.force_authenticate(self.reader)
+            resp = self.client.get('/api/feed/')
+        self.assertEqual([p['id'] for p in resp.data['results']], [post.id])
+
+    def test_follow_backfills_and_unfollow_purges(self):
+        post = self.publish(self.stranger, 'Earlier')
+        self.client.force_authenticate(self.reader)
+
+        self.client.post(f'/api/accounts/follow/{self.stranger.id}/')
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+
+        self.client.post(f'/api/accounts/unfollow/{self.stranger.id}/')
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+
+
+class KeysetPaginationTestCase(APITestCase):
+    """Cursor pagination on (created_at, id) for the post listing."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass')
+        self.posts = [Post.objects.create(author=self.author, title=f'Post {i}', content='...') for i in range(25)]
+
+    def test_next_links_walk_every_post_once(self):
+        seen, url = [], '/api/posts/'
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            seen.extend(p['id'] for p in resp.data['results'])
+            url = resp.data['next']
+        self.assertEqual(seen, [p.id for p in reversed(self.posts)])
+
+    def test_previous_link_returns_to_prior_page(self):
+        first = self.client.get('/api/posts/')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_deep_page_runs_no_count_or_offset(self):
+        first = self.client.get('/api/posts/', {'page_size': 20})
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(first.data['next'])
+        self.assertEqual(len(resp.data['results']), 5)
+        self.assertIsNone(resp.data['next'])
+        for query in ctx.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_invalid_cursor_is_not_found(self):
+        resp = self.client.get('/api/posts/', {'cursor': 'garbage'})
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class EagerLoadingTestCase(APITestCase):
+    """Post listings run a constant number of queries regardless of page size."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader', password='pass')
+        authors = [User.objects.create_user(username=f'author{i}', password='pass') for i in range(5)]
+        with self.captureOnCommitCallbacks(execute=True):  # timeline fan-out
+            for author in authors:
+                author.followers.add(self.reader)
+                for i in range(2):
+                    post = Post.objects.create(author=author, title=f'{author} {i}', content='...')
+                    for commenter in authors[:3]:
+                        Comment.objects.create(post=post, author=commenter, content='Nice')
+
+    def test_post_list_query_count_is_constant(self):
+        # posts joined with authors + comments joined with their authors
+        with self.assertNumQueries(2):
+            resp = self.client.get('/api/posts/')
+        self.assertEqual(len(resp.data['results']), 10)
+        self.assertEqual(len(resp.data['results'][0]['comments']), 3)
+        self.assertTrue(resp.data['results'][0]['comments'][0]['author_username'].startswith('author'))
+
+    def test_feed_query_count_is_constant(self):
+        self.client.force_authenticate(self.reader)
+        # timeline scan, merged-author lookup, batched post fetch, comments
+        with self.assertNumQueries(4):
+            resp = self.client.get('/api/feed/')
+        self.assertEqual(len(resp.data['results']), 10)
+
+    def test_comments_are_capped_per_post(self):
+        post = Post.objects.first()
+        for i in range(25):
+            Comment.objects.create(post=post, author=self.reader, content=f'#{i}')
+        resp = self.client.get(f'/api/posts/{post.id}/')
+        self.assertEqual(len(resp.data['comments']), 20)
+
+
+class SparseFieldsTestCase(APITestCase):
+    """?fields= / ?exclude= / ?expand= trim both the response and the queries."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='x' * 1000)
+        Comment.objects.create(post=self.post, author=self.author, content='First')
+
+    def get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get('/api/posts/', params)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return resp.data['results'][0], [q['sql'] for q in queries.captured_queries]
+
+    def test_fields_select_columns(self):
+        post, queries = self.get(fields='id,title')
+        self.assertEqual(post, {'id': self.post.id, 'title': 'Hello'})
+        # No comment prefetch, no content column
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"content"', queries[0])
+
+    def test_exclude_and_nested_fields(self):
+        post, queries = self.get(exclude='comments,content')
+        self.assertNotIn('comments', post)
+        self.assertIn('author_username', post)
+        self.assertEqual(len(queries), 1)
+
+        post, queries = self.get(fields='title,comments.content')
+        self.assertEqual(post, {'title': 'Hello', 'comments': [{'content': 'First'}]})
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"content"', queries[0])
+        self.assertNotIn('"created_at"', queries[1].split('FROM')[0])
+
+    def test_expand_author(self):
+        post, queries = self.get(fields='id,author,comments.author', expand='author,comments.author')
+        self.assertEqual(post['author'], {'id': self.author.id, 'username': 'author'})
+        self.assertEqual(post['comments'], [{'author': {'id': self.author.id, 'username': 'author'}}])
+        self.assertEqual(len(queries), 2)
+
+    def test_writes_ignore_selection(self):
+        self.client.force_authenticate(self.author)
+        resp = self.client.post('/api/posts/?fields=id', {'title': 'New', 'content': 'Body'})
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertIn('content', resp.data)
+
+    def test_unknown_names_share_one_plan(self):
+        eager._build_plan.cache_clear()
+        expected, _ = self.get(fields='id,title,comments.content')
+        for i in range(10):
+            post, _ = self.get(fields=f'id,title,junk{i},comments.content,comments.junk{i}', expand=f'junk{i}')
+            self.assertEqual(post, expected)
+        self.assertEqual(eager._build_plan.cache_info().currsize, 2)
+
+
+class ResponseFormatTestCase(APITestCase):
+    """MessagePack / columnar renderers and response compression."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass')
+        for i in range(15):
+            post = Post.objects.create(author=self.author, title=f'Post {i}', content='Lorem ipsum ' * 20)
+            Comment.objects.create(post=post, author=self.author, content=f'Comment {i}')
+
+    def test_msgpack_matches_json(self):
+        data = self.client.get('/api/posts/').json()
+        resp = self.client.get('/api/posts/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(resp['Content-Type'], 'application/msgpack')
+        self.assertEqual(renderers.unpackb(resp.content), data)
+        self.assertLess(len(resp.content), len(self.client.get('/api/posts/').content))
+
+    def test_pure_python_packer_round_trips(self):
+        value = {'n': [0, -1, -33, 127, 255, 65536, 2 ** 40, -2 ** 40], 'f': 1.5, 's': 'é' * 40,
+                 'b': b'\x00\x01', 'none': None, 't': True, 'nested': [{}] * 20}
+        with mock.patch.object(renderers, 'msgpack', None):
+            self.assertEqual(renderers.unpackb(renderers.packb(value)), value)
+
+    def test_columnar_json(self):
+        data = self.client.get('/api/posts/').json()
+        resp = self.client.get('/api/posts/', {'format': 'columnar'})
+        self.assertEqual(resp['Content-Type'], 'application/vnd.columnar+json')
+        page = resp.json()['results']
+        self.assertEqual(page['columns'], list(data['results'][0]))
+        first = dict(zip(page['columns'], page['rows'][0]))
+        self.assertEqual(first['comments']['rows'], [list(data['results'][0]['comments'][0].values())])
+
+    def test_large_responses_are_compressed(self):
+        plain = self.client.get('/api/posts/')
+        resp = self.client.get('/api/posts/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', resp['Vary'])
+        self.assertEqual(gzip.decompress(resp.content), plain.content)
+
+        small = self.client.get(f'/api/posts/{Post.objects.first().pk}/', {'fields': 'id'},
+                                HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+    def test_html_is_never_compressed(self):
+        # Pages with CSRF tokens would be open to BREACH
+        for path, params in (('/admin/login/', {}), ('/api/posts/', {'format': 'api'})):
+            resp = self.client.get(path, params, HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertTrue(resp['Content-Type'].startswith('text/html'))
+            self.assertGreater(len(resp.content), 1024)
+            self.assertFalse(resp.has_header('Content-Encoding'))
+
+
+class ProfilingTestCase(APITestCase):
+    """Sampled request profiling and the /api/profiling/ report."""
+
+    def setUp(self):
+        cache.clear()
+        profiling.reset()
+        self.author = User.objects.create_user(username='author', password='pass')
+        self.staff = User.objects.create_user(username='staff', password='pass', is_staff=True)
+        Post.objects.create(author=self.author, title='Hello', content='World')
+
+    def tearDown(self):
+        profiling.reset()
+
+    def test_sampled_requests_are_reported_per_route(self):
+        with mock.patch.object(profiling, 'REQUEST_PROFILING_SAMPLE_RATE', 1.0):
+            for _ in range(3):
+                self.client.get('/api/posts/')
+            self.client.get('/nowhere/')
+        self.client.force_authenticate(self.staff)
+        resp = self.client.get('/api/profiling/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        routes = {route['route']: route for route in resp.data['routes']}
+        posts = routes['GET /api/posts/']
+        self.assertEqual(posts['requests'], 3)
+        self.assertGreater(posts['queries']['p50'], 0)
+        self.assertGreater(posts['serialize_ms']['max'], 0)
+        self.assertGreater(posts['render_ms']['max'], 0)
+        self.assertEqual(set(posts['wall_ms']), {'p50', 'p95', 'p99', 'max'})
+        self.assertIn('GET <unresolved>', routes)
+
+    def test_serializer_data_is_timed_once_per_call(self):
+        timer = profiling.SerializerTimer()
+        token = profiling._timer.set(timer)
+        try:
+            data = PostSerializer(Post.objects.all(), many=True).data
+        finally:
+            profiling._timer.reset(token)
+        self.assertEqual(data[0]['title'], 'Hello')
+        self.assertGreater(timer.time, 0)
+        self.assertEqual(timer.depth, 0)
+
+    def test_unsampled_requests_are_not_recorded(self):
+        with mock.patch.object(profiling, 'REQUEST_PROFILING_SAMPLE_RATE', 0):
+            self.client.get('/api/posts/')
+        self.assertEqual(profiling.samples(), [])
+
+    def test_report_is_staff_only(self):
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.client.get('/api/profiling/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_repeated_queries_are_fingerprinted(self):
+        # A prefetch for one parent and one for many share a fingerprint
+        one = profiling.fingerprint('SELECT * FROM t WHERE id IN (%s)')
+        self.assertEqual(one, 'SELECT * FROM t WHERE id IN (%s, ...)')
+        self.assertEqual(profiling.fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'), one)
+        self.assertEqual(profiling.fingerprint('SELECT * FROM t WHERE id IN ( %s, %s,\n %s )'), one)
+        recorder = profiling.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for post in Post.objects.all():
+                list(post.comments.all())
+            Post.objects.count()
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(len(recorder.duplicates()), 0)
+        with connection.execute_wrapper(recorder):
+            for user in User.objects.all():
+                list(user.posts.all())
+        (sql, repeats), = recorder.duplicates()
+        self.assertIn('"posts_post"', sql)
+        self.assertEqual(repeats, 2)
+
+
+class CounterTestCase(APITestCase):
+    """Denormalized like/comment counters on Post."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass')
+        self.fan = User.objects.create_user(username='fan', password='pass')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='World')
+        self.client.force_authenticate(self.fan)
+
+    def test_like_and_unlike_update_like_count(self):
+        self.client.post(f'/api/posts/{self.post.id}/like/')
+        self.client.post(f'/api/posts/{self.post.id}/like/')  # duplicate is rejected
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+        self.client.post(f'/api/posts/{self.post.id}/unlike/')
+        self.client.post(f'/api/posts/{self.post.id}/unlike/')  # nothing left to delete
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_comment_create_and_delete_update_comment_count(self):
+        resp = self.client.post('/api/comments/', {'post': self.post.id, 'content': 'Nice'})
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+        self.client.delete(f"/api/comments/{resp.data['id']}/")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_rebuild_counters_recomputes_from_tables(self):
+        Like.objects.create(user=self.fan, post=self.post)
+        Comment.objects.create(post=self.post, author=self.fan, content='Nice')
+        Comment.objects.create(post=self.post, author=self.author, content='Thanks')
+
+        call_command('rebuild_counters', batch_size=1, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 2))
+
+    def test_backfill_migration_counts_existing_rows(self):
+        Like.objects.create(user=self.fan, post=self.post)
+        Comment.objects.create(post=self.post, author=self.fan, content='Nice')
+        self.fan.followers.add(self.author)
+        migration = import_module('posts.migrations.0007_backfill_counters')
+        migration.backfill_counters(apps, None)
+        self.post.refresh_from_db()
+        self.fan.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 1))
+        self.assertEqual((self.fan.followers_count, self.author.following_count), (1, 1))
+
+    def test_decrements_of_drifted_counters_are_floored(self):
+        Like.objects.create(user=self.fan, post=self.post)
+        comment = Comment.objects.create(post=self.post, author=self.fan, content='Nice')
+        # e.g. rows predating the counters
+        self.assertEqual(Post.objects.filter(pk=self.post.pk).update(like_count=0, comment_count=0), 1)
+        resp = self.client.post(f'/api/posts/{self.post.id}/unlike/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        resp = self.client.delete(f'/api/comments/{comment.pk}/')
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (0, 0))
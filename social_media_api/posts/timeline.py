@@ -0,0 +1,190 @@
+"""
+Precomputed home timelines (fan-out on write).
+
+When a post is created its id is pushed into the timeline of every follower
+of the author. That fan-out runs off the request path: creating the post only
+queues a ``TimelineOutbox`` row, which the notification outbox worker
+(``notifications.dispatch``) drains once the transaction commits. Authors with
+very large audiences are skipped at write time and merged in when the feed is
+read instead (the "hybrid" fallback), so a single post never has to write
+millions of rows.
+
+Timelines are bounded to ``TIMELINE_MAX_LENGTH`` entries by
+``manage.py trim_timelines``, run periodically, rather than on every write.
+Between runs a timeline may grow past the bound; feed reads only scan the
+newest entries, so that costs storage, not read time.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from accounts.graph import follower_ids
+from notifications import dispatch
+from .models import Post, TimelineEntry, TimelineOutbox
+
+# Newest entries kept per reader; older ones are dropped by trim_timelines.
+TIMELINE_MAX_LENGTH = getattr(settings, 'TIMELINE_MAX_LENGTH', 800)
+# Authors with more followers than this are merged at read time.
+TIMELINE_FANOUT_LIMIT = getattr(settings, 'TIMELINE_FANOUT_LIMIT', 10000)
+# Recent posts copied into a timeline when its owner follows someone new.
+TIMELINE_BACKFILL = getattr(settings, 'TIMELINE_BACKFILL', 50)
+TIMELINE_BATCH_SIZE = 1000
+# Queued posts fanned out per worker transaction
+TIMELINE_OUTBOX_BATCH_SIZE = getattr(settings, 'TIMELINE_OUTBOX_BATCH_SIZE', 10)
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _before(cursor, time_field, id_field):
+    """Q object selecting rows strictly older than a (created_at, id) cursor."""
+    created_at, pk = cursor
+    return Q(**{f'{time_field}__lt': created_at}) | Q(**{time_field: created_at, f'{id_field}__lt': pk})
+
+
+def is_fanout_author(user):
+    """Return True when ``user``'s posts are pushed to followers on write."""
+    return user.followers_count <= TIMELINE_FANOUT_LIMIT
+
+
+def trim_timelines(user_ids):
+    """Drop entries beyond TIMELINE_MAX_LENGTH for the given readers."""
+    ranked = (
+        TimelineEntry.objects.filter(user_id__in=user_ids)
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('created_at').desc(), F('post_id').desc()],
+        ))
+        .filter(rank__gt=TIMELINE_MAX_LENGTH)
+        .values_list('pk', flat=True)
+    )
+    TimelineEntry.objects.filter(pk__in=list(ranked)).delete()
+
+
+def trim_all_timelines(batch_size=TIMELINE_BATCH_SIZE):
+    """Trim every timeline longer than TIMELINE_MAX_LENGTH; returns how many."""
+    over = list(
+        TimelineEntry.objects.order_by().values('user_id')
+        .annotate(n=Count('pk')).filter(n__gt=TIMELINE_MAX_LENGTH)
+        .values_list('user_id', flat=True)
+    )
+    for batch in _batched(over, batch_size):
+        trim_timelines(batch)
+    return len(over)
+
+
+def queue_fan_out(post):
+    """Fan ``post`` out on the outbox worker once the current transaction commits."""
+    TimelineOutbox.objects.create(post=post)
+    transaction.on_commit(dispatch.schedule_drain)
+
+
+@dispatch.register
+def drain_fan_out(batch_size=TIMELINE_OUTBOX_BATCH_SIZE):
+    """Fan out every queued post; returns the number of posts processed."""
+    processed = 0
+    while True:
+        with transaction.atomic():
+            queued = list(
+                TimelineOutbox.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('post__author').order_by('id')[:batch_size]
+            )
+            if not queued:
+                return processed
+            for row in queued:
+                fan_out_post(row.post)
+            TimelineOutbox.objects.filter(id__in=[row.id for row in queued]).delete()
+        processed += len(queued)
+
+
+def fan_out_post(post):
+    """Push ``post`` into the author's and every follower's timeline.
+
+    Returns the number of timelines written, or 0 when the author is above
+    TIMELINE_FANOUT_LIMIT and the post will be merged at read time instead.
+    """
+    author = post.author
+    if not is_fanout_author(author):
+        return 0
+
+    reader_ids = [author.pk, *follower_ids(author.pk)]
+    for batch in _batched(reader_ids, TIMELINE_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=uid, post_id=post.pk, created_at=post.created_at) for uid in batch],
+            ignore_conflicts=True,
+        )
+    return len(reader_ids)
+
+
+def backfill_timeline(reader, author):
+    """Copy ``author``'s recent posts into ``reader``'s timeline after a follow."""
+    if not is_fanout_author(author):
+        return
+    recent = (
+        Post.objects.filter(author=author)
+        .order_by('-created_at', '-id')
+        .values_list('id', 'created_at')[:TIMELINE_BACKFILL]
+    )
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=reader.pk, post_id=pk, created_at=created_at) for pk, created_at in recent],
+        ignore_conflicts=True,
+    )
+    trim_timelines([reader.pk])
+
+
+def purge_timeline(reader, author):
+    """Remove ``author``'s posts from ``reader``'s timeline after an unfollow."""
+    TimelineEntry.objects.filter(user=reader, post__author=author).delete()
+
+
+def _merged_author_ids(reader):
+    """Ids of followed authors whose posts are not fanned out on write."""
+    return list(
+        reader.following.filter(followers_count__gt=TIMELINE_FANOUT_LIMIT)
+        .values_list('id', flat=True)
+    )
+
+
+def read_timeline(reader, limit, cursor=None):
+    """Return up to ``limit`` ``(created_at, post_id)`` pairs, newest first.
+
+    ``cursor`` is the ``(created_at, post_id)`` of the last item of the
+    previous page. Fanned-out entries come from one indexed range scan; posts
+    by followed high-audience authors are merged in with a second scan.
+    """
+    entries = TimelineEntry.objects.filter(user=reader)
+    if cursor is not None:
+        entries = entries.filter(_before(cursor, 'created_at', 'post_id'))
+    streams = [list(entries.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[:limit])]
+
+    merged_ids = _merged_author_ids(reader)
+    if merged_ids:
+        posts = Post.objects.filter(author_id__in=merged_ids)
+        if cursor is not None:
+            posts = posts.filter(_before(cursor, 'created_at', 'id'))
+        streams.append(list(posts.order_by('-created_at', '-id').values_list('created_at', 'id')[:limit]))
+
+    page, seen = [], set()
+    for created_at, post_id in heapq.merge(*streams, reverse=True):
+        if post_id not in seen:
+            seen.add(post_id)
+            page.append((created_at, post_id))
+        if len(page) == limit:
+            break
+    return page
+
+
+def fetch_posts(post_ids, queryset=None):
+    """Load ``post_ids`` with one batched query, preserving their order."""
+    if queryset is None:
+        queryset = Post.objects.select_related('author')
+    posts = queryset.in_bulk(post_ids)
+    return [posts[pk] for pk in post_ids if pk in posts]
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PostViewSet, CommentViewSet, feed
+from .views import PostViewSet, CommentViewSet, feed, LikePostView, UnlikePostView
 
 # Router for ViewSets
 router = DefaultRouter()
@@ -11,12 +11,6 @@ router.register('comments', CommentViewSet, basename='comment')
 urlpatterns = [
     path('', include(router.urls)),   # /posts/ and /comments/
     path('feed/', feed, name='feed'), # /feed/
-]
-
-from django.urls import path
-from .views import LikePostView, UnlikePostView
-
-urlpatterns = [
-    path('posts/<int:pk>/like/', LikePostView.as_view()),
-    path('posts/<int:pk>/unlike/', UnlikePostView.as_view()),
+    path('posts/<int:pk>/like/', LikePostView.as_view(), name='like-post'),
+    path('posts/<int:pk>/unlike/', UnlikePostView.as_view(), name='unlike-post'),
 ]
@@ -1,13 +1,88 @@
 from rest_framework.views import APIView
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import generics
-from django.contrib.contenttypes.models import ContentType
- ["permissions.IsAuthenticated"]
+from rest_framework import viewsets, permissions, filters
+from django.db import transaction
+from django.db.models import F
+
+from social_media_api.eager import EagerLoadingMixin, eager_load
+from social_media_api.sparse import selection_for
+from social_media_api.pagination import KeysetPagination, encode_cursor, decode_cursor
+from .counters import decrement
+from .models import Post, Comment, Like, TimelineEntry
+from .serializers import PostSerializer, CommentSerializer
+from .timeline import read_timeline, fetch_posts
+from notifications.dispatch import notify
+
+FEED_PAGE_SIZE = 20
+
+
+# Custom permission
+class IsOwnerOrReadOnly(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        return obj.author == request.user
+
+# Post ViewSet
+class PostViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
+    queryset = Post.objects.all().order_by('-created_at')
+    serializer_class = PostSerializer
+    pagination_class = KeysetPagination
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['title', 'content']
+
+    def perform_create(self, serializer):
+        serializer.save(author=self.request.user)
+
+# Comment ViewSet
+class CommentViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
+    queryset = Comment.objects.all().order_by('-created_at')
+    serializer_class = CommentSerializer
+    pagination_class = KeysetPagination
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        comment = serializer.save(author=self.request.user)
+        Post.objects.filter(pk=comment.post_id).update(comment_count=F('comment_count') + 1)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        post_id = instance.post_id
+        instance.delete()
+        Post.objects.filter(pk=post_id).update(comment_count=decrement('comment_count'))
+
+
+# -------------------------------
+# Home feed (precomputed timeline)
+# -------------------------------
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def feed(request):
+    """Posts by the accounts the user follows, newest first.
+
+    Reads the precomputed timeline (see ``posts.timeline``); pass the returned
+    ``next`` value back as ``?cursor=`` for the following page.
+    """
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        fields = [TimelineEntry._meta.get_field('created_at'), TimelineEntry._meta.get_field('post')]
+        cursor, _ = decode_cursor(cursor, fields)
+
+    page = read_timeline(request.user, FEED_PAGE_SIZE, cursor)
+    posts = fetch_posts([post_id for _, post_id in page], eager_load(Post.objects.all(), PostSerializer, selection_for(request)))
+    serializer = PostSerializer(posts, many=True, context={'request': request})
+
+    next_cursor = None
+    if len(page) == FEED_PAGE_SIZE:
+        next_cursor = encode_cursor(page[-1])
+    return Response({"next": next_cursor, "results": serializer.data})
 
-from .models import Post, Like
-from notifications.models import Notification
 
 class LikePostView(APIView):
     permission_classes = [IsAuthenticated]
@@ -17,19 +92,16 @@ class LikePostView(APIView):
         post = generics.get_object_or_404(Post, pk=pk)
 
         # Use get_or_create exactly
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=request.user, post=post)
+            if created:
+                Post.objects.filter(pk=post.pk).update(like_count=F('like_count') + 1)
+                if post.author_id != request.user.id:
+                    # Outbox row only; the notification is written off the request path
+                    notify(post.author, request.user, "liked your post", post)
         if not created:
             return Response({"detail": "You already liked this post"}, status=status.HTTP_400_BAD_REQUEST)
 
-        if post.author != request.user:
-            Notification.objects.create(
-                recipient=post.author,
-                actor=request.user,
-                verb="liked your post",
-                content_type=ContentType.objects.get_for_model(post),
-                object_id=post.id
-            )
-
         return Response({"detail": "Post liked"}, status=status.HTTP_201_CREATED)
 
 
@@ -38,5 +110,8 @@ class UnlikePostView(APIView):
 
     def post(self, request, pk):
         post = generics.get_object_or_404(Post, pk=pk)
-        Like.objects.filter(user=request.user, post=post).delete()
+        with transaction.atomic():
+            deleted, _ = Like.objects.filter(user=request.user, post=post).delete()
+            if deleted:
+                Post.objects.filter(pk=post.pk).update(like_count=decrement('like_count'))
         return Response({"detail": "Post unliked"}, status=status.HTTP_200_OK)
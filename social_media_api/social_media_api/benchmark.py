@@ -0,0 +1,334 @@
+"""
+Load-test harness for the API hot paths.
+
+``seed()`` builds a synthetic social graph straight through the ORM: users
+whose follower counts follow a power law (a few very popular accounts, a
+long tail of small ones), posts, likes, comments, notifications and the
+precomputed timelines, with the denormalized counters filled in. The same
+``seed`` value always produces the same graph.
+
+``run()`` then drives the public endpoints through the Django test client,
+in-process - register, login, follow/unfollow, like/unlike, the feed and
+the notification list - and returns throughput and latency percentiles per
+scenario as a JSON-ready dict. ``compare()`` checks such a result against a
+saved baseline.
+
+Used by ``manage.py benchmark_api`` and the ``posts.test_benchmarks`` suite.
+"""
+import math
+import platform
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from itertools import count
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from notifications.models import Notification
+from posts.models import Comment, Like, Post, TimelineEntry
+from posts.timeline import TIMELINE_FANOUT_LIMIT, TIMELINE_MAX_LENGTH
+
+PASSWORD = 'benchmark-password'
+BATCH_SIZE = 1000
+
+SCENARIOS = ('register', 'login', 'follow', 'unfollow', 'like', 'unlike', 'feed', 'notifications')
+# Scenarios undoing the requests of another, which must run before them
+INVERSES = {'unfollow': 'follow', 'unlike': 'like'}
+
+
+@dataclass
+class Graph:
+    """Ids of the seeded rows, plus what the scenarios need to pick from."""
+    seed: int
+    user_ids: list
+    tokens: dict  # user id -> token key
+    usernames: dict  # user id -> username
+    post_ids: list
+    following: dict  # user id -> set of followed user ids
+    liked: dict  # user id -> set of liked post ids
+    counts: dict = field(default_factory=dict)
+
+
+def _power_law_weights(n, alpha, rng):
+    """Popularity weights ``1 / rank ** alpha`` over a shuffled ranking."""
+    ranks = list(range(1, n + 1))
+    rng.shuffle(ranks)
+    return [1 / rank ** alpha for rank in ranks]
+
+
+def _sample(rng, population, cum_weights, k, exclude=()):
+    """Up to ``k`` distinct weighted picks from ``population``, none in ``exclude``."""
+    picked = set()
+    attempts = 0
+    while len(picked) < k and attempts < k * 10:
+        attempts += 1
+        choice = rng.choices(population, cum_weights=cum_weights)[0]
+        if choice not in exclude:
+            picked.add(choice)
+    return picked
+
+
+def seed(users=1000, following=20, posts=5, likes=3, comments=1, notifications=10, alpha=1.1, seed=0):
+    """Create the synthetic graph and return its ``Graph``.
+
+    Sizes are per user (``following``, ``posts``, ``notifications``) or per
+    post (``likes``, ``comments``) averages. Bulk inserts send no signals, so
+    timelines and counters are written here directly.
+    """
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    created = User.objects.bulk_create(
+        (User(username=f'bench-{seed}-{i}', email=f'bench-{i}@example.com', password=password)
+         for i in range(users)),
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = [user.pk for user in created]
+    tokens = {user_id: Token.generate_key() for user_id in user_ids}
+    Token.objects.bulk_create((Token(user_id=uid, key=key) for uid, key in tokens.items()), batch_size=BATCH_SIZE)
+
+    # Follows: out-degree around ``following``, targets drawn by popularity
+    cum_weights, total = [], 0
+    for weight in _power_law_weights(users, alpha, rng):
+        total += weight
+        cum_weights.append(total)
+    graph_following = {}
+    for user_id in user_ids:
+        k = min(users - 1, max(1, round(rng.expovariate(1 / following)))) if following else 0
+        graph_following[user_id] = _sample(rng, user_ids, cum_weights, k, exclude=(user_id,))
+    followers = defaultdict(set)
+    for user_id, targets in graph_following.items():
+        for target in targets:
+            followers[target].add(user_id)
+    Follow = User.followers.through
+    Follow.objects.bulk_create(
+        (Follow(from_user_id=target, to_user_id=user_id)
+         for user_id, targets in graph_following.items() for target in targets),
+        batch_size=BATCH_SIZE,
+    )
+
+    # Posts: popular accounts post more, like real ones
+    post_authors = rng.choices(user_ids, cum_weights=cum_weights, k=users * posts)
+    created_posts = Post.objects.bulk_create(
+        (Post(author_id=author, title=f'Post {i}', content=f'Benchmark post {i} ' * 10)
+         for i, author in enumerate(post_authors)),
+        batch_size=BATCH_SIZE,
+    )
+    post_ids = [post.pk for post in created_posts]
+
+    liked = defaultdict(set)
+    like_rows, comment_rows, like_count, comment_count = [], [], {}, {}
+    for post in created_posts:
+        likers = rng.sample(user_ids, min(users, rng.randint(0, 2 * likes)))
+        for liker in likers:
+            liked[liker].add(post.pk)
+            like_rows.append(Like(user_id=liker, post_id=post.pk))
+        like_count[post.pk] = len(likers)
+        n_comments = rng.randint(0, 2 * comments)
+        for i in range(n_comments):
+            comment_rows.append(Comment(post_id=post.pk, author_id=rng.choice(user_ids), content=f'Comment {i}'))
+        comment_count[post.pk] = n_comments
+    Like.objects.bulk_create(like_rows, batch_size=BATCH_SIZE)
+    Comment.objects.bulk_create(comment_rows, batch_size=BATCH_SIZE)
+
+    # Timelines as fan_out_post would have written them, newest kept
+    timelines = defaultdict(list)
+    for post in created_posts:
+        if len(followers[post.author_id]) <= TIMELINE_FANOUT_LIMIT:
+            for reader in (post.author_id, *followers[post.author_id]):
+                timelines[reader].append(post)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=reader, post_id=post.pk, created_at=post.created_at)
+         for reader, entries in timelines.items()
+         for post in sorted(entries, key=lambda p: (p.created_at, p.pk), reverse=True)[:TIMELINE_MAX_LENGTH]),
+        batch_size=BATCH_SIZE,
+    )
+
+    post_type = ContentType.objects.get_for_model(Post)
+    Notification.objects.bulk_create(
+        (Notification(recipient_id=post.author_id, actor_id=rng.choice(user_ids), verb='liked your post',
+                      content_type=post_type, object_id=post.pk, is_read=rng.random() < 0.5)
+         for post in rng.choices(created_posts, k=users * notifications)),
+        batch_size=BATCH_SIZE,
+    )
+
+    _write_counters(User, 'followers_count', {uid: len(followers[uid]) for uid in user_ids})
+    _write_counters(User, 'following_count', {uid: len(graph_following[uid]) for uid in user_ids})
+    _write_counters(Post, 'like_count', like_count)
+    _write_counters(Post, 'comment_count', comment_count)
+
+    return Graph(
+        seed=seed,
+        user_ids=user_ids,
+        tokens=tokens,
+        usernames={user.pk: user.username for user in created},
+        post_ids=post_ids,
+        following=graph_following,
+        liked=dict(liked),
+        counts={
+            'users': users,
+            'follows': sum(len(targets) for targets in graph_following.values()),
+            'max_followers': max((len(f) for f in followers.values()), default=0),
+            'posts': len(post_ids),
+            'likes': len(like_rows),
+            'comments': len(comment_rows),
+            'notifications': users * notifications,
+        },
+    )
+
+
+def _write_counters(model, field_name, values):
+    rows = [model(pk=pk, **{field_name: value}) for pk, value in values.items() if value]
+    model.objects.bulk_update(rows, [field_name], batch_size=BATCH_SIZE)
+
+
+class Scenarios:
+    """One method per scenario; each performs one request for iteration ``i``.
+
+    Follow/unfollow and like/unlike work through the same pairs, so running
+    a scenario and then its inverse leaves the graph as it was.
+    """
+
+    def __init__(self, graph, client):
+        self.graph = graph
+        self.client = client
+        self.rng = random.Random(graph.seed)
+        self.registered = count()
+        self.follows = {}
+        self.likes = {}
+
+    def _user(self, i):
+        return self.graph.user_ids[i % len(self.graph.user_ids)]
+
+    def _auth(self, user_id):
+        return {'HTTP_AUTHORIZATION': f'Token {self.graph.tokens[user_id]}'}
+
+    def register(self, i):
+        n = next(self.registered)
+        data = {'username': f'bench-{self.graph.seed}-new-{n}', 'email': f'new-{n}@example.com', 'password': PASSWORD}
+        return self.client.post('/api/accounts/register/', data), 201
+
+    def login(self, i):
+        username = self.graph.usernames[self._user(i)]
+        return self.client.post('/api/accounts/login/', {'username': username, 'password': PASSWORD}), 200
+
+    def follow(self, i):
+        reader = self._user(i)
+        followed = self.graph.following[reader]
+        target = self.rng.choice([u for u in self.graph.user_ids if u != reader and u not in followed])
+        followed.add(target)
+        self.follows[i] = (reader, target)
+        return self.client.post(f'/api/accounts/follow/{target}/', **self._auth(reader)), 200
+
+    def unfollow(self, i):
+        reader, target = self.follows.pop(i)
+        self.graph.following[reader].discard(target)
+        return self.client.post(f'/api/accounts/unfollow/{target}/', **self._auth(reader)), 200
+
+    def like(self, i):
+        reader = self._user(i)
+        liked = self.graph.liked.setdefault(reader, set())
+        post = self.rng.choice([p for p in self.graph.post_ids if p not in liked])
+        liked.add(post)
+        self.likes[i] = (reader, post)
+        return self.client.post(f'/api/posts/{post}/like/', **self._auth(reader)), 201
+
+    def unlike(self, i):
+        reader, post = self.likes.pop(i)
+        self.graph.liked[reader].discard(post)
+        return self.client.post(f'/api/posts/{post}/unlike/', **self._auth(reader)), 200
+
+    def feed(self, i):
+        return self.client.get('/api/feed/', **self._auth(self._user(i))), 200
+
+    def notifications(self, i):
+        return self.client.get('/api/notifications/', **self._auth(self._user(i))), 200
+
+
+def summarize(latencies, errors, elapsed):
+    """Throughput and latency percentiles (ms) of one scenario."""
+    ordered = sorted(latencies)
+
+    def rank(p):
+        return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] * 1000, 3)
+
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(ordered) / len(ordered) * 1000, 3),
+            'p50': rank(50), 'p95': rank(95), 'p99': rank(99), 'max': rank(100),
+        },
+    }
+
+
+def check_scenarios(scenarios):
+    """Raise ``ValueError`` for unknown names or an inverse without its scenario."""
+    for position, name in enumerate(scenarios):
+        if name not in SCENARIOS:
+            raise ValueError(f'Unknown scenario {name!r}; choose from {", ".join(SCENARIOS)}')
+        if name in INVERSES and INVERSES[name] not in scenarios[:position]:
+            raise ValueError(f'{name!r} must come after {INVERSES[name]!r}')
+
+
+def run(graph, scenarios=SCENARIOS, iterations=200, warmup=20, client=None):
+    """Run each scenario ``warmup`` + ``iterations`` times; returns the report.
+
+    Scenarios run one after another in the order given; an inverse scenario
+    (unfollow, unlike) undoes the requests of the one before it.
+    """
+    check_scenarios(scenarios)
+    client = client or Client()
+    runner = Scenarios(graph, client)
+    results = {}
+    for name in scenarios:
+        step = getattr(runner, name)
+        latencies, errors, failures = [], 0, []
+        for i in range(warmup):
+            step(i)
+        started = time.perf_counter()
+        for i in range(warmup, warmup + iterations):
+            start = time.perf_counter()
+            response, expected = step(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != expected:
+                errors += 1
+                if len(failures) < 3:
+                    failures.append(f'{response.status_code}: {response.content[:200]!r}')
+        results[name] = summarize(latencies, errors, time.perf_counter() - started)
+        if failures:
+            results[name]['failures'] = failures
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'graph': {'seed': graph.seed, **graph.counts},
+        'iterations': iterations,
+        'warmup': warmup,
+        'scenarios': results,
+    }
+
+
+def compare(current, baseline, max_regression=0.25, metric='p95'):
+    """Scenarios whose ``metric`` latency grew by more than ``max_regression``.
+
+    Returns ``(name, baseline_ms, current_ms)`` tuples.
+    """
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        old, new = before['latency_ms'][metric], result['latency_ms'][metric]
+        if old and new > old * (1 + max_regression):
+            regressions.append((name, old, new))
+    return regressions
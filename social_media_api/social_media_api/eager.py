@@ -0,0 +1,153 @@
+"""
+Eager loading derived from a serializer's field graph.
+
+``eager_load(queryset, SerializerClass)`` walks the serializer's fields once,
+works out which relations they read (``source='author.username'``, nested
+serializers, ``many=True`` children, string-related fields) and applies the
+matching ``select_related`` / ``prefetch_related`` calls, so serializing a
+page of objects runs a fixed number of queries no matter how many rows it
+contains.
+
+Nested ``many=True`` relations can be capped per parent row with
+``Meta.prefetch_limits = {'comments': 20}`` on the parent serializer.
+
+Given a sparse-fieldset ``Selection`` (``social_media_api.sparse``), only the
+relations of the remaining fields are loaded, each narrowed with ``only()``.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from .sparse import SPARSE_PLAN_CACHE_SIZE, normalize, serializer_for, narrow_queryset, selection_for
+
+
+def _relation(model, name):
+    """Return the model field called ``name`` if it is a relation, else None."""
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.is_relation else None
+
+
+def _forward_path(model, attrs):
+    """Longest prefix of ``attrs`` made of forward single-valued relations.
+
+    Returns ``(path, model)`` where ``path`` is a ``__`` joined lookup usable
+    with ``select_related`` and ``model`` is the model it ends on.
+    """
+    path = []
+    for attr in attrs:
+        field = _relation(model, attr)
+        if field is None or field.many_to_many or field.one_to_many:
+            break
+        path.append(attr)
+        model = field.related_model
+    return '__'.join(path), model
+
+
+class LimitedPrefetch(Prefetch):
+    """Prefetch that loads at most ``limit`` related rows per parent.
+
+    Django runs sliced prefetch querysets as a single windowed query, but
+    only supports them together with ``to_attr``. Fetching with the sliced
+    queryset while keeping the unsliced one as ``self.queryset`` lets the
+    results land in the regular related-manager cache, so serializers that
+    read ``obj.comments.all()`` see the capped list.
+    """
+
+    def __init__(self, lookup, queryset, limit):
+        super().__init__(lookup, queryset=queryset)
+        self.limited_queryset = queryset[:limit]
+
+    def get_current_querysets(self, level):
+        if super().get_current_querysets(level) is None:
+            return None
+        return [self.limited_queryset]
+
+
+def build_plan(serializer_class, model, selection=None):
+    """Return ``(select_related, prefetch_related)`` lookups for a serializer.
+
+    Prefetches are ``(lookup, child_model, child_serializer_class, limit,
+    child_selection, child_fk)`` tuples; their querysets are built lazily by
+    :func:`eager_load` so the plan itself can be cached per serializer class
+    and (normalized) selection.
+    """
+    return _build_plan(serializer_class, model, normalize(selection, serializer_class))
+
+
+@lru_cache(maxsize=SPARSE_PLAN_CACHE_SIZE)
+def _build_plan(serializer_class, model, selection):
+    select, prefetch = set(), []
+    meta = getattr(serializer_class, 'Meta', None)
+    limits = getattr(meta, 'prefetch_limits', {})
+
+    for name, field in serializer_for(serializer_class, selection).fields.items():
+        if field.write_only or field.source == '*':
+            continue
+        attrs = field.source.split('.')
+        child_selection = selection.child(name) if selection else None
+        if isinstance(field, serializers.ListSerializer):
+            relation = _relation(model, attrs[0])
+            if relation is not None and len(attrs) == 1:
+                child_model = relation.related_model
+                # Reverse foreign keys group prefetched rows by the child's FK
+                fk = relation.field.name if relation.one_to_many else None
+                prefetch.append((attrs[0], child_model, type(field.child), limits.get(attrs[0]), child_selection, fk))
+            continue
+        if isinstance(field, serializers.ManyRelatedField):
+            prefetch.append((attrs[0], None, None, None, None, None))
+            continue
+
+        if isinstance(field, serializers.RelatedField) and not isinstance(field, serializers.PrimaryKeyRelatedField):
+            # e.g. StringRelatedField: the whole related object is rendered
+            path, _ = _forward_path(model, attrs)
+        elif isinstance(field, serializers.BaseSerializer):
+            path, child_model = _forward_path(model, attrs)
+            if path:
+                child_select, child_prefetch = _build_plan(type(field), child_model, child_selection)
+                select.update(f'{path}__{lookup}' for lookup in child_select)
+                prefetch.extend((f'{path}__{lookup}', *rest) for lookup, *rest in child_prefetch)
+        else:
+            # Dotted sources such as ``author.username`` read through relations
+            path, _ = _forward_path(model, attrs[:-1])
+        if path:
+            select.add(path)
+
+    return tuple(sorted(select)), tuple(prefetch)
+
+
+def eager_load(queryset, serializer_class, selection=None, keep=()):
+    """Apply the relation loading ``serializer_class`` needs to ``queryset``.
+
+    With a ``selection`` the queryset is also narrowed to the columns the
+    selected fields read, plus the fields named in ``keep``.
+    """
+    select, prefetch = build_plan(serializer_class, queryset.model, selection)
+    if select:
+        queryset = queryset.select_related(*select)
+    for lookup, child_model, child_serializer, limit, child_selection, fk in prefetch:
+        if child_model is None:
+            queryset = queryset.prefetch_related(lookup)
+            continue
+        child_qs = eager_load(
+            child_model._default_manager.all(), child_serializer, child_selection, (fk,) if fk else ()
+        )
+        if limit is None:
+            queryset = queryset.prefetch_related(Prefetch(lookup, queryset=child_qs))
+            continue
+        if not child_qs.ordered:
+            child_qs = child_qs.order_by('-pk')
+        queryset = queryset.prefetch_related(LimitedPrefetch(lookup, child_qs, limit))
+    return narrow_queryset(queryset, serializer_class, selection, keep)
+
+
+class EagerLoadingMixin:
+    """Viewset mixin that eager-loads whatever the serializer class reads
+    (or, on reads with ``?fields=`` & co, whatever the selected fields read)."""
+
+    def get_queryset(self):
+        return eager_load(super().get_queryset(), self.get_serializer_class(), selection_for(self.request))
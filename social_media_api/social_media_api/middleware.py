@@ -0,0 +1,92 @@
+"""
+Response compression for API payloads.
+
+``CompressionMiddleware`` compresses responses of at least
+``RESPONSE_COMPRESSION_MIN_SIZE`` bytes of the API's own media types: JSON
+(and ``+json`` types such as the columnar format), MessagePack, CSV and
+NDJSON. HTML is left alone: it carries CSRF tokens (admin, browsable API),
+and compressing it without the random padding of Django's ``GZipMiddleware``
+would expose them to BREACH. Event streams are not matched either, since
+they must reach the client unbuffered. Brotli is used when the ``brotli``
+package is installed and the client accepts ``br``; otherwise gzip.
+Streaming responses are gzipped chunk by chunk. Responses that are already
+encoded, or that would not get smaller, are left alone.
+
+Like Django's ``GZipMiddleware`` it sets ``Vary: Accept-Encoding`` and
+weakens strong ETags. It belongs near the top of ``MIDDLEWARE`` so that it
+sees the final body.
+"""
+import gzip
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+RESPONSE_COMPRESSION_MIN_SIZE = getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', 1024)
+RESPONSE_COMPRESSION_GZIP_LEVEL = getattr(settings, 'RESPONSE_COMPRESSION_GZIP_LEVEL', 6)
+RESPONSE_COMPRESSION_BROTLI_QUALITY = getattr(settings, 'RESPONSE_COMPRESSION_BROTLI_QUALITY', 5)
+
+# API payloads only; never text/html (see above)
+COMPRESSIBLE_TYPES = re.compile(r'^(application/(json|msgpack|csv|x-ndjson)|text/csv|application/[\w.+-]*\+json)\b')
+
+_accepts_gzip = re.compile(r'\bgzip\b')
+_accepts_br = re.compile(r'\bbr\b')
+
+
+def _encoding(request):
+    accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if brotli is not None and _accepts_br.search(accept):
+        return 'br'
+    if _accepts_gzip.search(accept):
+        return 'gzip'
+    return None
+
+
+def _compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=RESPONSE_COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=RESPONSE_COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return response
+        if not COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < RESPONSE_COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = _encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async or not _accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+                return response
+            encoding = 'gzip'
+            response.streaming_content = compress_sequence(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            compressed = _compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
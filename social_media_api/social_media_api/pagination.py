@@ -0,0 +1,163 @@
+"""
+Keyset (cursor) pagination shared by the posts, comments and notifications
+listings.
+
+Pages are addressed by the ordering values of the last row seen, e.g.
+``(created_at, id)``, wrapped in an opaque token. Fetching a page is a single
+``WHERE (created_at, id) < (...) ORDER BY ... LIMIT n`` with no ``COUNT(*)``
+and no ``OFFSET``, so page 1000 costs the same as page 1.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(position, reverse=False):
+    """Serialize a row position (tuple of ordering values) to an opaque token."""
+    payload = {'p': [v.isoformat() if hasattr(v, 'isoformat') else v for v in position]}
+    if reverse:
+        payload['r'] = 1
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, fields):
+    """Inverse of :func:`encode_cursor`.
+
+    ``fields`` are the model fields the position values belong to; they are
+    used to coerce the JSON values back to Python types. Returns
+    ``(position, reverse)`` and raises ``NotFound`` for malformed tokens.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = payload['p']
+        if len(values) != len(fields):
+            raise ValueError(token)
+        position = tuple(field.to_python(value) for field, value in zip(fields, values))
+        return position, bool(payload.get('r'))
+    except (binascii.Error, ValueError, TypeError, KeyError, DjangoValidationError):
+        raise NotFound('Invalid cursor')
+
+
+def keyset_filter(ordering, position, reverse=False):
+    """Q object selecting the rows that come after ``position`` in ``ordering``.
+
+    For ``ordering=('-created_at', '-id')`` this expands to
+    ``created_at < v0 OR (created_at = v0 AND id < v1)``. With ``reverse`` the
+    comparison is flipped to walk backwards from ``position``.
+    """
+    condition = Q()
+    for i, term in enumerate(ordering):
+        descending = term.startswith('-')
+        name = term.lstrip('-')
+        lookup = 'lt' if descending != reverse else 'gt'
+        prefix = {ordering[j].lstrip('-'): position[j] for j in range(i)}
+        condition |= Q(**prefix, **{f'{name}__{lookup}': position[i]})
+    return condition
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination keyed on a unique, indexed ordering.
+
+    ``ordering`` must end with a unique column (normally ``id``) so that every
+    position identifies exactly one row.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        fields = [queryset.model._meta.get_field(term.lstrip('-')) for term in self.ordering]
+        token = request.query_params.get(self.cursor_query_param)
+        position, reverse = decode_cursor(token, fields) if token else (None, False)
+
+        order = self.ordering
+        if reverse:
+            order = tuple(t[1:] if t.startswith('-') else '-' + t for t in self.ordering)
+        queryset = queryset.order_by(*order)
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(self.ordering, position, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else position is not None
+        return rows
+
+    def get_position(self, row):
+        names = [term.lstrip('-') for term in self.ordering]
+        if isinstance(row, dict):
+            return tuple(row[name] for name in names)
+        return tuple(getattr(row, name) for name in names)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        token = encode_cursor(self.get_position(self.page[-1]))
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        token = encode_cursor(self.get_position(self.page[0]), reverse=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class NotificationPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+
+
+class UserPagination(KeysetPagination):
+    ordering = ('id',)
@@ -47,8 +47,12 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # -------------------------------
 MIDDLEWARE = [
+    # Sampled latency/SQL profiling, reported at /api/profiling/
+    'social_media_api.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoise for static files
+    # gzip/brotli for API responses over RESPONSE_COMPRESSION_MIN_SIZE bytes
+    'social_media_api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -141,20 +145,67 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # -------------------------------
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication with an LRU/shared-cache layer in front of the token table
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # Post, comment, notification and user lists set their own keyset
+    # pagination (social_media_api.pagination); it needs a created_at column
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter'
     ],
+    # Login attempts per username (accounts.throttling.LoginRateThrottle)
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '10/min',
+    },
+    # JSON stays the default; clients can ask for the compact forms with
+    # Accept: application/msgpack / application/vnd.columnar+json
+    # (social_media_api.renderers) or ?format=msgpack / ?format=columnar
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'social_media_api.renderers.ColumnarJSONRenderer',
+        'social_media_api.renderers.MessagePackRenderer',
+    ],
 }
 
+# -------------------------------
+# RESPONSE COMPRESSION
+# -------------------------------
+# Smaller bodies are sent as they are (social_media_api.middleware)
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+
+# -------------------------------
+# REQUEST PROFILING
+# -------------------------------
+# Share of requests profiled, and how many recent samples each process keeps
+# (social_media_api.profiling)
+REQUEST_PROFILING_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILING_SAMPLE_RATE', 0.05))
+REQUEST_PROFILING_BUFFER_SIZE = 5000
+
+# -------------------------------
+# TOKEN AUTH CACHE
+# -------------------------------
+# Cache alias shared by all workers (e.g. 'default' once it points at Redis or
+# Memcached); the per-process LRU in accounts.authentication is always on.
+TOKEN_AUTH_SHARED_CACHE = os.environ.get('TOKEN_AUTH_SHARED_CACHE') or None
+
+# -------------------------------
+# LOGIN PASSWORD HASHING
+# -------------------------------
+# Verify login passwords on a bounded thread pool (accounts.hashing) so a
+# login flood cannot occupy every request thread with PBKDF2 work; excess
+# logins get a 503.
+LOGIN_HASH_OFFLOAD = True
+LOGIN_HASH_WORKERS = int(os.environ.get('LOGIN_HASH_WORKERS', 4))
+LOGIN_HASH_MAX_PENDING = int(os.environ.get('LOGIN_HASH_MAX_PENDING', 32))
+
 # -------------------------------
 # DEFAULT PRIMARY KEY
 # -------------------------------
@@ -0,0 +1,44 @@
+"""
+Test settings for social_media_api.
+Inherits from base settings but overrides for test isolation:
+- Uses in-memory SQLite database (the base settings read DATABASE_URL)
+- Disables the HTTPS redirect so the test client can talk plain HTTP
+- Simplified logging
+"""
+
+from .settings import *  # noqa: F401, F403
+
+# Test database: in-memory SQLite for speed and isolation
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',  # In-memory database
+    }
+}
+
+DEBUG = False
+ALLOWED_HOSTS = ['testserver', 'localhost']
+SECURE_SSL_REDIRECT = False
+
+# Simplify logging for tests
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': 'ERROR',  # Only show errors during tests
+    },
+}
+
+# Speed up password hashing in tests
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+# Write notifications synchronously when the outbox transaction commits
+NOTIFICATIONS_ASYNC = False
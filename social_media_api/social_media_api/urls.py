@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .views import ProfilingReportView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -12,4 +14,7 @@ urlpatterns = [
 
     # Accounts (if you have it)
     path('api/accounts/', include('accounts.urls')),
+
+    # Request profiling report (staff only)
+    path('api/profiling/', ProfilingReportView.as_view(), name='profiling-report'),
 ]
@@ -0,0 +1,14 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import profiling
+
+
+# Request profiling report (staff only)
+class ProfilingReportView(APIView):
+    """GET /api/profiling/ - latency and SQL percentiles per route (social_media_api/profiling.py)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(profiling.report())